@@ -1,6 +1,10 @@
 import math
+import typing
 
 import numba
+import numpy as np
+import scipy.interpolate
+import scipy.special
 
 
 def n_pdf(x: float) -> float:
@@ -13,6 +17,16 @@ def n_cdf(x: float) -> float:
     return 0.5 + 0.5 * math.erf(x / 2**0.5)
 
 
+def n_pdf_batch(x: np.ndarray) -> np.ndarray:
+    """Density function of the standard normal, applied elementwise."""
+    return (2 * math.pi)**-0.5 * np.exp(-x**2 / 2)
+
+
+def n_cdf_batch(x: np.ndarray) -> np.ndarray:
+    """Distribution function of the standard normal, applied elementwise."""
+    return 0.5 + 0.5 * scipy.special.erf(x / 2**0.5)
+
+
 def black_scholes(
     pc_flag: float,        # +1 for call, -1 for put.
     spot: float,           # Spot price of the underlying stock.
@@ -44,74 +58,639 @@ def black_scholes(
     return math.exp(-rate * tau) * price_undiscounted
 
 
+def black_scholes_batch(
+    pc_flag,                  # +1 for call, -1 for put.
+    spot,                     # Spot price of the underlying stock.
+    strike,                   # Strike price of the option.
+    ivol,                     # Implied volatility (annualised).
+    tau,                      # Time to expiry (years).
+    rate=0,                   # Risk-free rate (annualised, continuously compounding).
+    div_yield=0,              # Dividend yield (annualised, continuously compounding).
+    chunk_size: int = 65536,  # Number of contracts priced per chunk.
+) -> np.ndarray:
+    """
+    Vectorised version of black_scholes: each argument may be a scalar or an array,
+    and the arguments are broadcast against each other. The broadcast arrays are never
+    materialised; instead they are streamed through in chunks of chunk_size contracts,
+    so that the temporary memory used is bounded regardless of the size of the book.
+    """
+    assert chunk_size >= 1
+
+    inputs = [np.asarray(arg, dtype=np.float64) for arg in (pc_flag, spot, strike, ivol, tau, rate, div_yield)]
+    it = np.nditer(
+        inputs + [None],
+        flags=['external_loop', 'buffered', 'zerosize_ok'],
+        op_flags=[['readonly']] * len(inputs) + [['writeonly', 'allocate']],
+        op_dtypes=[np.float64] * (len(inputs) + 1),
+        buffersize=chunk_size,
+    )
+    with it:
+        for pc, s, k, vol, t, r, q, out in it:
+            out[...] = _black_scholes_chunk(pc, s, k, vol, t, r, q)
+        return it.operands[-1]
+
+
+def _black_scholes_chunk(pc_flag, spot, strike, ivol, tau, rate, div_yield):
+    """The body of black_scholes, written with array operations."""
+    fwd = spot * np.exp((rate - div_yield) * tau)
+    x = np.log(fwd / strike)
+    v = ivol * tau**0.5
+    price_undiscounted = pc_flag * (
+        fwd * n_cdf_batch(pc_flag * (x / v + v / 2))
+        - strike * n_cdf_batch(pc_flag * (x / v - v / 2))
+    )
+    return np.exp(-rate * tau) * price_undiscounted
+
+
+# Closed-form approximations to the price of an American option.
+AMERICAN_APPROXIMATIONS = ('BAW', 'BS2002')
+
+
+def barone_adesi_whaley_batch(
+    pc_flag,          # +1 for call, -1 for put.
+    spot,             # Spot price of the underlying stock.
+    strike,           # Strike price of the option.
+    ivol,             # Implied volatility (annualised).
+    tau,              # Time to expiry (years).
+    rate=0,           # Risk-free rate (annualised, continuously compounding).
+    div_yield=0,      # Dividend yield (annualised, continuously compounding).
+) -> np.ndarray:
+    """
+    Barone-Adesi and Whaley (1987) quadratic approximation to the price of an American
+    option, with a continuously compounding dividend yield. The arguments are broadcast
+    against each other as in black_scholes_batch.
+
+    The early exercise premium is approximated by A (spot / critical)^q, for the q which
+    solves the Black-Scholes equation with its time derivative dropped, and the critical
+    spot is found by Newton's method. It is accurate to a few cents for short expiries,
+    and less so for long ones.
+    """
+    pc_flag, spot, strike, ivol, tau, rate, div_yield = np.broadcast_arrays(*[
+        np.asarray(arg, dtype=np.float64) for arg in (pc_flag, spot, strike, ivol, tau, rate, div_yield)
+    ])
+    european = np.array(_black_scholes_chunk(pc_flag, spot, strike, ivol, tau, rate, div_yield))
+
+    # Calls on stocks without a dividend yield, and puts without interest, are never
+    # exercised early.
+    early = np.where(pc_flag > 0, div_yield > 0, rate > 0)
+    pc, s, k, vol, t, r, q = (arr[early] for arr in (pc_flag, spot, strike, ivol, tau, rate, div_yield))
+    v = vol * t**0.5
+    carry = np.exp(-q * t)
+    m, n = 2 * r / vol**2, 2 * (r - q) / vol**2
+    exponent = (1 - n + pc * np.sqrt((n - 1)**2 + 4 * m / -np.expm1(-r * t))) / 2
+
+    # Seed the critical spot by the interpolation of Barone-Adesi and Whaley, between the
+    # strike and the critical spot of the perpetual option.
+    perpetual_exponent = (1 - n + pc * np.sqrt((n - 1)**2 + 4 * m)) / 2
+    perpetual = k / (1 - 1 / perpetual_exponent)
+    h = -((r - q) * t + 2 * pc * v) * k / (perpetual - k)
+    critical = k + (perpetual - k) * -np.expm1(h)
+
+    # Newton's method on the critical spot, where exercising is worth the same as the
+    # European option plus the premium, and the two have the same delta.
+    active = np.arange(len(critical))
+    for _ in range(_BAW_MAX_ITER):
+        i = active
+        c, sign = critical[i], pc[i]
+        d1 = np.log(c / k[i]) / v[i] + v[i] / 2
+        cdf = scipy.special.ndtr(sign * d1)
+        value = _black_scholes_chunk(sign, c, k[i], vol[i], t[i], r[i], q[i])
+        g = sign * (c - k[i]) - value - sign * (1 - carry[i] * cdf) * c / exponent[i]
+        dg = sign * (1 - carry[i] * cdf) * (1 - 1 / exponent[i]) + carry[i] * n_pdf_batch(d1) / (exponent[i] * v[i])
+        critical[i] = c - g / dg
+        active = i[np.abs(g) > _BAW_TOL * k[i]]
+        if len(active) == 0:
+            break
+
+    d1 = np.log(critical / k) / v + v / 2
+    premium = pc * (critical / exponent) * (1 - carry * scipy.special.ndtr(pc * d1))
+    price = np.where(
+        pc * (critical - s) > 0,
+        european[early] + premium * (s / critical)**exponent,
+        pc * (s - k),
+    )
+    european[early] = price
+    return european
+
+
+# Newton's method on the critical spot in barone_adesi_whaley_batch stops once it
+# is exact to this fraction of the strike, or after this many iterations.
+_BAW_TOL = 1e-10
+_BAW_MAX_ITER = 50
+
+
+def bjerksund_stensland_batch(
+    pc_flag,          # +1 for call, -1 for put.
+    spot,             # Spot price of the underlying stock.
+    strike,           # Strike price of the option.
+    ivol,             # Implied volatility (annualised).
+    tau,              # Time to expiry (years).
+    rate=0,           # Risk-free rate (annualised, continuously compounding).
+    div_yield=0,      # Dividend yield (annualised, continuously compounding).
+) -> np.ndarray:
+    """
+    Bjerksund and Stensland (2002) approximation to the price of an American option,
+    with a continuously compounding dividend yield. The arguments are broadcast against
+    each other as in black_scholes_batch.
+
+    The call is priced as if it were exercised at a flat boundary over each of two
+    periods, split at a fraction (sqrt(5) - 1) / 2 of the way to expiry, which gives a
+    lower bound on the price that is usually within a cent or so of it. The put is
+    priced as a call by put-call symmetry, swapping the spot with the strike and the
+    rate with the dividend yield.
+    """
+    pc_flag, spot, strike, ivol, tau, rate, div_yield = np.broadcast_arrays(*[
+        np.asarray(arg, dtype=np.float64) for arg in (pc_flag, spot, strike, ivol, tau, rate, div_yield)
+    ])
+    put = pc_flag < 0
+    price = np.array(_black_scholes_chunk(pc_flag, spot, strike, ivol, tau, rate, div_yield))
+
+    # Calls on stocks without a dividend yield, and puts without interest, are never
+    # exercised early.
+    early = np.where(put, rate > 0, div_yield > 0)
+    s = np.where(put, strike, spot)[early]
+    k = np.where(put, spot, strike)[early]
+    r = np.where(put, div_yield, rate)[early]
+    q = np.where(put, rate, div_yield)[early]
+    vol, t = ivol[early], tau[early]
+
+    b = r - q
+    t1 = (5**0.5 - 1) / 2 * t
+    beta = (0.5 - b / vol**2) + np.sqrt((b / vol**2 - 0.5)**2 + 2 * r / vol**2)
+    b_inf = beta / (beta - 1) * k
+    b_0 = np.maximum(k, r / (r - b) * k)
+    h1 = -(b * t1 + 2 * vol * t1**0.5) * k**2 / ((b_inf - b_0) * b_0)
+    h2 = -(b * t + 2 * vol * t**0.5) * k**2 / ((b_inf - b_0) * b_0)
+    i1 = b_0 + (b_inf - b_0) * -np.expm1(h1)
+    i2 = b_0 + (b_inf - b_0) * -np.expm1(h2)
+    alpha1 = (i1 - k) * i1**-beta
+    alpha2 = (i2 - k) * i2**-beta
+
+    args = (s, r, b, vol)
+    phi = lambda gamma, h, i: _bs2002_phi(*args, t1, gamma, h, i)
+    psi = lambda gamma, h: _bs2002_psi(*args, t, t1, gamma, h, i2, i1)
+    with np.errstate(all='ignore'):
+        call = (
+            alpha2 * s**beta - alpha2 * phi(beta, i2, i2)
+            + phi(1, i2, i2) - phi(1, i1, i2)
+            - k * phi(0, i2, i2) + k * phi(0, i1, i2)
+            + alpha1 * phi(beta, i1, i2) - alpha1 * psi(beta, i1)
+            + psi(1, i1) - psi(1, k)
+            - k * psi(0, i1) + k * psi(0, k)
+        )
+    price[early] = np.where(s >= i2, s - k, np.maximum(call, price[early]))
+    return price
+
+
+def american_batch(
+    pc_flag,                      # +1 for call, -1 for put.
+    spot,                         # Spot price of the underlying stock.
+    strike,                       # Strike price of the option.
+    ivol,                         # Implied volatility (annualised).
+    tau,                          # Time to expiry (years).
+    rate=0,                       # Risk-free rate (annualised, continuously compounding).
+    div_yield=0,                  # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years), shared by every option.
+    div_amts: list[float] = [],   # Amounts to distribute.
+    method: str = 'BS2002',       # Approximation to use, one of AMERICAN_APPROXIMATIONS.
+    steps: int = 1000,            # Number of steps in the tree, for options with discrete dividends.
+    lattice: str = 'CRR',         # Lattice family of the tree, one of LATTICES.
+) -> np.ndarray:
+    """
+    American option prices for a batch of (broadcast) inputs, using the closed-form
+    approximation method for the options with only a continuous dividend yield, and
+    the discrete_divs tree for those with a discrete dividend before expiry. The
+    approximations are thousands of times faster than the tree, at the cost of an
+    error of up to a few cents: see the american_approximations benchmark.
+    """
+    assert method in AMERICAN_APPROXIMATIONS
+    assert len(div_times) == len(div_amts)
+
+    approximation = barone_adesi_whaley_batch if method == 'BAW' else bjerksund_stensland_batch
+    price = np.array(approximation(pc_flag, spot, strike, ivol, tau, rate, div_yield))
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    if len(div_times) == 0:
+        return price
+
+    args = np.broadcast_arrays(*[
+        np.asarray(arg, dtype=np.float64) for arg in (pc_flag, spot, strike, ivol, tau, rate, div_yield)
+    ])
+    paid = (0 <= div_times) & (div_times < args[4][..., None]) & (div_amts != 0)
+    schedules = {}
+    for idx in np.argwhere(np.any(paid, axis=-1)):
+        idx = tuple(idx)
+        pc, s, k, vol, t, r, q = [arg[idx] for arg in args]
+        # Options on the same spot and expiry share the setup of the dividends.
+        if (s, t, q) not in schedules:
+            schedules[s, t, q] = dividend_schedule(s, t, q, div_times, div_amts, steps, lattice)
+        price[idx] = discrete_divs('A', pc, s, k, vol, t, r, q, div_times[:0], div_amts[:0], steps, lattice, math.inf, schedules[s, t, q])
+    return price
+
+
+def _bs2002_phi(s, r, b, vol, t, gamma, h, i):
+    """The function phi of Bjerksund and Stensland: the value of a knock-out claim."""
+    v = vol * t**0.5
+    lam = (-r + gamma * b + gamma * (gamma - 1) * vol**2 / 2) * t
+    kappa = 2 * b / vol**2 + 2 * gamma - 1
+    d = -(np.log(s / h) + (b + (gamma - 0.5) * vol**2) * t) / v
+    return np.exp(lam) * s**gamma * (
+        scipy.special.ndtr(d) - (i / s)**kappa * scipy.special.ndtr(d - 2 * np.log(i / s) / v)
+    )
+
+
+def _bs2002_psi(s, r, b, vol, t, t1, gamma, h, i2, i1):
+    """The function psi of Bjerksund and Stensland: phi over the two periods."""
+    v, v1 = vol * t**0.5, vol * t1**0.5
+    lam = (-r + gamma * b + gamma * (gamma - 1) * vol**2 / 2) * t
+    kappa = 2 * b / vol**2 + 2 * gamma - 1
+    drift = b + (gamma - 0.5) * vol**2
+    e1 = (np.log(s / i1) + drift * t1) / v1
+    e2 = (np.log(i2**2 / (s * i1)) + drift * t1) / v1
+    e3 = (np.log(s / i1) - drift * t1) / v1
+    e4 = (np.log(i2**2 / (s * i1)) - drift * t1) / v1
+    f1 = (np.log(s / h) + drift * t) / v
+    f2 = (np.log(i2**2 / (s * h)) + drift * t) / v
+    f3 = (np.log(i1**2 / (s * h)) + drift * t) / v
+    f4 = (np.log(s * i1**2 / (h * i2**2)) + drift * t) / v
+    rho = (5**0.5 - 1)**0.5 / 2**0.5  # sqrt(t1 / t)
+    return np.exp(lam) * s**gamma * (
+        _bivariate_n_cdf_batch(-e1, -f1, rho)
+        - (i2 / s)**kappa * _bivariate_n_cdf_batch(-e2, -f2, rho)
+        - (i1 / s)**kappa * _bivariate_n_cdf_batch(-e3, -f3, -rho)
+        + (i1 / i2)**kappa * _bivariate_n_cdf_batch(-e4, -f4, -rho)
+    )
+
+
+def _bivariate_n_cdf_batch(a, b, rho):
+    """
+    Distribution function P(X < a, Y < b) of the standard bivariate normal with
+    correlation rho, for |rho| < 0.925, applied elementwise: Genz's (2004) Gauss-Legendre
+    quadrature of Sheppard's integral over the angle asin(rho).
+    """
+    asr = math.asin(rho)
+    sn = np.sin(asr * (_GAUSS_LEGENDRE_X + 1) / 2)[:, None]
+    hs = (a**2 + b**2) / 2
+    integrand = np.exp((sn * (a * b) - hs) / (1 - sn**2))
+    return _GAUSS_LEGENDRE_W @ integrand * asr / (4 * math.pi) + scipy.special.ndtr(a) * scipy.special.ndtr(b)
+
+
+_GAUSS_LEGENDRE_X, _GAUSS_LEGENDRE_W = np.polynomial.legendre.leggauss(20)
+
+
+# Closed-form European prices with discrete cash dividends.
+def escrowed_dividends_batch(
+    pc_flag,                      # +1 for call, -1 for put.
+    spot,                         # Spot price of the underlying stock.
+    strike,                       # Strike price of the option.
+    ivol,                         # Implied volatility (annualised).
+    tau,                          # Time to expiry (years).
+    rate=0,                       # Risk-free rate (annualised, continuously compounding).
+    div_yield=0,                  # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years), shared by every option.
+    div_amts: list[float] = [],   # Amounts to distribute.
+    vol_adjust: bool = True,      # Whether to adjust the volatility for the dividends.
+) -> np.ndarray:
+    """
+    European option prices for a batch of (broadcast) inputs under the escrowed dividend
+    model: Black-Scholes on the spot less the present value of the dividends paid before
+    expiry. Without vol_adjust this is the limit of the discrete_divs_cy tree.
+
+    The escrowed spot is less volatile than the spot, so the escrowed model underprices
+    options when ivol is the volatility of the spot. vol_adjust scales the variance over
+    each interval between dividends by (spot / (spot - PV of the dividends to come))^2
+    (Beneder and Vorst 2001), which is most of the way to haug_haug_lewis_batch.
+    """
+    assert len(div_times) == len(div_amts)
+    pc_flag, spot, strike, ivol, tau, rate, div_yield = np.broadcast_arrays(*[
+        np.asarray(arg, dtype=np.float64) for arg in (pc_flag, spot, strike, ivol, tau, rate, div_yield)
+    ])
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    order = np.argsort(div_times, kind='stable')
+    div_times, div_amts = div_times[order], div_amts[order]
+
+    # Present values of the dividends paid before expiry, and of those still to come
+    # before each dividend.
+    t = tau[..., None]
+    paid = (0 <= div_times) & (div_times < t)
+    pvs = np.where(paid, div_amts * np.exp(-rate[..., None] * div_times), 0.0)
+    to_come = np.cumsum(pvs[..., ::-1], axis=-1)[..., ::-1]
+    escrowed = spot - (to_come[..., 0] if len(div_times) else 0.0)
+
+    if vol_adjust and len(div_times):
+        # Each interval ends at a dividend (or expiry), clipped to the life of the option.
+        ends = np.clip(div_times, 0, t)
+        intervals = np.diff(ends, axis=-1, prepend=0.0)
+        scales = (spot[..., None] / (spot[..., None] - to_come))**2
+        variance = np.sum(scales * intervals, axis=-1) + tau - ends[..., -1]
+        ivol = ivol * (variance / tau)**0.5
+    return np.array(_black_scholes_chunk(pc_flag, escrowed, strike, ivol, tau, rate, div_yield))
+
+
+def haug_haug_lewis_batch(
+    pc_flag,                      # +1 for call, -1 for put.
+    spot,                         # Spot price of the underlying stock.
+    strike,                       # Strike price of the option.
+    ivol,                         # Implied volatility (annualised).
+    tau,                          # Time to expiry (years).
+    rate=0,                       # Risk-free rate (annualised, continuously compounding).
+    div_yield=0,                  # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years), shared by every option.
+    div_amts: list[float] = [],   # Amounts to distribute.
+    nodes: int = 64,              # Number of quadrature nodes over the spot at the first dividend.
+) -> np.ndarray:
+    """
+    European option prices for a batch of (broadcast) inputs, with ivol the volatility
+    of the spot and the spot dropping by the cash amount of each dividend (to no lower
+    than zero), by the integration of Haug, Haug and Lewis (2003).
+
+    Just after the first dividend the option is worth its price on the spot less the
+    dividend, so its price now is the discounted integral of that against the lognormal
+    density of the spot at the dividend, which is done by Gauss-Legendre quadrature
+    over the standard normal variable. This is exact with one dividend before expiry.
+    The price after the first dividend is escrowed_dividends_batch with the volatility
+    adjustment, which is accurate for the later dividends, being further off.
+    """
+    assert len(div_times) == len(div_amts)
+    assert nodes >= 2
+    args = np.broadcast_arrays(*[
+        np.asarray(arg, dtype=np.float64) for arg in (pc_flag, spot, strike, ivol, tau, rate, div_yield)
+    ])
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    order = np.argsort(div_times, kind='stable')
+    div_times, div_amts = div_times[order], div_amts[order]
+    first = np.searchsorted(div_times, 0.0)
+    if first == len(div_times):
+        return escrowed_dividends_batch(*args)
+
+    # Options expiring by the first dividend are plain Black-Scholes.
+    t1, d1 = div_times[first], div_amts[first]
+    price = escrowed_dividends_batch(*args)
+    integrate = args[4] > t1
+    pc_flag, spot, strike, ivol, tau, rate, div_yield = [arg[integrate][:, None] for arg in args]
+
+    # The spot at the first dividend as a function of a standard normal z, which is
+    # integrated from where the spot covers the dividend to _HHL_WIDTH.
+    drift = (rate - div_yield - ivol**2 / 2) * t1
+    v = ivol * t1**0.5
+    lo = np.clip((np.log(d1 / spot) - drift) / v if d1 > 0 else -_HHL_WIDTH, -_HHL_WIDTH, _HHL_WIDTH)
+    x, w = np.polynomial.legendre.leggauss(nodes)
+    z = lo + (_HHL_WIDTH - lo) * (x + 1) / 2
+    after = spot * np.exp(drift + v * z) - d1
+    later = escrowed_dividends_batch(
+        pc_flag, after, strike, ivol, tau - t1, rate, div_yield,
+        div_times[first+1:] - t1, div_amts[first+1:],
+    )
+    expected = np.sum(w * later * n_pdf_batch(z), axis=-1) * (_HHL_WIDTH - lo[:, 0]) / 2
+
+    # Below lo the stock is worthless, and then so is a call, and a put is worth the strike.
+    bankrupt = np.where(pc_flag[:, 0] > 0, 0.0, strike[:, 0] * np.exp(-rate[:, 0] * (tau[:, 0] - t1)))
+    expected += bankrupt * n_cdf_batch(lo[:, 0])
+    price[integrate] = np.exp(-rate[:, 0] * t1) * expected
+    return price
+
+
+_HHL_WIDTH = 10.0  # Standard deviations of the spot at the first dividend integrated over.
+
+
+# Status codes returned alongside implied volatilities.
+IV_OK = 0                 # Converged.
+IV_BELOW_INTRINSIC = 1    # Price is below the intrinsic (zero volatility) value.
+IV_ABOVE_MAX = 2          # Price is at or above the infinite volatility value.
+IV_NOT_CONVERGED = 3      # Ran out of iterations.
+IV_BAD_INPUT = 4          # Non-positive spot, strike or time, or a non-finite price.
+
+
+def implied_vol_batch(
+    price,                # Market price of the option.
+    pc_flag,              # +1 for call, -1 for put.
+    spot,                 # Spot price of the underlying stock.
+    strike,               # Strike price of the option.
+    tau,                  # Time to expiry (years).
+    rate=0,               # Risk-free rate (annualised, continuously compounding).
+    div_yield=0,          # Dividend yield (annualised, continuously compounding).
+    tol: float = 1e-12,   # Relative tolerance on the volatility.
+    max_iter: int = 16,   # Maximum number of Halley steps per row.
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Invert black_scholes for the implied volatility, for a whole batch of (broadcast)
+    inputs at once. Returns a pair (ivol, status) of arrays; rows which do not have
+    status IV_OK have an ivol of NaN.
+
+    The problem is first reduced to the normalised Black formula for the out-of-the-money
+    option, b(x, v) where x = log(fwd / strike) and v = ivol * sqrt(tau), which is
+    monotone increasing in v. Starting from the Corrado-Miller rational guess, we take
+    Halley steps on log(b) (which behaves far better than b itself for deep out of the
+    money options), while keeping a bracket around the root so that any step leaving
+    the bracket is replaced by bisection. Each row stops as soon as it has converged,
+    and later iterations only touch the rows which remain.
+    """
+    assert max_iter >= 1
+
+    args = np.broadcast_arrays(*[
+        np.asarray(arg, dtype=np.float64)
+        for arg in (price, pc_flag, spot, strike, tau, rate, div_yield)
+    ])
+    shape = args[0].shape
+    price, pc_flag, spot, strike, tau, rate, div_yield = [arg.ravel() for arg in args]
+
+    ivol = np.full(price.shape, np.nan)
+    status = np.full(price.shape, IV_NOT_CONVERGED, dtype=np.int8)
+
+    with np.errstate(all='ignore'):
+        valid = (
+            (spot > 0) & (strike > 0) & (tau > 0) & (np.abs(pc_flag) == 1)
+            & np.isfinite(price) & np.isfinite(rate) & np.isfinite(div_yield)
+        )
+        status[~valid] = IV_BAD_INPUT
+
+        # Undiscounted price normalised by sqrt(fwd * strike), so that the forward and
+        # strike become exp(x/2) and exp(-x/2) respectively.
+        fwd = spot * np.exp((rate - div_yield) * tau)
+        x = np.log(fwd / strike)
+        b = price * np.exp(rate * tau) / np.sqrt(fwd * strike)
+
+        # Use put-call parity to convert to the out-of-the-money option, theta = +1 for
+        # a call and -1 for a put. Its zero-volatility value is 0.
+        h = np.exp(x / 2) - np.exp(-x / 2)
+        theta = np.where(x > 0, -1.0, 1.0)
+        b_otm = np.where(pc_flag == theta, b, b - pc_flag * h)
+        b_max = np.exp(theta * x / 2)
+
+        below = valid & (b_otm < 0)
+        above = valid & (b_otm >= b_max)
+        zero = valid & (b_otm == 0)
+        status[below] = IV_BELOW_INTRINSIC
+        status[above] = IV_ABOVE_MAX
+        status[zero] = IV_OK
+        ivol[zero] = 0.0
+
+        # Corrado-Miller initial guess, written in terms of the straddle value.
+        m = b_otm + np.abs(h) / 2
+        v0 = (2 * math.pi)**0.5 / (2 * np.cosh(x / 2)) * (m + np.sqrt(np.maximum(m**2 - h**2 / math.pi, 0)))
+
+    active = np.flatnonzero(valid & ~below & ~above & ~zero)
+    v = np.maximum(v0[active], 1e-8)
+    x, theta, target = x[active], theta[active], np.log(b_otm[active])
+    lo = np.zeros_like(v)
+    hi = np.full_like(v, np.inf)
+
+    with np.errstate(all='ignore'):
+        for _ in range(max_iter):
+            # Normalised out-of-the-money price, and its first two derivatives in v.
+            d1 = x / v + v / 2
+            d2 = x / v - v / 2
+            # (ndtr rather than n_cdf_batch, since it stays accurate far into the lower tail.)
+            bv = theta * (np.exp(x / 2) * scipy.special.ndtr(theta * d1) - np.exp(-x / 2) * scipy.special.ndtr(theta * d2))
+            db = np.exp(x / 2) * n_pdf_batch(d1)
+            d2b_db = x**2 / v**3 - v / 4
+
+            # Halley step on g(v) = log(b(v)) - log(target).
+            g = np.log(bv) - target
+            dg = db / bv
+            d2g_dg = d2b_db - dg
+            newton = -g / dg
+            v_new = v + newton / (1 + newton * d2g_dg / 2)
+
+            # Maintain the bracket, falling back to bisection (or doubling, if there is
+            # no upper end to the bracket yet) when the step leaves it.
+            lo = np.where(g < 0, v, lo)
+            hi = np.where(g > 0, v, hi)
+            outside = ~((lo < v_new) & (v_new < hi))
+            v_new[outside] = np.where(np.isinf(hi), 2 * v, (lo + hi) / 2)[outside]
+
+            done = (np.abs(v_new - v) <= tol * v_new) | (hi - lo <= tol * v_new) | (g == 0)
+            rows = active[done]
+            ivol[rows] = v_new[done] / np.sqrt(tau[rows])
+            status[rows] = IV_OK
+
+            keep = ~done
+            active, v, x, theta, target, lo, hi = (
+                arr[keep] for arr in (active, v_new, x, theta, target, lo, hi)
+            )
+            if len(active) == 0:
+                break
+
+    return ivol.reshape(shape), status.reshape(shape)
+
+
 def binomial_tree(
-    model: str,            # 'A' for American, 'E' for European.
-    pc_flag: float,        # +1 for call, -1 for put.
-    spot: float,           # Spot price of the underlying stock.
-    strike: float,         # Strike price of the option.
-    ivol: float,           # Implied volatility (annualised).
-    tau: float,            # Time to expiry (years).
-    rate: float = 0,       # Risk-free rate (annualised, continuously compounding).
-    div_yield: float = 0,  # Dividend yield (annualised, continuously compounding).
-    steps: int = 1000,     # Number of steps in the tree, eg [0, 1, ..., 100].
+    model: str,               # 'A' for American, 'E' for European.
+    pc_flag: float,           # +1 for call, -1 for put.
+    spot: float,              # Spot price of the underlying stock.
+    strike: float,            # Strike price of the option.
+    ivol: float,              # Implied volatility (annualised).
+    tau: float,               # Time to expiry (years).
+    rate: float = 0,          # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,     # Dividend yield (annualised, continuously compounding).
+    steps: int = 1000,        # Number of steps in the tree, eg [0, 1, ..., 100].
+    lattice: str = 'CRR',     # Lattice family, one of LATTICES.
+    width: float = math.inf,  # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
 ):
     """
     Binomial tree approximation for valuing an American or European option on a stock,
     with a continuously compounding risk-free rate and dividend yield.
     """
     assert model in 'AE'
+    assert lattice in LATTICES
     assert steps >= 1
 
-    # Set up the binomial tree parameters. Here we will not build the dividend yields
-    # into the risk-neutral measure, but treat them as affecting the prices of the tree.
+    # Set up the binomial tree parameters, with the dividend yield coming off the
+    # prices of the tree by a factor of Y on each step.
+    steps = _lattice_steps(lattice, steps)
     Δt = tau / steps              # Time step.
-    u = math.exp(ivol * Δt**0.5)  # Up factor.
-    d = 1 / u                     # Down factor.
-    R = math.exp(rate * Δt)       # Risk-free rate on a step.
     Y = math.exp(div_yield * Δt)  # Dividend yield on a step.
-    pu = (R - d) / (u - d)        # Risk-neutral up probability.
-    pd = 1 - pu                   # Risk-neutral down probability.
+    divs = np.full(steps, Y)
+    u, d, R, pu, pd = _tree_params(lattice, spot, strike, ivol, tau, rate, divs)
 
     # Spot prices of the underlying at the maximum timestep.
     # The lowest index is the lowest price.
-    sprices = [spot * u**i * d**(steps - i) / Y**steps for i in range(steps + 1)]
+    sprices = np.array([spot * u**i * d**(steps - i) / Y**steps for i in range(steps + 1)])
 
     # Option payoffs at the maximum timestep.
-    oprices = [max(0, pc_flag * (sprice - strike)) for sprice in sprices]
+    oprices = np.maximum(0, pc_flag * (sprices - strike))
 
     # Now for each timestep working backwards, take the discounted expectation
-    # under the risk-neutral measure.
-    for t in range(steps - 1, -1, -1):
-        sprices = [sprice * u * Y for sprice in sprices[:-1]]
-        oprices = [
-            (oprices[i] * pd + oprices[i+1] * pu) / R
-            for i in range(len(oprices) - 1)
-        ]
-        if model == 'A':
-            oprices = [
-                max(oprice, pc_flag * (sprice - strike))
-                for sprice, oprice in zip(sprices, oprices)
-            ]
-    
-    assert len(sprices) == len(oprices) == 1
-    assert abs(sprices[0] - spot) < 1e-10
+    # under the risk-neutral measure. This overwrites the buffers in place, leaving
+    # the values at the root in the 0th entries.
+    _backward_induction(model == 'A', pc_flag, strike, u, d, R, pu, pd, divs, sprices, oprices, steps, 0, width, np.empty(0))
+
+    assert abs(sprices[0] - spot) < 1e-8
 
     return oprices[0]
 
 
-@numba.njit
-def discrete_divs(
-    model: str,                   # 'A' for American, 'E' for European.
-    pc_flag: float,               # +1 for call, -1 for put.
+class DividendSchedule(typing.NamedTuple):
+    """
+    The dividends of an underlying, set up for trees of one spot, expiry and number of
+    steps by dividend_schedule. It may be passed to discrete_divs, discrete_divs_boundary,
+    discrete_divs_strikes and discrete_divs_greeks (with the same steps and lattice) in
+    place of div_yield, div_times and div_amts, so that every tree on the underlying
+    shares the setup.
+
+    The PDE engines take the dividends at their exact times rather than bucketed into
+    timesteps, and the Cython trees use the escrowed model, so neither takes a schedule.
+    """
+    spot: float          # Spot price of the underlying stock.
+    tau: float           # Time to expiry (years).
+    div_yield: float     # Dividend yield (annualised, continuously compounding).
+    factors: np.ndarray  # Dividend factor over each timestep of the tree, as in _dividend_factors.
+    prefix: np.ndarray   # prefix[t] is the product of factors[:t], from 1 at the root to the total at expiry.
+
+
+def dividend_schedule(
     spot: float,                  # Spot price of the underlying stock.
-    strike: float,                # Strike price of the option.
-    ivol: float,                  # Implied volatility (annualised).
     tau: float,                   # Time to expiry (years).
-    rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
     div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
     div_times: list[float] = [],  # Times to distribute dividends (years)
     div_amts: list[float] = [],   # Amounts to distribute.
     steps: int = 1000,            # Number of steps in the tree, eg [0, 1, ..., 100].
+    lattice: str = 'CRR',         # Lattice family, one of LATTICES.
+) -> DividendSchedule:
+    """
+    Set up the dividends of discrete_divs once, for every tree with the same spot, expiry
+    and number of steps, such as the strikes of a chain. Dividends given as dates can be
+    converted with year_fractions.
+    """
+    assert lattice in LATTICES
+    assert len(div_times) == len(div_amts)
+    assert steps >= 1
+
+    factors, prefix = _dividend_prefix(
+        spot, tau, div_yield, np.asarray(div_times, dtype=np.float64), np.asarray(div_amts, dtype=np.float64),
+        _lattice_steps(lattice, steps),
+    )
+    return DividendSchedule(float(spot), float(tau), float(div_yield), factors, prefix)
+
+
+def year_fractions(
+    valuation_date,               # Date the times are measured from.
+    dates,                        # Dates to convert, eg of dividends or expiries.
+    days_in_year: float = 365.0,  # Number of days in a year.
+) -> np.ndarray:
+    """The times from the valuation date to each of the dates (years), in whole days."""
+    days = np.asarray(dates, dtype='datetime64[D]') - np.datetime64(valuation_date, 'D')
+    return days.astype(np.float64) / days_in_year
+
+
+@numba.njit
+def discrete_divs(
+    model: str,                         # 'A' for American, 'E' for European.
+    pc_flag: float,                     # +1 for call, -1 for put.
+    spot: float,                        # Spot price of the underlying stock.
+    strike: float,                      # Strike price of the option.
+    ivol: float,                        # Implied volatility (annualised).
+    tau: float,                         # Time to expiry (years).
+    rate: float = 0,                    # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,               # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],        # Times to distribute dividends (years)
+    div_amts: list[float] = [],         # Amounts to distribute.
+    steps: int = 1000,                  # Number of steps in the tree, eg [0, 1, ..., 100].
+    lattice: str = 'CRR',               # Lattice family, one of LATTICES.
+    width: float = math.inf,            # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+    schedule: DividendSchedule = None,  # In place of div_yield, div_times and div_amts, for the same steps.
 ):
     """
     Binomial tree approximation for valuing an American or European option on a stock,
@@ -120,40 +699,225 @@ def discrete_divs(
     percentage returns on the dividend-discounted price of the stock at that time.
     """
     assert model in 'AE'
+    assert lattice in LATTICES
     assert len(div_times) == len(div_amts)
     assert steps >= 1
 
-    # Set up the binomial tree parameters. Here we will not build the dividend yields
-    # into the risk-neutral measure, but treat them as affecting the prices of the tree.
+    divs = _schedule_factors(schedule, spot, tau, div_yield, div_times, div_amts, steps, lattice)
+    return _discrete_divs_tree(model, pc_flag, spot, strike, ivol, tau, rate, divs, lattice, width)
+
+
+@numba.njit
+def _dividend_factors(spot, tau, div_yield, div_times, div_amts, steps):
+    """
+    Set up the discrete dividends for discrete_divs. The result depends only on the
+    spot, expiry, dividends and number of steps (not the strike or volatility), so it
+    may be computed once and shared between trees: see dividend_schedule.
+    """
+    return _dividend_prefix(spot, tau, div_yield, div_times, div_amts, steps)[0]
+
+
+@numba.njit
+def _dividend_prefix(spot, tau, div_yield, div_times, div_amts, steps):
+    """
+    The dividend factors of _dividend_factors, along with their prefix products, where
+    prefix[t] is the cumulative dividend over the timesteps before t.
+    """
     Δt = tau / steps              # Time step.
-    u = math.exp(ivol * Δt**0.5)  # Up factor.
-    d = 1 / u                     # Down factor.
-    R = math.exp(rate * Δt)       # Risk-free rate on a step.
     Y = math.exp(div_yield * Δt)  # Dividend yield on a step.
-    pu = (R - d) / (u - d)        # Risk-neutral up probability.
-    pd = 1 - pu                   # Risk-neutral down probability.
 
-    # Set up the discrete dividends.
     # We treat discrete dividends as percentage returns, converting a dollar amount to
     # a percentage return using the forward price of the stock, i.e. inflating by the
     # time-scaled (rate - div_yield).
     #
     # Distribute the discrete dividends into time buckets, where divs[t] is the dividend
     # yield (including both discrete and continuous) from timestep t to t+1.
-    divs = [Y for i in range(steps)]
-    for time, amt in zip(div_times, div_amts):
-        # Bucket the discrete dividend, reject if it is outside our time range.
-        t = round(time / Δt)
-        if not (0 <= t < steps):
-            continue
-
-        # Calculate the cumulative dividend so far, so that we can discount the spot.
-        div_sofar = 1.0
-        for i in range(t):
-            div_sofar *= divs[i]
-        
-        # Insert the discrete dividend, as a percentage on the dividend-discounted spot.
-        divs[t] *= 1 + amt / (spot / div_sofar)
+    divs = np.full(steps, Y)
+    buckets = np.empty(len(div_times), dtype=np.int64)
+    for j in range(len(div_times)):
+        buckets[j] = round(div_times[j] / Δt)
+    order = np.argsort(buckets, kind='mergesort')
+
+    # Sweep forward through the timesteps, taking the dividends in order of their
+    # buckets, and carrying along the cumulative dividend so that we can discount the
+    # spot. Dividends outside our time range are rejected.
+    prefix = np.empty(steps + 1)
+    prefix[0] = 1.0
+    j = 0
+    while j < len(order) and buckets[order[j]] < 0:
+        j += 1
+    for t in range(steps):
+        while j < len(order) and buckets[order[j]] == t:
+            # Insert the discrete dividend, as a percentage on the dividend-discounted spot.
+            divs[t] *= 1 + div_amts[order[j]] / (spot / prefix[t])
+            j += 1
+        prefix[t+1] = prefix[t] * divs[t]
+
+    return divs, prefix
+
+
+@numba.njit
+def _schedule_factors(schedule, spot, tau, div_yield, div_times, div_amts, steps, lattice):
+    """The dividend factors of a tree, from the DividendSchedule if given, else set up afresh."""
+    if schedule is None:
+        return _dividend_factors(spot, tau, div_yield, div_times, div_amts, _lattice_steps(lattice, steps))
+    else:
+        # The schedule stands in for the dividends, so they should not be given as well.
+        assert schedule.spot == spot and schedule.tau == tau
+        assert div_yield == 0 or div_yield == schedule.div_yield
+        assert len(div_times) == 0
+        assert _lattice_steps(lattice, steps) == len(schedule.factors)
+        return schedule.factors
+
+
+@numba.njit(nogil=True)
+def _discrete_divs_tree(model, pc_flag, spot, strike, ivol, tau, rate, divs, lattice, width):
+    """The tree of discrete_divs, given the dividend factors from _dividend_factors."""
+    steps = len(divs)
+    u, d, R, pu, pd = _tree_params(lattice, spot, strike, ivol, tau, rate, divs)
+    sprices, oprices = _discrete_divs_leaves(pc_flag, spot, strike, u, d, divs)
+
+    # Now for each timestep working backwards, take the discounted expectation
+    # under the risk-neutral measure.
+    _backward_induction(model == 'A', pc_flag, strike, u, d, R, pu, pd, divs, sprices, oprices, steps, 0, width, np.empty(0))
+
+    # Catch any errors in our pricing tree: the 0th price should just be
+    # equal to the spot.
+    assert abs(sprices[0] - spot) < 1e-4
+
+    return oprices[0]
+
+
+class ExerciseBoundary(typing.NamedTuple):
+    """The early exercise boundary of an option, from discrete_divs_boundary."""
+    price: float
+    time: np.ndarray  # Time of each timestep of the tree (years).
+    spot: np.ndarray  # Spot at the edge of the exercise region then, or NaN if it is empty.
+
+
+def discrete_divs_boundary(
+    model: str,                         # 'A' for American, 'E' for European.
+    pc_flag: float,                     # +1 for call, -1 for put.
+    spot: float,                        # Spot price of the underlying stock.
+    strike: float,                      # Strike price of the option.
+    ivol: float,                        # Implied volatility (annualised).
+    tau: float,                         # Time to expiry (years).
+    rate: float = 0,                    # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,               # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],        # Times to distribute dividends (years)
+    div_amts: list[float] = [],         # Amounts to distribute.
+    steps: int = 1000,                  # Number of steps in the tree, eg [0, 1, ..., 100].
+    lattice: str = 'CRR',               # Lattice family, one of LATTICES.
+    width: float = math.inf,            # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+    schedule: DividendSchedule = None,  # In place of div_yield, div_times and div_amts, for the same steps.
+) -> ExerciseBoundary:
+    """
+    The price from discrete_divs, along with the early exercise boundary read off the
+    same tree. At each timestep the boundary is the spot of the exercised node nearest
+    the continuation region: the highest for a put, which is exercised at or below it,
+    and the lowest for a call, which is exercised at or above it. The boundary is NaN
+    where nothing is exercised, which is always the case for a European option, and for
+    a call with no dividends left to pay.
+    """
+    assert model in 'AE'
+    assert lattice in LATTICES
+    assert len(div_times) == len(div_amts)
+    assert steps >= 1
+
+    divs = _schedule_factors(
+        schedule, spot, tau, div_yield, np.asarray(div_times, dtype=np.float64), np.asarray(div_amts, dtype=np.float64),
+        steps, lattice,
+    )
+    steps = len(divs)
+    u, d, R, pu, pd = _tree_params(lattice, spot, strike, ivol, tau, rate, divs)
+    sprices, oprices = _discrete_divs_leaves(pc_flag, spot, strike, u, d, divs)
+    boundary = np.empty(steps)
+    _backward_induction(model == 'A', pc_flag, strike, u, d, R, pu, pd, divs, sprices, oprices, steps, 0, width, boundary)
+    assert abs(sprices[0] - spot) < 1e-4
+    return ExerciseBoundary(oprices[0], np.arange(steps) * (tau / steps), boundary)
+
+
+# Lattice families for the trees: Cox-Ross-Rubinstein, Jarrow-Rudd, Tian and Leisen-Reimer.
+LATTICES = ('CRR', 'JR', 'Tian', 'LR')
+
+
+@numba.njit
+def _tree_params(lattice, spot, strike, ivol, tau, rate, divs):
+    """
+    Set up the binomial tree parameters (u, d, R, pu, pd) for a tree with dividend
+    factors divs. Here we will not build the dividend yields into the risk-neutral
+    measure, but treat them as affecting the prices of the tree, so every lattice grows
+    by R over a step before the dividends come off.
+
+    CRR has d = 1/u. JR centres the up and down moves on the drift, so that they are
+    about equally likely. Tian also matches the third moment of the step. LR (Leisen-
+    Reimer) chooses the probabilities so that the final nodes match the Black-Scholes
+    distribution with the strike at the middle node, which needs an odd number of steps
+    (see _lattice_steps); it is the only lattice which depends on the spot and strike.
+    """
+    steps = len(divs)
+    Δt = tau / steps              # Time step.
+    R = math.exp(rate * Δt)       # Risk-free rate on a step.
+    if lattice == 'CRR':
+        u = math.exp(ivol * Δt**0.5)
+        d = 1 / u
+    elif lattice == 'JR':
+        u = R * math.exp(-ivol**2 * Δt / 2 + ivol * Δt**0.5)
+        d = R * math.exp(-ivol**2 * Δt / 2 - ivol * Δt**0.5)
+    elif lattice == 'Tian':
+        v = math.exp(ivol**2 * Δt)
+        u = R * v / 2 * (v + 1 + (v**2 + 2 * v - 3)**0.5)
+        d = R * v / 2 * (v + 1 - (v**2 + 2 * v - 3)**0.5)
+    elif lattice == 'LR':
+        total_div = 1.0
+        for div in divs:
+            total_div *= div
+        fwd = spot * math.exp(rate * tau) / total_div
+        v = ivol * tau**0.5
+        d1 = math.log(fwd / strike) / v + v / 2
+        p = _peizer_pratt(d1 - v, steps)
+        u = R * _peizer_pratt(d1, steps) / p
+        d = (R - p * u) / (1 - p)
+    else:
+        raise ValueError("unknown lattice")
+    pu = (R - d) / (u - d)        # Risk-neutral up probability.
+    pd = 1 - pu                   # Risk-neutral down probability.
+    return u, d, R, pu, pd
+
+
+@numba.njit
+def _peizer_pratt(z, steps):
+    """
+    Peizer-Pratt (method 2) inversion: the probability p for which the binomial
+    distribution of steps trials, with success probability p, approximates N(z).
+    """
+    x = z / (steps + 1 / 3 + 0.1 / (steps + 1))
+    return 0.5 + math.copysign(0.5, z) * (1 - math.exp(-x**2 * (steps + 1 / 6)))**0.5
+
+
+@numba.njit
+def _lattice_steps(lattice, steps):
+    """The steps to use for a lattice: LR needs an odd number, so round up."""
+    if lattice == 'LR' and steps % 2 == 0:
+        return steps + 1
+    return steps
+
+
+@numba.njit
+def _discrete_divs_leaves(pc_flag, spot, strike, u, d, divs):
+    """Spot prices and option payoffs at the maximum timestep of the tree."""
+    sprices = _discrete_divs_spots(spot, u, d, divs)
+    oprices = np.empty(len(sprices))
+    for t in range(len(sprices)):
+        oprices[t] = max(0, pc_flag * (sprices[t] - strike))
+
+    return sprices, oprices
+
+
+@numba.njit
+def _discrete_divs_spots(spot, u, d, divs):
+    """Spot prices at the maximum timestep of the tree."""
+    steps = len(divs)
 
     # Need to know our total dividend to set up the final prices in the tree.
     total_div = 1.0
@@ -162,38 +926,1027 @@ def discrete_divs(
     
     # Spot prices of the underlying at the maximum timestep.
     # The lowest index is the lowest price.
-    sprices = [
-        spot * u**t * d**(steps - t) / total_div
-        for t in range(steps + 1)
-    ]
+    sprices = np.empty(steps + 1)
+    for t in range(steps + 1):
+        sprices[t] = spot * u**t * d**(steps - t) / total_div
 
-    # Option payoffs at the maximum timestep.
-    oprices = [max(0, pc_flag * (sprice - strike)) for sprice in sprices]
+    return sprices
 
-    # Now for each timestep working backwards, take the discounted expectation
-    # under the risk-neutral measure.
-    for t in range(steps-1, -1, -1):
-        sprices = [sprice * u * divs[t] for sprice in sprices[:-1]]
-        oprices = [
-            (oprices[i] * pd + oprices[i+1] * pu) / R
-            for i in range(len(oprices) - 1)
-        ]
-        if model == 'A':
-            oprices = [
-                max(oprice, pc_flag * (sprice - strike))
-                for sprice, oprice in zip(sprices, oprices)
-            ]
-    
-    # Did we loop the right number of times?
-    assert len(sprices) == len(oprices) == 1
 
-    # Catch any errors in our pricing tree: the 0th price should just be
-    # equal to the spot.
-    assert abs(sprices[0] - spot) < 1e-4
+@numba.njit
+def _backward_induction(american, pc_flag, strike, u, d, R, pu, pd, divs, sprices, oprices, start, stop, width, boundary):
+    """
+    Backward induction through the tree, in place. On entry sprices[:start+1] and
+    oprices[:start+1] hold the spot and option prices of the nodes at timestep start,
+    and on exit sprices[:stop+1] and oprices[:stop+1] hold those at timestep stop.
+    The dividend factor over the step from t to t+1 is divs[t].
+
+    Each node at timestep t only depends on the two nodes above it at timestep t+1,
+    the lower of which has the same index, so we can sweep upwards overwriting as we go.
+    The lower node is a down move d from the node below it, and the upper an up move u.
+
+    Only the nodes within width standard deviations of the mean path from the root are
+    visited (see _truncated_nodes), and the rest keep stale values. A node entering the
+    band from below has a stale spot price too, so its spot is found from the node above.
+
+    For an American option, when the rate is not negative and the dividend factors are
+    at least 1, the exercise region at each timestep is a block of nodes at the bottom
+    of the tree for a put, and at the top for a call: the continuation value less the
+    intrinsic value is monotone in the spot. So a put is only checked for exercise up
+    to the first node where it is not exercised, and a call only up to the first node
+    where it is, with every node above that simply taking the intrinsic value. A call
+    is never exercised while there are no dividends left to pay, so is not checked at
+    all then. Otherwise (eg a put with the dividend yield below a negative rate, whose
+    exercise region is a band in the middle of the tree), and in a truncated tree,
+    whose stale values at the edges of the band can break the monotonicity, every node
+    is checked. If boundary is non-empty, boundary[t] gets the spot of the exercised
+    node nearest the continuation region at timestep t (the highest for a put and the
+    lowest for a call), or NaN if none are exercised.
+    """
+    back = 1 / d
+    half = _truncation_halfwidth(len(divs), pu, pd, width)
+    truncated = half < start
+    monotone = R >= 1 and (len(divs) == 0 or divs.min() >= 1)
+    lo_next = _truncated_nodes(start, pu, half)[0]
+
+    # Calls are only checked for exercise at the timesteps up to the last dividend.
+    last_exercise = start - 1
+    if pc_flag > 0 and R >= 1:
+        last_exercise = -1
+        for t in range(len(divs)):
+            if divs[t] != 1:
+                last_exercise = t
+
+    for t in range(start - 1, stop - 1, -1):
+        div = divs[t]
+        lo, hi = _truncated_nodes(t, pu, half)
+        for i in range(lo_next, hi + 1):
+            sprices[i] = sprices[i] * back * div
+        for i in range(lo_next - 1, lo - 1, -1):
+            sprices[i] = sprices[i+1] * d / u
+        lo_next = lo
+
+        if not american or t > last_exercise:
+            for i in range(lo, hi + 1):
+                oprices[i] = (oprices[i] * pd + oprices[i+1] * pu) / R
+            edge = lo - 1
+        elif truncated or not monotone:
+            # The exercise region need not be a block at the edge of the tree, so check
+            # every node, taking the edge as the exercised node furthest into it.
+            edge = lo - 1 if pc_flag < 0 else hi + 1
+            for i in range(lo, hi + 1):
+                oprices[i] = (oprices[i] * pd + oprices[i+1] * pu) / R
+                exercise = pc_flag * (sprices[i] - strike)
+                if exercise > 0 and exercise >= oprices[i]:
+                    oprices[i] = exercise
+                    edge = i if pc_flag < 0 else min(edge, i)
+        elif pc_flag < 0:
+            # The put is exercised at the nodes lo..edge, and continued above them.
+            edge = lo
+            while edge <= hi:
+                exercise = pc_flag * (sprices[edge] - strike)
+                if not (exercise > 0 and exercise >= (oprices[edge] * pd + oprices[edge+1] * pu) / R):
+                    break
+                oprices[edge] = exercise
+                edge += 1
+            for i in range(edge, hi + 1):
+                oprices[i] = (oprices[i] * pd + oprices[i+1] * pu) / R
+            edge -= 1
+        else:
+            # The call is continued below the node edge, and exercised at edge..hi.
+            edge = lo
+            while edge <= hi:
+                continuation = (oprices[edge] * pd + oprices[edge+1] * pu) / R
+                exercise = pc_flag * (sprices[edge] - strike)
+                if exercise > 0 and exercise >= continuation:
+                    break
+                oprices[edge] = continuation
+                edge += 1
+            for i in range(edge, hi + 1):
+                oprices[i] = pc_flag * (sprices[i] - strike)
+
+        if len(boundary):
+            boundary[t] = sprices[edge] if lo <= edge <= hi else math.nan
+
+
+# Truncating the trees at this many standard deviations changes prices by less than
+# 1e-8 relative, in exchange for visiting O(steps^1.5) rather than O(steps^2) nodes.
+TRUNCATION_WIDTH = 8.0
+
+
+@numba.njit
+def _truncation_halfwidth(steps, pu, pd, width):
+    """
+    Half the number of nodes kept at each timestep when truncating a tree of steps at
+    width standard deviations: the standard deviation of the number of up moves over
+    the whole tree is sqrt(steps pu pd). This is infinite for an untruncated tree.
+    """
+    return max(width * (steps * pu * pd)**0.5, 1.0)
+
 
+@numba.njit
+def _truncated_nodes(t, pu, half):
+    """
+    The nodes lo..hi (inclusive) at timestep t within half nodes of the mean path, t pu
+    up moves from the root. These only move up as t increases, and a path from the root
+    leaves the band with probability about 4 N(-width), so truncating changes a price by
+    at most that times the largest option price in the band.
+    """
+    if half >= t:
+        return 0, t
+    return max(0, math.floor(t * pu - half)), min(t, math.ceil(t * pu + half))
+
+
+def discrete_divs_bbsr(
+    model: str,                   # 'A' for American, 'E' for European.
+    pc_flag: float,               # +1 for call, -1 for put.
+    spot: float,                  # Spot price of the underlying stock.
+    strike: float,                # Strike price of the option.
+    ivol: float,                  # Implied volatility (annualised).
+    tau: float,                   # Time to expiry (years).
+    rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years)
+    div_amts: list[float] = [],   # Amounts to distribute.
+    steps: int = 100,             # Number of steps in the finer of the two trees.
+    lattice: str = 'CRR',         # Lattice family, one of LATTICES.
+    width: float = math.inf,      # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+):
+    """
+    The option priced as in discrete_divs, but converging much faster in the number of
+    steps, using the binomial Black-Scholes method with Richardson extrapolation (BBSR,
+    Broadie and Detemple 1996). Each tree takes Black-Scholes values over its final step
+    in place of the payoff, which smooths out the kink at the strike so that the error
+    falls off regularly as c/steps. Pricing with steps and steps // 2 steps then lets
+    us solve for and remove the c/steps term.
+
+    A hundred steps here is about as accurate as a thousand in discrete_divs, at around
+    a thirtieth of the cost. Discrete dividends are bucketed to the nearest step of each
+    tree, so the extrapolation works best when they fall on steps of both trees.
+    """
+    assert model in 'AE'
+    assert lattice in LATTICES
+    assert len(div_times) == len(div_amts)
+    assert steps >= 2
+
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    fine_steps, coarse_steps = _lattice_steps(lattice, steps), _lattice_steps(lattice, steps // 2)
+    prices = []
+    for n in [fine_steps, coarse_steps]:
+        divs = _dividend_factors(spot, tau, div_yield, div_times, div_amts, n)
+        prices.append(_discrete_divs_bbs_tree(model, pc_flag, spot, strike, ivol, tau, rate, divs, lattice, width))
+
+    # Each price is p + c/n plus smaller terms, so eliminate c.
+    fine, coarse = prices
+    return (fine_steps * fine - coarse_steps * coarse) / (fine_steps - coarse_steps)
+
+
+def binomial_tree_bbsr(
+    model: str,               # 'A' for American, 'E' for European.
+    pc_flag: float,           # +1 for call, -1 for put.
+    spot: float,              # Spot price of the underlying stock.
+    strike: float,            # Strike price of the option.
+    ivol: float,              # Implied volatility (annualised).
+    tau: float,               # Time to expiry (years).
+    rate: float = 0,          # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,     # Dividend yield (annualised, continuously compounding).
+    steps: int = 100,         # Number of steps in the finer of the two trees.
+    lattice: str = 'CRR',     # Lattice family, one of LATTICES.
+    width: float = math.inf,  # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+):
+    """The option priced as in binomial_tree, in fewer steps: see discrete_divs_bbsr."""
+    return discrete_divs_bbsr(model, pc_flag, spot, strike, ivol, tau, rate, div_yield, steps=steps, lattice=lattice, width=width)
+
+
+class AdaptivePrice(typing.NamedTuple):
+    """A price from discrete_divs_adaptive, along with the work it took."""
+    price: float
+    steps: int        # Number of steps in the finest tree priced.
+    converged: bool   # Whether the tolerance was met within the budget.
+
+
+def discrete_divs_adaptive(
+    model: str,                   # 'A' for American, 'E' for European.
+    pc_flag: float,               # +1 for call, -1 for put.
+    spot: float,                  # Spot price of the underlying stock.
+    strike: float,                # Strike price of the option.
+    ivol: float,                  # Implied volatility (annualised).
+    tau: float,                   # Time to expiry (years).
+    rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years)
+    div_amts: list[float] = [],   # Amounts to distribute.
+    tol: float = 1e-4,            # Absolute tolerance on the price.
+    min_steps: int = 50,          # Number of steps in the first tree.
+    max_steps: int = 6400,        # Most steps in any tree: the budget per contract.
+    lattice: str = 'CRR',         # Lattice family, one of LATTICES.
+    width: float = math.inf,      # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+) -> AdaptivePrice:
+    """
+    The option priced as in discrete_divs, choosing the number of steps to reach a
+    tolerance rather than being given it.
+
+    Starting from min_steps, we price the binomial Black-Scholes tree of
+    discrete_divs_bbsr, doubling the steps each time. Each new tree is extrapolated
+    together with the one before, reusing its price, and we stop when two successive
+    extrapolations agree to within tol, returning the latest. (Successive trees alone
+    are not compared: their difference is about the size of the error of the latest,
+    and with discrete dividends they need not converge monotonically.) Short-dated contracts converge in a few small trees, while long-dated
+    ones keep doubling, up to max_steps. The trees priced before the last add about a
+    third to its cost. The agreement is an estimate of the error rather than a bound:
+    for American options the error is usually within tol, but can be a few times it.
+    """
+    assert model in 'AE'
+    assert lattice in LATTICES
+    assert len(div_times) == len(div_amts)
+    assert 2 <= min_steps <= max_steps and tol > 0
+
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    steps, price, estimate = 0, math.nan, math.nan
+    n = min_steps
+    while n <= max_steps:
+        prev_steps, prev_price, prev_estimate = steps, price, estimate
+        steps = _lattice_steps(lattice, n)
+        divs = _dividend_factors(spot, tau, div_yield, div_times, div_amts, steps)
+        price = _discrete_divs_bbs_tree(model, pc_flag, spot, strike, ivol, tau, rate, divs, lattice, width)
+        if prev_steps:
+            # Each price is p + c/n plus smaller terms, so eliminate c.
+            estimate = (steps * price - prev_steps * prev_price) / (steps - prev_steps)
+            if abs(estimate - prev_estimate) <= tol:
+                return AdaptivePrice(estimate, steps, True)
+        n *= 2
+
+    return AdaptivePrice(price if math.isnan(estimate) else estimate, steps, False)
+
+
+@numba.njit
+def _discrete_divs_bbs_tree(model, pc_flag, spot, strike, ivol, tau, rate, divs, lattice, width):
+    """
+    The tree of discrete_divs, except that the values at the last-but-one timestep are
+    the Black-Scholes values over the final step (and for an American option, the
+    larger of that and exercising), rather than stepping back from the payoffs.
+    """
+    steps = len(divs)
+    Δt = tau / steps
+    u, d, R, pu, pd = _tree_params(lattice, spot, strike, ivol, tau, rate, divs)
+    american = model == 'A'
+
+    # The final step pays the dividend factor divs[-1], which over one step is the
+    # same as a continuous yield of log(divs[-1]) / Δt.
+    sprices = _discrete_divs_spots(spot, u, d, divs[:-1])
+    final_yield = math.log(divs[-1]) / Δt
+    oprices = np.empty(steps)
+    for i in range(steps):
+        oprices[i] = _black_scholes_jit(pc_flag, sprices[i], strike, ivol, Δt, rate, final_yield)
+        if american:
+            oprices[i] = max(oprices[i], pc_flag * (sprices[i] - strike))
+
+    _backward_induction(american, pc_flag, strike, u, d, R, pu, pd, divs, sprices, oprices, steps - 1, 0, width, np.empty(0))
+    assert abs(sprices[0] - spot) < 1e-4
     return oprices[0]
 
 
+@numba.njit
+def _black_scholes_jit(pc_flag, spot, strike, ivol, tau, rate, div_yield):
+    """The body of black_scholes, compiled so that the tree kernels can call it."""
+    fwd = spot * math.exp((rate - div_yield) * tau)
+    x = math.log(fwd / strike)
+    v = ivol * tau**0.5
+    price_undiscounted = pc_flag * (
+        fwd * (0.5 + 0.5 * math.erf(pc_flag * (x / v + v / 2) / 2**0.5))
+        - strike * (0.5 + 0.5 * math.erf(pc_flag * (x / v - v / 2) / 2**0.5))
+    )
+    return math.exp(-rate * tau) * price_undiscounted
+
+
+def discrete_divs_strikes(
+    model: str,                         # 'A' for American, 'E' for European.
+    pc_flag,                            # +1 for call, -1 for put.
+    spot: float,                        # Spot price of the underlying stock.
+    strike,                             # Strike price of the option.
+    ivol: float,                        # Implied volatility (annualised).
+    tau: float,                         # Time to expiry (years).
+    rate: float = 0,                    # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,               # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],        # Times to distribute dividends (years)
+    div_amts: list[float] = [],         # Amounts to distribute.
+    steps: int = 1000,                  # Number of steps in the tree, eg [0, 1, ..., 100].
+    lattice: str = 'CRR',               # Lattice family, one of LATTICES.
+    width: float = math.inf,            # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+    schedule: DividendSchedule = None,  # In place of div_yield, div_times and div_amts, for the same steps.
+) -> np.ndarray:
+    """
+    Price every strike of an expiry with discrete_divs at once: pc_flag and strike may
+    be arrays (broadcast against each other), and the result has their shape.
+
+    The spot lattice and dividend factors are the same for every strike, so they are
+    computed once, and a single backward induction runs over a (nodes x strikes) buffer
+    of option prices. The prices agree with calling discrete_divs per strike to within
+    rounding. The LR lattice is centred on the strike, so with it each strike gets its
+    own tree, sharing only the dividend factors.
+    """
+    assert model in 'AE'
+    assert lattice in LATTICES
+    assert len(div_times) == len(div_amts)
+    assert steps >= 1
+
+    pc_flag, strike = np.broadcast_arrays(np.asarray(pc_flag, dtype=np.float64), np.asarray(strike, dtype=np.float64))
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    divs = _schedule_factors(schedule, spot, tau, div_yield, div_times, div_amts, steps, lattice)
+    return _strikes_prices(model, pc_flag, spot, strike, ivol, tau, rate, divs, lattice, width)
+
+
+def _strikes_prices(model, pc_flag, spot, strike, ivol, tau, rate, divs, lattice, width):
+    """The prices of discrete_divs_strikes, given the dividend factors."""
+    if strike.size < _STRIKES_BATCH_MIN or lattice == 'LR':
+        # Too few strikes to fill the vectorised inner loop: price them one at a time,
+        # still sharing the dividend factors.
+        prices = np.array([
+            _discrete_divs_tree(model, pc, spot, k, ivol, tau, rate, divs, lattice, width)
+            for pc, k in zip(pc_flag.flat, strike.flat)
+        ])
+    else:
+        prices = _discrete_divs_strikes_tree(
+            model == 'A', pc_flag.flatten(), spot, strike.flatten(), ivol, tau, rate, divs, lattice, width,
+        )
+    return prices.reshape(strike.shape)
+
+
+# Below this many strikes, discrete_divs_strikes prices the strikes one at a time.
+_STRIKES_BATCH_MIN = 16
+
+
+@numba.njit(nogil=True)
+def _discrete_divs_strikes_tree(american, pc_flags, spot, strikes, ivol, tau, rate, divs, lattice, width):
+    """The tree of discrete_divs_strikes, given the dividend factors (not for LR)."""
+    steps = len(divs)
+    u, d, R, pu, pd = _tree_params(lattice, spot, math.nan, ivol, tau, rate, divs)
+    sprices, oprices = _strikes_leaves(pc_flags, spot, strikes, u, d, divs)
+    half = _truncation_halfwidth(steps, pu, pd, width)
+    _strikes_induction(american, pc_flags, strikes, u, d, R, pu, pd, divs, sprices, oprices, steps, 0, half)
+    assert abs(sprices[0] - spot) < 1e-4
+    return oprices[0].copy()
+
+
+@numba.njit(nogil=True)
+def _strikes_leaves(pc_flags, spot, strikes, u, d, divs):
+    """
+    The spot prices at expiry, and the (nodes x strikes) option prices there. Option
+    prices are laid out with the strikes innermost, so that the inner loop of the
+    induction runs along contiguous memory, and can be vectorised.
+    """
+    steps = len(divs)
+    sprices = _discrete_divs_spots(spot, u, d, divs)
+    oprices = np.empty((steps + 1, len(strikes)))
+    for i in range(steps + 1):
+        for k in range(len(strikes)):
+            oprices[i, k] = max(0, pc_flags[k] * (sprices[i] - strikes[k]))
+    return sprices, oprices
+
+
+@numba.njit(nogil=True)
+def _strikes_induction(american, pc_flags, strikes, u, d, R, pu, pd, divs, sprices, oprices, start, stop, half):
+    """
+    Step the (nodes x strikes) option prices back from timestep start to stop, as
+    _backward_induction does for one strike, truncated at half nodes either side of the
+    mean path. (We multiply by the discount factor rather than dividing by R, so that
+    the inner loop vectorises, which can differ from discrete_divs in the last bit.)
+    """
+    disc = 1 / R
+    back = 1 / d
+    lo_next = _truncated_nodes(start, pu, half)[0]
+    for t in range(start - 1, stop - 1, -1):
+        div = divs[t]
+        lo, hi = _truncated_nodes(t, pu, half)
+        for i in range(lo_next, hi + 1):
+            sprices[i] = sprices[i] * back * div
+        for i in range(lo_next - 1, lo - 1, -1):
+            sprices[i] = sprices[i+1] * d / u
+        lo_next = lo
+        for i in range(lo, hi + 1):
+            sprice = sprices[i]
+            if american:
+                for k in range(len(strikes)):
+                    oprices[i, k] = max(
+                        (oprices[i, k] * pd + oprices[i+1, k] * pu) * disc,
+                        pc_flags[k] * (sprice - strikes[k]),
+                    )
+            else:
+                for k in range(len(strikes)):
+                    oprices[i, k] = (oprices[i, k] * pd + oprices[i+1, k] * pu) * disc
+
+
+class Greeks(typing.NamedTuple):
+    """The price of an option along with its sensitivities, per unit of each input."""
+    price: float
+    delta: float            # d(price) / d(spot)
+    gamma: float            # d(delta) / d(spot)
+    theta: float            # d(price) / d(time), per year of calendar time passing.
+    vega: float = math.nan  # d(price) / d(ivol)
+    rho: float = math.nan   # d(price) / d(rate)
+
+
+# Bumps used for the vega and rho repricings of discrete_divs_greeks.
+_VEGA_BUMP = 1e-4
+_RHO_BUMP = 1e-4
+
+
+def discrete_divs_greeks(
+    model: str,                         # 'A' for American, 'E' for European.
+    pc_flag: float,                     # +1 for call, -1 for put.
+    spot: float,                        # Spot price of the underlying stock.
+    strike: float,                      # Strike price of the option.
+    ivol: float,                        # Implied volatility (annualised).
+    tau: float,                         # Time to expiry (years).
+    rate: float = 0,                    # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,               # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],        # Times to distribute dividends (years)
+    div_amts: list[float] = [],         # Amounts to distribute.
+    steps: int = 1000,                  # Number of steps in the tree, eg [0, 1, ..., 100].
+    vega_rho: bool = False,             # Whether to also compute vega and rho.
+    lattice: str = 'CRR',               # Lattice family, one of LATTICES.
+    width: float = math.inf,            # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+    schedule: DividendSchedule = None,  # In place of div_yield, div_times and div_amts, for the same steps.
+) -> Greeks:
+    """
+    The price from discrete_divs, along with delta, gamma and theta read off the nodes
+    at timesteps 1 and 2 of the same tree. If vega_rho is set, vega and rho are found
+    by forward differences, repricing once with the volatility bumped and once with the
+    rate bumped, sharing the dividend factors with the original tree.
+
+    Note that the tree treats discrete dividends as percentages of the spot, so delta
+    and gamma here hold those percentages fixed, rather than the dollar amounts.
+    """
+    assert model in 'AE'
+    assert lattice in LATTICES
+    assert len(div_times) == len(div_amts)
+    assert steps >= 2
+
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    divs = _schedule_factors(schedule, spot, tau, div_yield, div_times, div_amts, steps, lattice)
+    price, delta, gamma, theta = _discrete_divs_greeks_tree(model, pc_flag, spot, strike, ivol, tau, rate, divs, lattice, width)
+    if not vega_rho:
+        return Greeks(price, delta, gamma, theta)
+
+    vega = (_discrete_divs_tree(model, pc_flag, spot, strike, ivol + _VEGA_BUMP, tau, rate, divs, lattice, width) - price) / _VEGA_BUMP
+    rho = (_discrete_divs_tree(model, pc_flag, spot, strike, ivol, tau, rate + _RHO_BUMP, divs, lattice, width) - price) / _RHO_BUMP
+    return Greeks(price, delta, gamma, theta, vega, rho)
+
+
+def binomial_tree_greeks(
+    model: str,               # 'A' for American, 'E' for European.
+    pc_flag: float,           # +1 for call, -1 for put.
+    spot: float,              # Spot price of the underlying stock.
+    strike: float,            # Strike price of the option.
+    ivol: float,              # Implied volatility (annualised).
+    tau: float,               # Time to expiry (years).
+    rate: float = 0,          # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,     # Dividend yield (annualised, continuously compounding).
+    steps: int = 1000,        # Number of steps in the tree, eg [0, 1, ..., 100].
+    vega_rho: bool = False,   # Whether to also compute vega and rho.
+    lattice: str = 'CRR',     # Lattice family, one of LATTICES.
+    width: float = math.inf,  # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+) -> Greeks:
+    """The price from binomial_tree, along with its Greeks: see discrete_divs_greeks."""
+    return discrete_divs_greeks(
+        model, pc_flag, spot, strike, ivol, tau, rate, div_yield,
+        steps=steps, vega_rho=vega_rho, lattice=lattice, width=width,
+    )
+
+
+@numba.njit
+def _discrete_divs_greeks_tree(model, pc_flag, spot, strike, ivol, tau, rate, divs, lattice, width):
+    """
+    The tree of discrete_divs, returning (price, delta, gamma, theta). The two nodes at
+    timestep 1 give delta, the three nodes at timestep 2 give gamma, and the middle
+    node at timestep 2 gives theta. That node is not quite at the spot, since the
+    dividends paid over the first two steps have been taken off, so we first correct its
+    value back to the spot using delta and gamma.
+    """
+    steps = len(divs)
+    Δt = tau / steps
+    u, d, R, pu, pd = _tree_params(lattice, spot, strike, ivol, tau, rate, divs)
+    sprices, oprices = _discrete_divs_leaves(pc_flag, spot, strike, u, d, divs)
+    american = model == 'A'
+    _backward_induction(american, pc_flag, strike, u, d, R, pu, pd, divs, sprices, oprices, steps, 2, width, np.empty(0))
+    s2, v2 = sprices[:3].copy(), oprices[:3].copy()
+    _backward_induction(american, pc_flag, strike, u, d, R, pu, pd, divs, sprices, oprices, 2, 1, width, np.empty(0))
+    s1, v1 = sprices[:2].copy(), oprices[:2].copy()
+    _backward_induction(american, pc_flag, strike, u, d, R, pu, pd, divs, sprices, oprices, 1, 0, width, np.empty(0))
+    s0, v0 = sprices[:1], oprices[:1]
+    assert abs(s0[0] - spot) < 1e-4
+
+    delta = (v1[1] - v1[0]) / (s1[1] - s1[0])
+    gamma = (
+        (v2[2] - v2[1]) / (s2[2] - s2[1])
+        - (v2[1] - v2[0]) / (s2[1] - s2[0])
+    ) / ((s2[2] - s2[0]) / 2)
+    ds = s2[1] - s0[0]
+    theta = (v2[1] - delta * ds - gamma * ds**2 / 2 - v0[0]) / (2 * Δt)
+    return v0[0], delta, gamma, theta
+
+
+def discrete_divs_strikes_greeks(
+    model: str,                         # 'A' for American, 'E' for European.
+    pc_flag,                            # +1 for call, -1 for put.
+    spot: float,                        # Spot price of the underlying stock.
+    strike,                             # Strike price of the option.
+    ivol: float,                        # Implied volatility (annualised).
+    tau: float,                         # Time to expiry (years).
+    rate: float = 0,                    # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,               # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],        # Times to distribute dividends (years)
+    div_amts: list[float] = [],         # Amounts to distribute.
+    steps: int = 1000,                  # Number of steps in the tree, eg [0, 1, ..., 100].
+    vega_rho: bool = False,             # Whether to also compute vega and rho.
+    lattice: str = 'CRR',               # Lattice family, one of LATTICES.
+    width: float = math.inf,            # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+    schedule: DividendSchedule = None,  # In place of div_yield, div_times and div_amts, for the same steps.
+) -> Greeks:
+    """
+    The Greeks of discrete_divs_greeks for every strike of an expiry at once, as Greeks
+    of arrays: pc_flag and strike may be arrays (broadcast against each other), and
+    each field has their shape.
+
+    As in discrete_divs_strikes, one backward induction runs over every strike, and the
+    delta, gamma and theta of each are read off its column at timesteps 1 and 2. The
+    bumped repricings for vega and rho are discrete_divs_strikes trees. With the LR
+    lattice, or too few strikes, each strike gets its own tree, sharing only the
+    dividend factors.
+    """
+    assert model in 'AE'
+    assert lattice in LATTICES
+    assert len(div_times) == len(div_amts)
+    assert steps >= 2
+
+    pc_flag, strike = np.broadcast_arrays(np.asarray(pc_flag, dtype=np.float64), np.asarray(strike, dtype=np.float64))
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    divs = _schedule_factors(schedule, spot, tau, div_yield, div_times, div_amts, steps, lattice)
+    if strike.size < _STRIKES_BATCH_MIN or lattice == 'LR':
+        values = np.array([
+            _discrete_divs_greeks_tree(model, pc, spot, k, ivol, tau, rate, divs, lattice, width)
+            for pc, k in zip(pc_flag.flat, strike.flat)
+        ]).reshape(-1, 4).T
+    else:
+        values = _discrete_divs_strikes_greeks_tree(
+            model == 'A', pc_flag.flatten(), spot, strike.flatten(), ivol, tau, rate, divs, lattice, width,
+        )
+    price, delta, gamma, theta = [arr.reshape(strike.shape) for arr in values]
+    if not vega_rho:
+        return Greeks(price, delta, gamma, theta)
+
+    vega = (_strikes_prices(model, pc_flag, spot, strike, ivol + _VEGA_BUMP, tau, rate, divs, lattice, width) - price) / _VEGA_BUMP
+    rho = (_strikes_prices(model, pc_flag, spot, strike, ivol, tau, rate + _RHO_BUMP, divs, lattice, width) - price) / _RHO_BUMP
+    return Greeks(price, delta, gamma, theta, vega, rho)
+
+
+@numba.njit(nogil=True)
+def _discrete_divs_strikes_greeks_tree(american, pc_flags, spot, strikes, ivol, tau, rate, divs, lattice, width):
+    """
+    The tree of discrete_divs_strikes_greeks (not for LR), returning the arrays
+    (price, delta, gamma, theta) read off the nodes as in _discrete_divs_greeks_tree.
+    """
+    steps = len(divs)
+    Δt = tau / steps
+    u, d, R, pu, pd = _tree_params(lattice, spot, math.nan, ivol, tau, rate, divs)
+    sprices, oprices = _strikes_leaves(pc_flags, spot, strikes, u, d, divs)
+    half = _truncation_halfwidth(steps, pu, pd, width)
+    _strikes_induction(american, pc_flags, strikes, u, d, R, pu, pd, divs, sprices, oprices, steps, 2, half)
+    s2, v2 = sprices[:3].copy(), oprices[:3].copy()
+    _strikes_induction(american, pc_flags, strikes, u, d, R, pu, pd, divs, sprices, oprices, 2, 1, half)
+    s1, v1 = sprices[:2].copy(), oprices[:2].copy()
+    _strikes_induction(american, pc_flags, strikes, u, d, R, pu, pd, divs, sprices, oprices, 1, 0, half)
+    s0, v0 = sprices[0], oprices[0]
+    assert abs(s0 - spot) < 1e-4
+
+    delta = (v1[1] - v1[0]) / (s1[1] - s1[0])
+    gamma = (
+        (v2[2] - v2[1]) / (s2[2] - s2[1])
+        - (v2[1] - v2[0]) / (s2[1] - s2[0])
+    ) / ((s2[2] - s2[0]) / 2)
+    ds = s2[1] - s0
+    theta = (v2[1] - delta * ds - gamma * ds**2 / 2 - v0) / (2 * Δt)
+    return v0.copy(), delta, gamma, theta
+
+
+def american_implied_vol(
+    price: float,                 # Market price of the option.
+    pc_flag: float,               # +1 for call, -1 for put.
+    spot: float,                  # Spot price of the underlying stock.
+    strike: float,                # Strike price of the option.
+    tau: float,                   # Time to expiry (years).
+    rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years)
+    div_amts: list[float] = [],   # Amounts to distribute.
+    steps: int = 1000,            # Number of steps in the final tree.
+    model: str = 'A',             # 'A' for American, 'E' for European.
+    tol: float = 1e-6,            # Absolute tolerance on the volatility.
+    max_iter: int = 50,           # Maximum number of iterations per step count.
+    lattice: str = 'CRR',         # Lattice family, one of LATTICES.
+    width: float = math.inf,      # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+) -> tuple[float, int, int, int]:
+    """
+    Implied volatility of a single option under discrete_divs. Returns a tuple
+    (ivol, status, iterations, tree_evals): see american_implied_vol_batch.
+    """
+    ivol, status, iterations, tree_evals = american_implied_vol_batch(
+        price, pc_flag, spot, strike, tau, rate, div_yield, div_times, div_amts,
+        steps=steps, model=model, tol=tol, max_iter=max_iter, lattice=lattice, width=width,
+    )
+    return float(ivol), int(status), int(iterations), int(tree_evals)
+
+
+def american_implied_vol_batch(
+    price,                        # Market price of the option.
+    pc_flag,                      # +1 for call, -1 for put.
+    spot: float,                  # Spot price of the underlying stock.
+    strike,                       # Strike price of the option.
+    tau: float,                   # Time to expiry (years).
+    rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years)
+    div_amts: list[float] = [],   # Amounts to distribute.
+    steps: int = 1000,            # Number of steps in the final tree.
+    model: str = 'A',             # 'A' for American, 'E' for European.
+    tol: float = 1e-6,            # Absolute tolerance on the volatility.
+    max_iter: int = 50,           # Maximum number of iterations per step count.
+    lattice: str = 'CRR',         # Lattice family, one of LATTICES.
+    width: float = math.inf,      # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Invert discrete_divs for the implied volatility, across a chain of options on the
+    same underlying and expiry: price, pc_flag and strike may be arrays (broadcast
+    against each other), while the remaining arguments are shared by the whole chain.
+    Returns a tuple of arrays (ivol, status, iterations, tree_evals), where status is
+    one of the IV_* codes, and iterations and tree_evals count the root-finding steps
+    and the trees priced for each quote.
+
+    Each quote is warm-started from the European implied volatility (of the spot less
+    the present value of the discrete dividends), and then solved on a coarse-to-fine
+    schedule of step counts, eg 62, 250 and then 1000 steps. At each step count we
+    bracket the root starting from the previous estimate, and then narrow the bracket
+    by the Illinois variant of regula falsi. The coarse trees are cheap and do most of
+    the work, so that only a handful of full trees are priced per quote. The dividend
+    factors for each step count are computed once and shared by every quote.
+    """
+    assert model in 'AE'
+    assert lattice in LATTICES
+    assert len(div_times) == len(div_amts)
+    assert steps >= 1
+
+    price, pc_flag, strike = np.broadcast_arrays(*[
+        np.asarray(arg, dtype=np.float64) for arg in (price, pc_flag, strike)
+    ])
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+
+    # Coarse-to-fine step counts, each a quarter of the next.
+    levels = [steps]
+    while levels[0] // 4 >= 50:
+        levels.insert(0, levels[0] // 4)
+    levels = [_lattice_steps(lattice, n) for n in levels]
+    schedules = [_dividend_factors(spot, tau, div_yield, div_times, div_amts, n) for n in levels]
+
+    # Warm start from the European implied volatility, on the spot less the present
+    # value of the dividends paid before expiry.
+    paid = (0 <= div_times) & (div_times < tau)
+    escrowed_spot = spot - np.sum(div_amts[paid] * np.exp(-rate * div_times[paid]))
+    guess, guess_status = implied_vol_batch(price, pc_flag, escrowed_spot, strike, tau, rate, div_yield)
+    guess = np.where(guess_status == IV_OK, guess, 0.3)
+
+    ivol = np.full(price.shape, np.nan)
+    status = np.full(price.shape, IV_NOT_CONVERGED, dtype=np.int8)
+    iterations = np.zeros(price.shape, dtype=np.int64)
+    tree_evals = np.zeros(price.shape, dtype=np.int64)
+    for idx in np.ndindex(price.shape):
+        ivol[idx], status[idx], iterations[idx], tree_evals[idx] = _american_implied_vol(
+            model, price[idx], pc_flag[idx], spot, strike[idx], tau, rate,
+            schedules, guess[idx], tol, max_iter, lattice, width,
+        )
+
+    return ivol, status, iterations, tree_evals
+
+
+# Bounds on the volatility searched by american_implied_vol.
+_AMERICAN_IV_MIN = 1e-4
+_AMERICAN_IV_MAX = 10.0
+
+
+def _american_implied_vol(model, price, pc_flag, spot, strike, tau, rate, schedules, guess, tol, max_iter, lattice, width):
+    """Solve a single quote for american_implied_vol_batch."""
+    if not (spot > 0 and strike > 0 and tau > 0 and abs(pc_flag) == 1 and math.isfinite(price)):
+        return math.nan, IV_BAD_INPUT, 0, 0
+
+    # No-arbitrage bounds: the option is worth at least its intrinsic value (when it may
+    # be exercised now), and a call is worth less than the stock, a put less than the strike.
+    if price < (max(0, pc_flag * (spot - strike)) if model == 'A' else 0):
+        return math.nan, IV_BELOW_INTRINSIC, 0, 0
+    if price >= (spot if pc_flag > 0 else strike):
+        return math.nan, IV_ABOVE_MAX, 0, 0
+
+    iterations = 0
+    tree_evals = 0
+    sigma = min(max(guess, _AMERICAN_IV_MIN), _AMERICAN_IV_MAX)
+    slope = None
+    for level, divs in enumerate(schedules):
+        level_tol = tol if level == len(schedules) - 1 else max(tol, 1e-4)
+
+        def objective(sigma):
+            nonlocal tree_evals
+            tree_evals += 1
+            return _discrete_divs_tree(model, pc_flag, spot, strike, sigma, tau, rate, divs, lattice, width) - price
+
+        # Bracket the root, walking away from the current estimate in the direction of
+        # the root, and doubling the stride each time. The price is increasing in vol.
+        # The first stride is a slight overshoot of the Newton step using the vega from
+        # the previous level, so that it usually lands just past the root.
+        a, fa = sigma, objective(sigma)
+        b, fb = a, fa
+        direction = -1 if fa > 0 else 1
+        stride = 0.1 * sigma if slope is None else 1.5 * abs(fa / slope)
+        stride = max(stride, 10 * tol)
+        while fa * fb > 0 or fb == fa:
+            if fb == 0:
+                break
+            a, fa = b, fb
+            b = min(max(a + direction * stride, _AMERICAN_IV_MIN), _AMERICAN_IV_MAX)
+            if b == a:
+                status = IV_BELOW_INTRINSIC if direction < 0 else IV_ABOVE_MAX
+                return math.nan, status, iterations, tree_evals
+            fb = objective(b)
+            stride *= 2
+            iterations += 1
+
+        # Illinois algorithm: regula falsi, halving the weight of an endpoint which has
+        # been retained twice in a row.
+        estimate, side = b, 0
+        converged = fb == 0
+        for _ in range(max_iter):
+            if converged:
+                break
+            iterations += 1
+            slope = (fb - fa) / (b - a)
+            c = b - fb / slope
+            fc = objective(c)
+            # Converged once the next secant step would be within tolerance.
+            converged = abs(fc / slope) <= level_tol or abs(b - a) <= level_tol
+            estimate = c
+            if fc * fb > 0:
+                b, fb = c, fc
+                if side == -1:
+                    fa /= 2
+                side = -1
+            else:
+                a, fa = c, fc
+                if side == 1:
+                    fb /= 2
+                side = 1
+
+        if not converged:
+            return math.nan, IV_NOT_CONVERGED, iterations, tree_evals
+
+        sigma = estimate
+
+    return sigma, IV_OK, iterations, tree_evals
+
+
+class Ladder(typing.NamedTuple):
+    """Option prices and Greeks across a ladder of spot prices, from one PDE solve."""
+    spot: np.ndarray
+    price: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+
+
+# Half-width of the PDE grid, in standard deviations of the log spot at expiry.
+_PDE_WIDTH = 6.0
+
+# Number of fully implicit steps taken after the payoff, before switching to
+# Crank-Nicolson (Rannacher smoothing), and the tolerance of the penalty iteration.
+_PDE_IMPLICIT_STEPS = 4
+_PDE_PENALTY_TOL = 1e-8
+
+
+def discrete_divs_pde(
+    model: str,                   # 'A' for American, 'E' for European.
+    pc_flag: float,               # +1 for call, -1 for put.
+    spot: float,                  # Spot price of the underlying stock.
+    strike: float,                # Strike price of the option.
+    ivol: float,                  # Implied volatility (annualised).
+    tau: float,                   # Time to expiry (years).
+    rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years)
+    div_amts: list[float] = [],   # Amounts to distribute.
+    space_steps: int = 400,       # Number of intervals in the log-spot grid.
+    time_steps: int = 200,        # Number of time steps.
+) -> float:
+    """
+    The option priced as in discrete_divs, by solving the Black-Scholes PDE on a grid
+    rather than with a tree: see discrete_divs_pde_ladder.
+    """
+    ladder = discrete_divs_pde_ladder(
+        model, pc_flag, spot, strike, ivol, tau, rate, div_yield, div_times, div_amts,
+        space_steps, time_steps,
+    )
+    return ladder.price[len(ladder.price) // 2]
+
+
+def discrete_divs_pde_ladder(
+    model: str,                   # 'A' for American, 'E' for European.
+    pc_flag: float,               # +1 for call, -1 for put.
+    spot: float,                  # Spot price of the underlying stock.
+    strike: float,                # Strike price of the option.
+    ivol: float,                  # Implied volatility (annualised).
+    tau: float,                   # Time to expiry (years).
+    rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years)
+    div_amts: list[float] = [],   # Amounts to distribute.
+    space_steps: int = 400,       # Number of intervals in the log-spot grid.
+    time_steps: int = 200,        # Number of time steps.
+) -> Ladder:
+    """
+    Solve the Black-Scholes PDE for the option of discrete_divs, returning the prices,
+    deltas and gammas at every spot of the grid (the middle of which is the given spot).
+
+    The grid is uniform in the log of the spot, spanning _PDE_WIDTH standard deviations
+    either side of the spot (and the strike), and is stepped back from expiry by Crank-
+    Nicolson, after a few fully implicit steps to damp the kink in the payoff. The time
+    steps are quadratically spaced, finer towards expiry. Each step is a tridiagonal
+    solve, and for an American option early exercise is imposed by the penalty method,
+    which repeats the solve with the exercised nodes pinned to their intrinsic value
+    until the set of exercised nodes stops changing.
+
+    The dividends are converted into percentages just as in discrete_divs, and are paid
+    at their exact times: the time grid is split at each dividend, where the values are
+    shifted across by the drop in the log spot, interpolating with a cubic spline.
+    """
+    assert model in 'AE'
+    assert len(div_times) == len(div_amts)
+    assert space_steps >= 4 and time_steps >= 1
+
+    # Convert the dividends into factors by which the spot drops, in order of payment.
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    paid = (0 <= div_times) & (div_times < tau)
+    order = np.argsort(div_times[paid], kind='stable')
+    div_times, div_amts = div_times[paid][order], div_amts[paid][order]
+    div_factors = np.empty(len(div_times))
+    div_sofar = 1.0
+    for j, (time, amt) in enumerate(zip(div_times, div_amts)):
+        div_factors[j] = 1 + amt / (spot / (div_sofar * math.exp(div_yield * time)))
+        div_sofar *= div_factors[j]
+
+    # Log-spot grid, with the spot on the middle node.
+    space_steps += space_steps % 2
+    half_width = max(_PDE_WIDTH * ivol * tau**0.5, abs(math.log(strike / spot)) + ivol * tau**0.5)
+    half_width += np.sum(np.log(div_factors))
+    h = 2 * half_width / space_steps
+    x = math.log(spot) + h * (np.arange(space_steps + 1) - space_steps // 2)
+
+    # Times to expiry of the steps, closer together near expiry where the early exercise
+    # boundary moves fastest, and the times to expiry of the dividends.
+    time_grid = tau * (np.arange(time_steps + 1) / time_steps)**2
+    div_taus = tau - div_times[::-1]
+
+    # Step back from expiry, one segment between dividends at a time, starting from the
+    # payoff averaged over the cell around each node. (Sampling the payoff at the nodes
+    # instead puts an error of O(h^2) with a large constant at the kink.)
+    values = _cell_average_payoff(pc_flag, strike, x - h / 2, x + h / 2) / h
+    boundaries = np.concatenate([[0.0], div_taus, [tau]])
+    remaining_div = 1.0
+    implicit_steps = _PDE_IMPLICIT_STEPS
+    for j in range(len(boundaries) - 1):
+        start, stop = boundaries[j], boundaries[j+1]
+        if stop > start:
+            inside = time_grid[(start < time_grid) & (time_grid < stop)]
+            taus = np.concatenate([[start], inside, [stop]])
+            _pde_segment(
+                model == 'A', pc_flag, strike, ivol, rate, div_yield, x, values,
+                taus, remaining_div, implicit_steps,
+            )
+            implicit_steps = 0
+        if j < len(div_times):
+            # Cross the dividend: just before it, a spot of S is worth what S / factor is after.
+            factor = div_factors[len(div_times) - 1 - j]
+            values[:] = scipy.interpolate.CubicSpline(x, values)(x - math.log(factor))
+            remaining_div *= factor
+            if model == 'A':
+                np.maximum(values, pc_flag * (np.exp(x) - strike), out=values)
+
+    # Greeks by central differences in the log spot.
+    spots = np.exp(x[1:-1])
+    dv_dx = (values[2:] - values[:-2]) / (2 * h)
+    d2v_dx2 = (values[2:] - 2 * values[1:-1] + values[:-2]) / h**2
+    return Ladder(spots, values[1:-1], dv_dx / spots, (d2v_dx2 - dv_dx) / spots**2)
+
+
+def _cell_average_payoff(pc_flag, strike, lo, hi):
+    """The integral of the payoff over log spots from lo to hi."""
+    log_strike = math.log(strike)
+    if pc_flag > 0:
+        lo = np.maximum(lo, log_strike)
+        return np.where(hi > lo, np.exp(hi) - np.exp(lo) - strike * (hi - lo), 0)
+    hi = np.minimum(hi, log_strike)
+    return np.where(hi > lo, strike * (hi - lo) - np.exp(hi) + np.exp(lo), 0)
+
+
+@numba.njit
+def _pde_segment(american, pc_flag, strike, ivol, rate, div_yield, x, values, taus, remaining_div, implicit_steps):
+    """
+    Step the values on the grid x back in time, in place, from time to expiry taus[0]
+    through each of taus, with no dividends paid in between. remaining_div is the
+    product of the dividend factors still to be paid before expiry, used for the
+    boundary values. The first implicit_steps steps are fully implicit, the rest
+    Crank-Nicolson.
+    """
+    m = len(x)
+    h = x[1] - x[0]
+    spots = np.exp(x)
+    payoff = np.maximum(0, pc_flag * (spots - strike))
+
+    # The PDE is V_tau = a2 V_xx + a1 V_x - rate V, and L below is its discretisation
+    # L V[i] = lo V[i-1] + mid V[i] + hi V[i+1] on the interior.
+    a2 = ivol**2 / 2
+    a1 = rate - div_yield - ivol**2 / 2
+    lo = a2 / h**2 - a1 / (2 * h)
+    mid = -2 * a2 / h**2 - rate
+    hi = a2 / h**2 + a1 / (2 * h)
+
+    rhs = np.empty(m - 2)
+    pinned_rhs = np.empty(m - 2)
+    diag = np.empty(m - 2)
+    solution = np.empty(m - 2)
+    scratch = np.empty(m - 2)
+    exercised = np.zeros(m - 2, dtype=np.bool_)
+    penalty = 1 / _PDE_PENALTY_TOL
+    for n in range(len(taus) - 1):
+        theta = 1.0 if n < implicit_steps else 0.5
+        tau_now = taus[n+1]
+        dtau = taus[n+1] - taus[n]
+
+        # Right hand side (I + (1 - theta) dtau L) V, on the interior.
+        for i in range(1, m - 1):
+            rhs[i-1] = values[i] + (1 - theta) * dtau * (lo * values[i-1] + mid * values[i] + hi * values[i+1])
+
+        # Dirichlet boundaries, far enough out that the option is either worthless or
+        # worth its forward intrinsic value (or, if American, its intrinsic value).
+        disc = math.exp(-rate * tau_now)
+        fwd_factor = math.exp(-div_yield * tau_now) / remaining_div
+        for i in (0, m - 1):
+            values[i] = max(0, pc_flag * (spots[i] * fwd_factor - strike * disc))
+            if american:
+                values[i] = max(values[i], payoff[i])
+
+        # Solve (I - theta dtau L) V = rhs, moving the boundary values to the right.
+        sub, sup = -theta * dtau * lo, -theta * dtau * hi
+        rhs[0] -= sub * values[0]
+        rhs[m-3] -= sup * values[m-1]
+
+        # For an American option, the penalty iteration pins the nodes which are below
+        # their intrinsic value to it, and solves again until the pinned set is stable,
+        # starting from the set pinned on the last step.
+        for _ in range(100):
+            for i in range(m - 2):
+                diag[i] = 1 - theta * dtau * mid + (penalty if exercised[i] else 0)
+                pinned_rhs[i] = rhs[i] + (penalty * payoff[i+1] if exercised[i] else 0)
+            _thomas(sub, diag, sup, pinned_rhs, solution, scratch)
+            if not american:
+                break
+            changed = False
+            for i in range(m - 2):
+                below = solution[i] < payoff[i+1]
+                changed |= below != exercised[i]
+                exercised[i] = below
+            if not changed:
+                break
+        values[1:m-1] = solution
+
+
+@numba.njit
+def _thomas(sub, diag, sup, rhs, out, scratch):
+    """
+    Solve the tridiagonal system with constant sub- and super-diagonals sub and sup,
+    and diagonal diag, for the right hand side rhs, into out (scratch is overwritten).
+    """
+    n = len(diag)
+    scratch[0] = sup / diag[0]
+    out[0] = rhs[0] / diag[0]
+    for i in range(1, n):
+        inv = 1 / (diag[i] - sub * scratch[i-1])
+        scratch[i] = sup * inv
+        out[i] = (rhs[i] - sub * out[i-1]) * inv
+    for i in range(n - 2, -1, -1):
+        out[i] -= scratch[i] * out[i+1]
+
+
 # Wrapper function so I can replace discrete_divs_cy with my thing.
 def discrete_divs_cy(
     model: int,  # 1 for American, 2 (should this be 0?) for European
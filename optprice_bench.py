@@ -0,0 +1,483 @@
+import itertools
+import math
+import os
+import timeit
+
+import numpy as np
+
+import optprice
+
+
+def timed(fn, *args, **kwargs) -> float:
+    """Best of a few runs of fn(*args, **kwargs), in seconds, after a warm-up call."""
+    call = lambda: fn(*args, **kwargs)
+    if timeit.timeit(call, number=1) > 1:
+        # Slow enough that one more run is accurate, and more would take too long.
+        return timeit.timeit(call, number=1)
+    number = 1
+    while timeit.timeit(call, number=number) < 0.2:
+        number *= 10
+    return min(timeit.repeat(call, number=number, repeat=3)) / number
+
+
+def binomial_tree_lists(model, pc_flag, spot, strike, ivol, tau, rate=0, div_yield=0, steps=1000):
+    """The original optprice.binomial_tree, which rebuilt Python lists on every timestep."""
+    Δt = tau / steps
+    u = math.exp(ivol * Δt**0.5)
+    d = 1 / u
+    R = math.exp(rate * Δt)
+    Y = math.exp(div_yield * Δt)
+    pu = (R - d) / (u - d)
+    pd = 1 - pu
+    sprices = [spot * u**i * d**(steps - i) / Y**steps for i in range(steps + 1)]
+    oprices = [max(0, pc_flag * (sprice - strike)) for sprice in sprices]
+    for t in range(steps - 1, -1, -1):
+        sprices = [sprice * u * Y for sprice in sprices[:-1]]
+        oprices = [
+            (oprices[i] * pd + oprices[i+1] * pu) / R
+            for i in range(len(oprices) - 1)
+        ]
+        if model == 'A':
+            oprices = [
+                max(oprice, pc_flag * (sprice - strike))
+                for sprice, oprice in zip(sprices, oprices)
+            ]
+    return oprices[0]
+
+
+def bench_binomial_tree():
+    print("====================")
+    print("binomial_tree: Python lists vs in-place kernel")
+    print("====================")
+    print(f"{'steps':>7} {'lists (s)':>12} {'kernel (s)':>12} {'speed-up':>9} {'|diff|':>9}")
+    args = ('A', -1, 100, 100, 0.3, 1.0, 0.05, 0.02)
+    for steps in [100, 1000, 10000]:
+        old = timed(binomial_tree_lists, *args, steps=steps)
+        new = timed(optprice.binomial_tree, *args, steps=steps)
+        diff = abs(binomial_tree_lists(*args, steps=steps) - optprice.binomial_tree(*args, steps=steps))
+        print(f"{steps:>7} {old:>12.6f} {new:>12.6f} {old / new:>8.1f}x {diff:>9.1e}")
+
+
+def bench_price_chain():
+    import v1_option_pricing_cy
+    from v1_option_pricing_cy_chain_test import random_chain
+
+    print("====================")
+    print("v1_option_pricing_cy.price_chain: scaling with threads")
+    print("====================")
+    n = 2000
+    chain = random_chain(n)
+    chain['steps'][:] = 500
+    out = np.empty(n)
+    print(f"{'threads':>7} {'time (s)':>10} {'options/s':>10} {'speed-up':>9}")
+    one_thread = None
+    threads = 1
+    while threads <= (os.cpu_count() or 1):
+        elapsed = timed(v1_option_pricing_cy.price_chain, **chain, out=out, num_threads=threads)
+        one_thread = one_thread or elapsed
+        print(f"{threads:>7} {elapsed:>10.4f} {n / elapsed:>10.0f} {one_thread / elapsed:>8.1f}x")
+        threads *= 2
+
+
+def bench_strikes():
+    print("====================")
+    print("discrete_divs_strikes: one tree per strike vs one sweep for all strikes")
+    print("====================")
+    args = (100.0, 0.3, 1.0, 0.05, 0.0, np.array([0.25, 0.75]), np.array([1.0, 1.0]), 1000)
+    print(f"{'strikes':>7} {'per strike (s)':>15} {'batched (s)':>12} {'speed-up':>9}")
+    for n in [1, 10, 60]:
+        strikes = np.linspace(50, 150, n)
+        per_strike = timed(lambda: [optprice.discrete_divs('A', -1.0, *args[:1], k, *args[1:]) for k in strikes])
+        batched = timed(optprice.discrete_divs_strikes, 'A', -1.0, args[0], strikes, *args[1:])
+        print(f"{n:>7} {per_strike:>15.5f} {batched:>12.5f} {per_strike / batched:>8.1f}x")
+
+
+def bench_bbsr():
+    import v1_option_pricing_cy
+
+    print("====================")
+    print("bbsr: error against time, for American puts across strikes 80-120")
+    print("====================")
+    strikes = np.linspace(80, 120, 9)
+    args = (100.0, 0.3, 1.0, 0.05, 0.02)
+    spot, ivol, tau, rate, div_yield = args
+    engines = {
+        'binomial_tree': lambda k, n: optprice.binomial_tree('A', -1.0, spot, k, ivol, tau, rate, div_yield, n),
+        'binomial_tree_bbsr': lambda k, n: optprice.binomial_tree_bbsr('A', -1.0, spot, k, ivol, tau, rate, div_yield, n),
+        'option_binomial': lambda k, n: v1_option_pricing_cy.option_binomial(1, -1.0, spot, k, rate, ivol, tau, n, div_yield),
+        'option_bbsr': lambda k, n: v1_option_pricing_cy.option_bbsr(1, -1.0, spot, k, rate, ivol, tau, n, div_yield),
+    }
+    exact = np.array([engines['binomial_tree_bbsr'](k, 20000) for k in strikes])
+    print(f"{'engine':>18} {'steps':>6} {'max |error|':>12} {'time (s)':>10}")
+    for name, engine in engines.items():
+        for steps in [50, 100, 200, 1000]:
+            price = lambda: np.array([engine(k, steps) for k in strikes])
+            error = np.max(np.abs(price() - exact))
+            print(f"{name:>18} {steps:>6} {error:>12.1e} {timed(price) / len(strikes):>10.6f}")
+
+
+def bench_lattices():
+    print("====================")
+    print("lattices: error against time per lattice family, for puts across strikes 80-120")
+    print("====================")
+    strikes = np.linspace(80, 120, 9)
+    spot, ivol, tau, rate, div_yield = 100.0, 0.3, 1.0, 0.05, 0.02
+    no_divs = np.array([])
+    price = lambda model, k, n, lattice: optprice.discrete_divs(
+        model, -1.0, spot, k, ivol, tau, rate, div_yield, no_divs, no_divs, n, lattice,
+    )
+    exact = {
+        'E': optprice.black_scholes_batch(-1.0, spot, strikes, ivol, tau, rate, div_yield),
+        'A': np.array([price('A', k, 20001, 'LR') for k in strikes]),
+    }
+    print(f"{'model':>5} {'lattice':>7} {'steps':>6} {'max |error|':>12} {'time (s)':>10}")
+    for model in 'EA':
+        for lattice in optprice.LATTICES:
+            for steps in [51, 101, 201, 1001]:
+                prices = lambda: np.array([price(model, k, steps, lattice) for k in strikes])
+                error = np.max(np.abs(prices() - exact[model]))
+                print(f"{model:>5} {lattice:>7} {steps:>6} {error:>12.1e} {timed(prices) / len(strikes):>10.6f}")
+
+
+def bench_pde():
+    print("====================")
+    print("discrete_divs_pde: error against time, for an American put with two dividends")
+    print("====================")
+    args = ('A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.0, np.array([0.2, 0.6]), np.array([1.5, 1.5]))
+    exact = optprice.discrete_divs(*args, 20000)
+    print(f"{'engine':>18} {'grid':>10} {'|error|':>9} {'time (s)':>10}")
+    for steps in [250, 1000, 4000]:
+        error = abs(optprice.discrete_divs(*args, steps) - exact)
+        print(f"{'discrete_divs':>18} {steps:>10} {error:>9.1e} {timed(optprice.discrete_divs, *args, steps):>10.6f}")
+    for space_steps, time_steps in [(200, 100), (400, 200), (800, 400)]:
+        error = abs(optprice.discrete_divs_pde(*args, space_steps, time_steps) - exact)
+        elapsed = timed(optprice.discrete_divs_pde, *args, space_steps, time_steps)
+        print(f"{'discrete_divs_pde':>18} {f'{space_steps}x{time_steps}':>10} {error:>9.1e} {elapsed:>10.6f}")
+
+
+def bench_moneyness_cache():
+    import optprice_cache
+    print("====================")
+    print("optprice_cache.MoneynessCache: requoting a chain as the spot ticks")
+    print("====================")
+    strikes = np.linspace(80.0, 120.0, 21)
+    spots = 100.0 + np.cumsum(np.random.default_rng(0).normal(0, 0.05, 200))
+    taus = [0.1, 0.25, 0.5, 1.0]
+    no_divs = np.array([])
+
+    def requote():
+        cache = optprice_cache.MoneynessCache()
+        for spot in spots:
+            for tau, pc_flag in itertools.product(taus, [1.0, -1.0]):
+                cache.price('A', pc_flag, spot, strikes, 0.3, tau, 0.05, 0.02)
+        return cache
+
+    quotes = len(spots) * len(taus) * 2 * len(strikes)
+    stats = requote().stats()
+    print(f"{len(spots)} ticks of {len(taus) * 2 * len(strikes)} American options: {quotes} quotes, "
+          f"{stats.misses} curves built, {stats.hits} hits, {stats.nbytes / 2**20:.1f}MB")
+    elapsed = timed(requote) / quotes
+    tree = timed(optprice.discrete_divs, 'A', -1.0, 100.0, 100.0, 0.3, 0.5, 0.05, 0.02, no_divs, no_divs, 1000)
+    print(f"{elapsed:.1e} s per quote from the cache, against {tree:.1e} s for a 1000 step tree")
+
+
+def bench_tick_pricer():
+    import optprice_tick
+    print("====================")
+    print("optprice_tick.TickPricer: requoting one contract as the spot ticks")
+    print("====================")
+    spots = 100.0 + np.cumsum(np.random.default_rng(0).normal(0, 0.05, 10000))
+    no_divs = np.array([])
+
+    def requote():
+        pricer = optprice_tick.TickPricer('A', -1.0, 100.0, 0.3, 0.5, 0.05, 0.02)
+        for spot in spots:
+            pricer.quote(spot)
+        return pricer
+
+    rebuilds = requote().rebuilds
+    elapsed = timed(requote) / len(spots)
+    tree = timed(optprice.discrete_divs, 'A', -1.0, 100.0, 100.0, 0.3, 0.5, 0.05, 0.02, no_divs, no_divs, 1000)
+    print(f"{len(spots)} ticks from {spots.min():.2f} to {spots.max():.2f}: {rebuilds} solves")
+    print(f"{elapsed:.1e} s per tick, against {tree:.1e} s for a 1000 step tree")
+
+
+def bench_scenario_grid():
+    import optprice_scenario
+    print("====================")
+    print("optprice_scenario.scenario_grid: a 21 x 11 spot and vol grid over a chain")
+    print("====================")
+    strikes = np.linspace(80.0, 120.0, 21)
+    pc_flags = np.where(strikes < 100.0, -1.0, 1.0)
+    ivols = 0.25 + 0.5 * np.log(strikes / 100.0)**2
+    spot_shocks = np.linspace(-0.2, 0.2, 21)
+    vol_shocks = np.linspace(-0.1, 0.1, 11)
+    no_divs = np.array([])
+    scenarios = len(strikes) * len(spot_shocks) * len(vol_shocks)
+
+    for div_times, div_amts in [(no_divs, no_divs), (np.array([0.25]), np.array([1.0]))]:
+        elapsed = timed(
+            optprice_scenario.scenario_grid, 'A', pc_flags, 100.0, strikes, ivols, 0.5, 0.05, 0.02,
+            div_times, div_amts, spot_shocks, vol_shocks,
+        )
+        tree = timed(optprice.discrete_divs, 'A', -1.0, 100.0, 100.0, 0.3, 0.5, 0.05, 0.02, div_times, div_amts, 1000)
+        print(f"{len(div_times)} dividends: {scenarios} scenarios in {elapsed:.2f}s, "
+              f"against {scenarios * tree:.2f}s for a 1000 step tree each")
+
+
+def bench_portfolio():
+    import optprice_portfolio
+    print("====================")
+    print("optprice_portfolio.value_portfolio: a synthetic book of 100k positions")
+    print("====================")
+    rng = np.random.default_rng(0)
+    names = [f"S{i:02}" for i in range(20)]
+    underlyings = {
+        name: optprice_portfolio.Underlying(spot, 0.01, [0.3, 0.8], [spot / 100, spot / 100])
+        for name, spot in zip(names, rng.uniform(20.0, 200.0, len(names)))
+    }
+    n = 100_000
+    underlying = rng.choice(names, n)
+    spot = np.array([underlyings[name].spot for name in underlying])
+    moneyness = rng.integers(-10, 11, n) / 50
+    tau = rng.choice([0.1, 0.25, 0.5, 1.0, 2.0], n)
+    positions = optprice_portfolio.make_positions(
+        rng.choice(['flow', 'exotics', 'hedge'], n), underlying, 'A', rng.choice([-1.0, 1.0], n),
+        np.round(spot * (1 + moneyness), 2), 0.25 + 0.5 * moneyness**2 + 0.02 * np.sqrt(tau), tau,
+        rng.integers(-100, 101, n),
+    )
+
+    valuation = optprice_portfolio.value_portfolio(positions, underlyings, 0.05, greeks=False)
+    tree = timed(optprice.discrete_divs_greeks, 'A', -1.0, 100.0, 100.0, 0.3, 0.5, 0.05, 0.01, [0.3, 0.8], [1.0, 1.0], 1000)
+    print(f"{n} positions on {valuation.contracts} distinct contracts, in {len(valuation.by_book)} books by underlying")
+    for greeks in [False, True]:
+        elapsed = timed(optprice_portfolio.value_portfolio, positions, underlyings, 0.05, greeks=greeks)
+        print(f"{'price, delta, gamma and theta' if greeks else 'prices only'}: {elapsed:.2f}s, "
+              f"against {n * tree:.0f}s for a 1000 step tree per position")
+
+    # The contracts of a group share one tree across their strikes, which pays once a
+    # group is a chain of strikes at one volatility.
+    strikes = np.linspace(80.0, 120.0, 41)
+    args = (0.3, 0.5, 0.05, 0.01, [0.3], [1.0], 1000)
+    each = timed(lambda: [optprice.discrete_divs_greeks('A', -1.0, 100.0, k, *args) for k in strikes])
+    swept = timed(optprice.discrete_divs_strikes_greeks, 'A', -1.0, 100.0, strikes, *args)
+    print(f"Greeks of {len(strikes)} strikes at one volatility: {each:.3f}s a tree per strike, {swept:.3f}s in one tree")
+
+
+def bench_dividend_schedule():
+    print("====================")
+    print("dividend_schedule: a chain of strikes on quarterly dividends, with and without sharing the setup")
+    print("====================")
+    strikes = np.linspace(80.0, 120.0, 41)
+    no_divs = np.array([])
+    for tau, steps in [(1.0, 1000), (10.0, 10000)]:
+        div_times = np.arange(0.125, tau, 0.25)
+        div_amts = np.full(len(div_times), 0.5)
+        setup = timed(optprice.dividend_schedule, 100.0, tau, 0.01, div_times, div_amts, steps)
+        schedule = optprice.dividend_schedule(100.0, tau, 0.01, div_times, div_amts, steps)
+        args = (0.3, tau, 0.05, 0.01)
+        each = timed(lambda: [
+            optprice.discrete_divs('A', -1.0, 100.0, k, *args, div_times, div_amts, steps, 'CRR', optprice.TRUNCATION_WIDTH)
+            for k in strikes
+        ])
+        shared = timed(lambda: [
+            optprice.discrete_divs('A', -1.0, 100.0, k, *args, no_divs, no_divs, steps, 'CRR', optprice.TRUNCATION_WIDTH, schedule)
+            for k in strikes
+        ])
+        print(f"{len(div_times)} dividends, {steps} steps: setup {setup:.1e}s, {len(strikes)} strikes "
+              f"{each:.3f}s setting up per strike, {shared:.3f}s sharing one schedule")
+
+
+def bench_adaptive():
+    print("====================")
+    print("discrete_divs_adaptive: fixed 1000 steps vs a tolerance, across expiries")
+    print("====================")
+    no_divs = np.array([])
+    print(f"{'tau':>5} {'engine':>14} {'steps':>6} {'|error|':>9} {'time (s)':>10}")
+    for tau in [0.02, 0.1, 0.5, 2.0]:
+        args = ('A', -1.0, 100.0, 105.0, 0.3, tau, 0.05, 0.02, no_divs, no_divs)
+        exact = optprice.discrete_divs(*args, 20001, 'LR')
+        error = abs(optprice.discrete_divs(*args, 1000) - exact)
+        print(f"{tau:>5} {'fixed':>14} {1000:>6} {error:>9.1e} {timed(optprice.discrete_divs, *args, 1000):>10.6f}")
+        for tol in [1e-3, 1e-4]:
+            result = optprice.discrete_divs_adaptive(*args, tol=tol)
+            elapsed = timed(optprice.discrete_divs_adaptive, *args, tol=tol)
+            print(f"{tau:>5} {f'tol={tol:g}':>14} {result.steps:>6} {abs(result.price - exact):>9.1e} {elapsed:>10.6f}")
+
+
+def bench_truncation():
+    print("====================")
+    print(f"discrete_divs: whole tree vs truncated at {optprice.TRUNCATION_WIDTH:g} standard deviations")
+    print("====================")
+    args = ('A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.0, np.array([0.2, 0.6]), np.array([1.5, 1.5]))
+    print(f"{'steps':>7} {'whole (s)':>10} {'truncated (s)':>14} {'speed-up':>9} {'rel diff':>9}")
+    for steps in [1000, 5000, 20000]:
+        whole = timed(optprice.discrete_divs, *args, steps)
+        truncated = timed(optprice.discrete_divs, *args, steps, width=optprice.TRUNCATION_WIDTH)
+        price = optprice.discrete_divs(*args, steps)
+        diff = abs(optprice.discrete_divs(*args, steps, width=optprice.TRUNCATION_WIDTH) - price) / price
+        print(f"{steps:>7} {whole:>10.5f} {truncated:>14.5f} {whole / truncated:>8.1f}x {diff:>9.1e}")
+
+
+def bench_exercise():
+    import v1_option_pricing_cy
+
+    print("====================")
+    print("American options: the cost of checking for early exercise, over the European price")
+    print("====================")
+    no_divs, div_times, div_amts = np.array([]), np.array([0.5]), np.array([3.0])
+    engines = {
+        'discrete_divs': lambda model, pc_flag, times, amts: optprice.discrete_divs(
+            'AE'[1 - model], pc_flag, 100.0, 100.0, 0.3, 1.0, 0.05, 0.0, times, amts, 2000,
+        ),
+        'discrete_divs_cy': lambda model, pc_flag, times, amts: v1_option_pricing_cy.discrete_divs_cy(
+            model, pc_flag, 100.0, 100.0, 0.05, 0.3, 1.0, 2000, times, amts, 0.0,
+        ),
+    }
+    print(f"{'engine':>17} {'option':>15} {'European (s)':>13} {'American (s)':>13} {'ratio':>6}")
+    for name, engine in engines.items():
+        for option, pc_flag, times, amts in [
+            ('put', -1.0, no_divs, no_divs),
+            ('call', 1.0, no_divs, no_divs),
+            ('call, dividend', 1.0, div_times, div_amts),
+        ]:
+            european = timed(engine, 0, pc_flag, times, amts)
+            american = timed(engine, 1, pc_flag, times, amts)
+            print(f"{name:>17} {option:>15} {european:>13.5f} {american:>13.5f} {american / european:>6.2f}")
+
+
+def bench_american_approximations():
+    print("====================")
+    print("American approximations: accuracy against the tree, and time per option")
+    print("====================")
+    grid = np.meshgrid([1.0, -1.0], [80.0, 100.0, 120.0], [0.2, 0.4], [0.1, 0.5, 2.0], [0.02, 0.08], [0.0, 0.04, 0.12])
+    pc_flag, strike, ivol, tau, rate, div_yield = [arr.ravel() for arr in grid]
+    no_divs = np.array([])
+    tree = lambda steps, lattice: np.array([
+        optprice.discrete_divs('A', *args, no_divs, no_divs, steps, lattice)
+        for args in zip(pc_flag, np.full(len(strike), 100.0), strike, ivol, tau, rate, div_yield)
+    ])
+    exact = tree(4001, 'LR')
+    print(f"{len(exact)} options: calls and puts, strikes 80-120 on a spot of 100, vols 0.2-0.4,")
+    print("expiries 0.1-2 years, rates 2-8% and dividend yields 0-12%, against a 4001 step LR tree.")
+    print(f"{'engine':>16} {'max |error|':>12} {'rms error':>10} {'max rel':>8} {'time (s)':>10}")
+    engines = {method: lambda method=method: optprice.american_batch(
+        pc_flag, 100.0, strike, ivol, tau, rate, div_yield, method=method,
+    ) for method in optprice.AMERICAN_APPROXIMATIONS}
+    engines['tree, 1000 steps'] = lambda: tree(1000, 'CRR')
+    for name, engine in engines.items():
+        error = engine() - exact
+        rel = np.abs(error) / np.maximum(exact, 1)
+        elapsed = timed(engine) / len(exact)
+        print(f"{name:>16} {np.max(np.abs(error)):>12.1e} {np.sqrt(np.mean(error**2)):>10.1e} {np.max(rel):>8.1e} {elapsed:>10.1e}")
+
+    n = 100000
+    book = [np.resize(arr, n) for arr in (pc_flag, strike, ivol, tau, rate, div_yield)]
+    for method in optprice.AMERICAN_APPROXIMATIONS:
+        pc, k, vol, t, r, q = book
+        elapsed = timed(optprice.american_batch, pc, 100.0, k, vol, t, r, q, method=method)
+        print(f"{method:>16} on {n} options: {elapsed / n:.1e} s per option")
+
+
+def bench_cash_dividends():
+    import v1_option_pricing_cy
+    print("====================")
+    print("European options with cash dividends: closed forms against the escrowed tree")
+    print("====================")
+    div_times, div_amts = np.array([0.2, 0.7, 1.2, 1.7]), np.array([1.5, 1.5, 1.5, 1.5])
+    grid = np.meshgrid([1.0, -1.0], np.linspace(80.0, 120.0, 21), [0.25, 0.5, 1.0, 2.0])
+    pc_flag, strike, tau = [arr.ravel() for arr in grid]
+    args = (pc_flag, 100.0, strike, 0.3, tau, 0.05, 0.01, div_times, div_amts)
+    tree = lambda steps: np.array([
+        v1_option_pricing_cy.discrete_divs_cy(0, pc, 100.0, k, 0.05, 0.3, t, steps, div_times, div_amts, 0.01)
+        for pc, k, t in zip(pc_flag, strike, tau)
+    ])
+    print(f"A chain of {len(strike)} options with quarterly dividends of 1.5 on a spot of 100. The tree is")
+    print("compared to the escrowed closed form, which is its limit, and the engines where the spot")
+    print("drops by the dividends to haug_haug_lewis_batch with 256 nodes.")
+    escrowed = optprice.escrowed_dividends_batch(*args, vol_adjust=False)
+    cash = optprice.haug_haug_lewis_batch(*args, nodes=256)
+    engines = {
+        'tree, 1000 steps': (lambda: tree(1000), escrowed),
+        'escrowed': (lambda: optprice.escrowed_dividends_batch(*args, vol_adjust=False), None),
+        'escrowed, adj vol': (lambda: optprice.escrowed_dividends_batch(*args), cash),
+        'haug_haug_lewis': (lambda: optprice.haug_haug_lewis_batch(*args), cash),
+    }
+    print(f"{'engine':>18} {'max |error|':>12} {'time (s)':>10}")
+    for name, (engine, exact) in engines.items():
+        error = '-' if exact is None else f"{np.max(np.abs(engine() - exact)):.1e}"
+        print(f"{name:>18} {error:>12} {timed(engine) / len(strike):>10.1e}")
+
+
+def bench_v2_tree():
+    import v1_option_pricing_cy
+    from v2_option_pricing import binomial_tree_crr_discrete
+    print("====================")
+    print("v2_option_pricing.binomial_tree_crr_discrete: time against steps")
+    print("====================")
+    div_times, div_amts = np.array([0.3, 0.8]), np.array([2.0, 2.0])
+    print(f"{'steps':>6} {'v2 (s)':>10} {'discrete_divs_cy (s)':>21}")
+    for steps in [100, 1000, 10000]:
+        v2 = timed(binomial_tree_crr_discrete, 'A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.01, div_times, div_amts, steps)
+        cy = timed(v1_option_pricing_cy.discrete_divs_cy, 1, -1.0, 100.0, 100.0, 0.05, 0.3, 1.0, steps, div_times, div_amts, 0.01)
+        print(f"{steps:>6} {v2:>10.1e} {cy:>21.1e}")
+
+
+def bench_surrogate():
+    import tempfile
+    import optprice_surrogate
+    print("====================")
+    print("optprice_surrogate: building the default table, and pricing from it")
+    print("====================")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'surrogate.bin')
+        start = timeit.default_timer()
+        surrogate = optprice_surrogate.build_surrogate(path)
+        elapsed = timeit.default_timer() - start
+        print(f"Built {len(surrogate.coefs)} coefficients ({os.path.getsize(path) / 2**10:.0f}KB) in {elapsed:.0f} s")
+        print(f"Certificate, as a fraction of the strike: {surrogate.certificate}")
+
+        rng = np.random.default_rng(1)
+        n = 10000
+        (x_lo, x_hi), (t_lo, t_hi), (v_lo, v_hi), (r_lo, r_hi), (q_lo, q_hi) = surrogate.domain
+        book = (
+            rng.choice([-1.0, 1.0], n), 100.0, 100.0 * np.exp(-rng.uniform(x_lo, x_hi, n)), rng.uniform(v_lo, v_hi, n),
+            rng.uniform(t_lo, t_hi, n), rng.uniform(r_lo, r_hi, n), rng.uniform(q_lo, q_hi, n),
+        )
+        per_option = timed(surrogate.price, *book) / n
+        no_divs = np.array([])
+        tree = timed(optprice.discrete_divs, 'A', -1.0, 100.0, 100.0, 0.3, 0.5, 0.05, 0.02, no_divs, no_divs, 1000)
+        print(f"{per_option:.1e} s per option on a book of {n}, against {tree:.1e} s for a 1000 step tree")
+
+
+BENCHMARKS = {
+    'binomial_tree': bench_binomial_tree,
+    'price_chain': bench_price_chain,
+    'strikes': bench_strikes,
+    'bbsr': bench_bbsr,
+    'lattices': bench_lattices,
+    'pde': bench_pde,
+    'moneyness_cache': bench_moneyness_cache,
+    'tick_pricer': bench_tick_pricer,
+    'scenario_grid': bench_scenario_grid,
+    'portfolio': bench_portfolio,
+    'dividend_schedule': bench_dividend_schedule,
+    'adaptive': bench_adaptive,
+    'truncation': bench_truncation,
+    'exercise': bench_exercise,
+    'american_approximations': bench_american_approximations,
+    'surrogate': bench_surrogate,
+    'cash_dividends': bench_cash_dividends,
+    'v2_tree': bench_v2_tree,
+}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('bench', nargs='?', choices=list(BENCHMARKS), help="Benchmark to run (default all).")
+    args = parser.parse_args()
+
+    for name in [args.bench] if args.bench else BENCHMARKS:
+        BENCHMARKS[name]()
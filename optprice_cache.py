@@ -0,0 +1,114 @@
+import collections
+import typing
+
+import numpy as np
+import scipy.interpolate
+
+import optprice
+
+
+class CacheStats(typing.NamedTuple):
+    """Counters of a MoneynessCache, since it was made or cleared."""
+    hits: int       # Lookups served from a cached curve.
+    misses: int     # Lookups which solved for a new curve.
+    outside: int    # Options beyond the moneyness range of their curve, priced directly.
+    evictions: int  # Curves evicted to stay under the memory cap.
+    curves: int     # Curves currently held.
+    nbytes: int     # Memory currently held by the curves.
+
+
+class MoneynessCache:
+    """
+    Prices of options without discrete dividends, served from price curves in moneyness.
+
+    The price of an option is homogeneous of degree one in the spot and strike, so
+    price(S, K) = K price(S / K, 1) for a given model, pc_flag, ivol, tau, rate and
+    div_yield. For each of those the cache solves the PDE once with a strike of 1 (see
+    optprice.discrete_divs_pde_ladder), and then prices any spot and strike by cubic
+    spline interpolation in the log-moneyness, which agrees with the tree to about 1e-6 of
+    the strike with the default grid. Options beyond the grid, which spans _PDE_WIDTH
+    standard deviations of the log-moneyness, are priced directly. Cash dividends do not
+    scale with the strike, so options with discrete dividends cannot share curves, and
+    are not taken.
+
+    The curves are kept in least recently used order, and the oldest are evicted when
+    they take up more than max_bytes.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 2**20,  # Memory cap on the cached curves.
+        space_steps: int = 800,       # Number of intervals in the log-moneyness grid.
+        time_steps: int = 400,        # Number of time steps of the PDE.
+    ):
+        assert max_bytes >= 0
+        self.max_bytes = max_bytes
+        self.space_steps = space_steps
+        self.time_steps = time_steps
+        self.clear()
+
+    def clear(self):
+        """Drop every curve and reset the counters."""
+        self._curves = collections.OrderedDict()
+        self._nbytes = 0
+        self._hits = self._misses = self._outside = self._evictions = 0
+
+    def stats(self) -> CacheStats:
+        """The counters, and the curves and memory held."""
+        return CacheStats(self._hits, self._misses, self._outside, self._evictions, len(self._curves), self._nbytes)
+
+    def price(
+        self,
+        model: str,             # 'A' for American, 'E' for European.
+        pc_flag: float,         # +1 for call, -1 for put.
+        spot,                   # Spot price of the underlying stock.
+        strike,                 # Strike price of the option.
+        ivol: float,            # Implied volatility (annualised).
+        tau: float,             # Time to expiry (years).
+        rate: float = 0,        # Risk-free rate (annualised, continuously compounding).
+        div_yield: float = 0,   # Dividend yield (annualised, continuously compounding).
+    ) -> np.ndarray:
+        """The prices of the options on the (broadcast) spots and strikes."""
+        assert model in 'AE'
+        spot, strike = np.broadcast_arrays(np.asarray(spot, dtype=np.float64), np.asarray(strike, dtype=np.float64))
+        curve = self._curve(model, float(pc_flag), float(ivol), float(tau), float(rate), float(div_yield))
+
+        moneyness = np.log(spot / strike)
+        inside = (curve.x[0] <= moneyness) & (moneyness <= curve.x[-1])
+        price = np.array(strike * curve(moneyness))
+        for idx in np.argwhere(~inside):
+            idx = tuple(idx)
+            price[idx] = optprice.discrete_divs_pde(
+                model, pc_flag, spot[idx], strike[idx], ivol, tau, rate, div_yield,
+                space_steps=self.space_steps, time_steps=self.time_steps,
+            )
+            self._outside += 1
+        return price
+
+    def _curve(self, model, pc_flag, ivol, tau, rate, div_yield) -> scipy.interpolate.CubicSpline:
+        """The price curve of the options with a strike of 1, solving for it if need be."""
+        key = (tau, ivol, rate, div_yield, model, pc_flag)
+        curve = self._curves.get(key)
+        if curve is not None:
+            self._hits += 1
+            self._curves.move_to_end(key)
+            return curve
+
+        self._misses += 1
+        ladder = optprice.discrete_divs_pde_ladder(
+            model, pc_flag, 1.0, 1.0, ivol, tau, rate, div_yield,
+            space_steps=self.space_steps, time_steps=self.time_steps,
+        )
+        curve = scipy.interpolate.CubicSpline(np.log(ladder.spot), ladder.price)
+        self._curves[key] = curve
+        self._nbytes += _curve_nbytes(curve)
+        while self._nbytes > self.max_bytes:
+            _, evicted = self._curves.popitem(last=False)
+            self._nbytes -= _curve_nbytes(evicted)
+            self._evictions += 1
+        return curve
+
+
+def _curve_nbytes(curve):
+    """Memory held by a price curve: its knots and polynomial coefficients."""
+    return curve.x.nbytes + curve.c.nbytes
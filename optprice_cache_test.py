@@ -0,0 +1,40 @@
+import itertools
+
+import numpy as np
+
+import optprice
+import optprice_cache
+
+
+def test_moneyness_cache():
+    cache = optprice_cache.MoneynessCache()
+    spots = np.array([57.0, 100.0, 120.0])
+    strikes = np.array([[50.0], [80.0], [100.0], [150.0]])
+    no_divs = np.array([])
+    for model, pc_flag in itertools.product('AE', [1.0, -1.0]):
+        # One curve serves every spot and strike, in agreement with the tree.
+        args = (0.3, 1.0, 0.05, 0.03)
+        actual = cache.price(model, pc_flag, spots, strikes, *args)
+        assert actual.shape == (4, 3)
+        for (i, k), (j, s) in itertools.product(enumerate(strikes[:, 0]), enumerate(spots)):
+            expected = optprice.discrete_divs(model, pc_flag, s, k, *args, no_divs, no_divs, 5001, 'LR')
+            assert abs(actual[i, j] - expected) < 1e-5 * k
+
+        # Far beyond the curve the option is priced directly.
+        far = cache.price(model, pc_flag, 1000.0, 10.0, *args)
+        assert far == optprice.discrete_divs_pde(model, pc_flag, 1000.0, 10.0, *args, space_steps=800, time_steps=400)
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.outside, stats.evictions, stats.curves) == (4, 4, 4, 0, 4)
+
+    # Least recently used curves are evicted to stay under the memory cap.
+    cache = optprice_cache.MoneynessCache(max_bytes=2 * stats.nbytes // 4)
+    for tau in [0.5, 1.0, 0.5, 2.0]:
+        cache.price('A', -1.0, 100.0, 100.0, 0.3, tau)
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions, stats.curves) == (1, 3, 1, 2)
+    assert stats.nbytes <= cache.max_bytes
+    cache.price('A', -1.0, 100.0, 100.0, 0.3, 0.5)
+    assert cache.stats().hits == 2
+    cache.price('A', -1.0, 100.0, 100.0, 0.3, 1.0)
+    assert cache.stats().misses == 4
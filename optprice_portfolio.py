@@ -0,0 +1,134 @@
+import csv
+import math
+import typing
+
+import numpy as np
+
+import optprice
+
+
+class Positions(typing.NamedTuple):
+    """A portfolio of option positions, as a struct of arrays with one entry per position."""
+    book: np.ndarray        # Name of the book holding the position.
+    underlying: np.ndarray  # Name of the underlying stock.
+    model: np.ndarray       # 'A' for American, 'E' for European.
+    pc_flag: np.ndarray     # +1 for call, -1 for put.
+    strike: np.ndarray      # Strike price of the option.
+    ivol: np.ndarray        # Implied volatility (annualised).
+    tau: np.ndarray         # Time to expiry (years).
+    quantity: np.ndarray    # Number of options held, negative when short.
+
+
+class Underlying(typing.NamedTuple):
+    """Market data of an underlying stock, shared by every position on it."""
+    spot: float                   # Spot price of the stock.
+    div_yield: float = 0          # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = []   # Times to distribute dividends (years)
+    div_amts: list[float] = []    # Amounts to distribute.
+
+
+class Valuation(typing.NamedTuple):
+    """The value of a portfolio from value_portfolio."""
+    contracts: int                                         # Number of distinct contracts priced.
+    positions: optprice.Greeks                             # Arrays of the value and Greeks of each position.
+    by_underlying: dict[str, optprice.Greeks]              # Totals over the positions on each underlying.
+    by_book: dict[tuple[str, str], optprice.Greeks]        # Totals over each (book, underlying).
+
+
+# Decimal places the contract terms are rounded to in the key of a contract, so that
+# terms differing only by rounding (eg expiries computed from dates) are priced once.
+_KEY_DECIMALS = 10
+
+
+def make_positions(book, underlying, model, pc_flag, strike, ivol, tau, quantity) -> Positions:
+    """Positions from sequences of each field (broadcast against each other)."""
+    arrays = np.broadcast_arrays(
+        np.asarray(book, dtype=str), np.asarray(underlying, dtype=str), np.asarray(model, dtype=str),
+        *[np.asarray(arg, dtype=np.float64) for arg in (pc_flag, strike, ivol, tau, quantity)],
+    )
+    positions = Positions(*[arr.flatten() for arr in arrays])
+    assert np.all(np.isin(positions.model, ['A', 'E']))
+    assert np.all(np.abs(positions.pc_flag) == 1)
+    return positions
+
+
+def load_positions(path: str) -> Positions:
+    """Positions from a CSV file, with a header naming the fields of Positions."""
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    return make_positions(*[[row[field] for row in rows] for field in Positions._fields])
+
+
+def value_portfolio(
+    positions: Positions,                 # Positions to value.
+    underlyings: dict[str, Underlying],   # Market data of every underlying held.
+    rate: float = 0,                      # Risk-free rate (annualised, continuously compounding).
+    steps: int = 1000,                    # Number of steps in the tree, eg [0, 1, ..., 100].
+    greeks: bool = True,                  # Whether to compute delta, gamma and theta, or only prices.
+    vega_rho: bool = False,               # Whether to also compute vega and rho.
+    lattice: str = 'CRR',                 # Lattice family, one of LATTICES.
+    width: float = math.inf,              # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+) -> Valuation:
+    """
+    Value a portfolio, returning the value and Greeks of every position (that is, of its
+    contract times the quantity held), and their totals by underlying and by book. The
+    totals by book are kept apart for each underlying, as deltas and gammas in different
+    stocks do not add up.
+
+    Positions on the same contract, whether in different books or repeated within one,
+    are priced once: each contract is keyed by its underlying and terms, and the distinct
+    keys are found with np.unique. The dividends are set up once per underlying and
+    expiry by dividend_schedule, and the contracts sharing an underlying, model, expiry
+    and volatility are priced together in one tree across their strikes, by
+    discrete_divs_strikes_greeks, or by discrete_divs_strikes for prices alone
+    (greeks=False), when the Greeks are NaN.
+    """
+    assert set(np.unique(positions.underlying)) <= set(underlyings)
+    names = np.array(sorted(underlyings))
+    keys = np.stack([
+        np.searchsorted(names, positions.underlying).astype(np.float64),
+        (positions.model == 'A').astype(np.float64),
+        positions.pc_flag,
+        np.round(positions.strike, _KEY_DECIMALS),
+        np.round(positions.ivol, _KEY_DECIMALS),
+        np.round(positions.tau, _KEY_DECIMALS),
+    ], axis=1)
+    contracts, contract_of = np.unique(keys, axis=0, return_inverse=True)
+    contract_of = contract_of.ravel()
+    values = np.full((len(contracts), len(optprice.Greeks._fields)), np.nan)
+
+    # Price the contracts of each underlying with its market data, setting up the
+    # dividends once for each expiry.
+    for u, name in enumerate(names):
+        spot, div_yield, div_times, div_amts = underlyings[name]
+        mine = np.flatnonzero(contracts[:, 0] == u)
+        schedules = {
+            tau: optprice.dividend_schedule(spot, tau, div_yield, div_times, div_amts, steps, lattice)
+            for tau in np.unique(contracts[mine, 5])
+        }
+        kwargs = dict(rate=rate, steps=steps, lattice=lattice, width=width)
+
+        # One tree for each model, volatility and expiry, across the strikes.
+        groups, group_of = np.unique(contracts[mine][:, [1, 4, 5]], axis=0, return_inverse=True)
+        for g, (american, ivol, tau) in enumerate(groups):
+            idx = mine[group_of.ravel() == g]
+            args = ('A' if american else 'E', contracts[idx, 2], spot, contracts[idx, 3], ivol, tau)
+            if greeks:
+                fields = optprice.discrete_divs_strikes_greeks(*args, vega_rho=vega_rho, schedule=schedules[tau], **kwargs)
+                values[idx] = np.stack(np.broadcast_arrays(*fields), axis=1)
+            else:
+                values[idx, 0] = optprice.discrete_divs_strikes(*args, schedule=schedules[tau], **kwargs)
+
+    # Scale by the quantities, and sum up the positions.
+    position_values = values[contract_of] * positions.quantity[:, None]
+    by_underlying = {key[0]: total for key, total in _totals([positions.underlying], position_values).items()}
+    by_book = _totals([positions.book, positions.underlying], position_values)
+    return Valuation(len(contracts), optprice.Greeks(*position_values.T), by_underlying, by_book)
+
+
+def _totals(labels, values):
+    """The sums of the rows of values by the tuple of their labels, as Greeks."""
+    keys, group_of = np.unique(np.stack(labels, axis=1), axis=0, return_inverse=True)
+    sums = np.zeros((len(keys), values.shape[1]))
+    np.add.at(sums, group_of.ravel(), values)
+    return {tuple(map(str, key)): optprice.Greeks(*map(float, row)) for key, row in zip(keys, sums)}
@@ -0,0 +1,52 @@
+import numpy as np
+
+import optprice
+import optprice_portfolio
+
+
+def test_value_portfolio(tmp_path):
+    path = tmp_path / 'positions.csv'
+    path.write_text(
+        'book,underlying,model,pc_flag,strike,ivol,tau,quantity\n'
+        'x,AAA,A,-1,100,0.3,0.5,10\n'
+        'y,AAA,A,-1,100,0.3,0.5000000000001,-3\n'
+        'x,AAA,A,1,90,0.25,1.0,2\n'
+        'x,AAA,A,-1,100,0.3,0.5,1\n'
+        'y,BBB,E,1,50,0.4,0.25,5\n'
+    )
+    positions = optprice_portfolio.load_positions(str(path))
+    underlyings = {
+        'AAA': optprice_portfolio.Underlying(100.0, 0.01, [0.2], [1.0]),
+        'BBB': optprice_portfolio.Underlying(55.0),
+    }
+    valuation = optprice_portfolio.value_portfolio(positions, underlyings, 0.05, steps=300, vega_rho=True)
+
+    # The same contract in either book is priced once.
+    assert valuation.contracts == 3
+    for i in range(len(positions.book)):
+        spot, div_yield, div_times, div_amts = underlyings[positions.underlying[i]]
+        expected = optprice.discrete_divs_greeks(
+            positions.model[i], positions.pc_flag[i], spot, positions.strike[i], positions.ivol[i],
+            positions.tau[i], 0.05, div_yield, div_times, div_amts, 300, vega_rho=True,
+        )
+        actual = [field[i] for field in valuation.positions]
+        np.testing.assert_allclose(actual, np.array(expected) * positions.quantity[i], rtol=1e-8, atol=1e-10)
+
+    # Totals by underlying, and by book within each underlying.
+    assert valuation.by_underlying.keys() == {'AAA', 'BBB'}
+    assert valuation.by_book.keys() == {('x', 'AAA'), ('y', 'AAA'), ('y', 'BBB')}
+    np.testing.assert_allclose(valuation.by_underlying['AAA'], np.sum(valuation.positions, axis=1, where=positions.underlying == 'AAA'))
+    np.testing.assert_allclose(valuation.by_book[('y', 'AAA')], np.array(valuation.positions)[:, 1])
+    np.testing.assert_allclose(
+        np.array(valuation.by_book[('x', 'AAA')]) + valuation.by_book[('y', 'AAA')], valuation.by_underlying['AAA'],
+    )
+
+    # Prices alone come from the strikes trees, in agreement.
+    prices = optprice_portfolio.value_portfolio(positions, underlyings, 0.05, steps=300, greeks=False)
+    np.testing.assert_allclose(prices.positions.price, valuation.positions.price, rtol=1e-12)
+    assert np.all(np.isnan(prices.positions.delta))
+
+    # Without vega and rho, the rest of the Greeks are unchanged.
+    plain = optprice_portfolio.value_portfolio(positions, underlyings, 0.05, steps=300)
+    np.testing.assert_allclose(np.array(plain.positions)[:4], np.array(valuation.positions)[:4], rtol=1e-12)
+    assert np.all(np.isnan(plain.positions.vega))
@@ -0,0 +1,94 @@
+import concurrent.futures
+import math
+import os
+
+import numpy as np
+
+import optprice
+
+
+def scenario_grid(
+    model: str,                   # 'A' for American, 'E' for European.
+    pc_flag,                      # +1 for call, -1 for put.
+    spot: float,                  # Spot price of the underlying stock.
+    strike,                       # Strike price of the option.
+    ivol,                         # Implied volatility (annualised).
+    tau,                          # Time to expiry (years).
+    rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
+    div_times: list[float] = [],  # Times to distribute dividends (years)
+    div_amts: list[float] = [],   # Amounts to distribute.
+    spot_shocks=[0.0],            # Relative moves of the spot, eg -0.1 for a spot 10% lower.
+    vol_shocks=[0.0],             # Absolute moves of the volatility, eg 0.05 for 5 vol points up.
+    steps: int = 1000,            # Number of steps in the tree, eg [0, 1, ..., 100].
+    lattice: str = 'CRR',         # Lattice family, one of LATTICES.
+    width: float = math.inf,      # Truncate the tree at this many standard deviations, eg TRUNCATION_WIDTH.
+    num_threads: int = 0,         # Number of threads to use (0 for one per core).
+) -> np.ndarray:
+    """
+    Price a batch of options on one underlying with discrete_divs under every pair of
+    spot and volatility shocks: pc_flag, strike, ivol and tau may be arrays (broadcast
+    against each other) of the contracts, and the result is an array of shape
+    (contracts, spot shocks, vol shocks).
+
+    The price of a tree is homogeneous of degree one in the spot and strike, for given
+    dividend factors, so a spot of S (1 + shock) prices as (1 + shock) times a strike of
+    K / (1 + shock) at the spot S. For each vol shock the contracts sharing an expiry and
+    a volatility are then priced by one discrete_divs_strikes tree, across every spot
+    shock at once. Cash dividends are converted into factors using the spot, so when
+    any falls into the timesteps of the trees the shocked spots need trees of their
+    own, which are still shared by the contracts. The vol shocks are priced in parallel, one per thread,
+    sharing the dividend_schedule of each expiry and shocked spot.
+    """
+    assert model in 'AE'
+    assert len(div_times) == len(div_amts)
+    pc_flag, strike, ivol, tau = [
+        arr.flatten() for arr in np.broadcast_arrays(*[
+            np.asarray(arg, dtype=np.float64) for arg in (pc_flag, strike, ivol, tau)
+        ])
+    ]
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    scale = 1 + np.asarray(spot_shocks, dtype=np.float64)
+    vol_shocks = np.asarray(vol_shocks, dtype=np.float64)
+    assert scale.ndim == 1 and vol_shocks.ndim == 1
+    assert np.all(scale > 0)
+
+    # The dividends are set up once for each expiry and shocked spot, and shared by the
+    # vol shocks. Where the factors (as bucketed into the timesteps of the tree) do not
+    # depend on the spot, one schedule at the spot serves every shock.
+    paid, schedules = {}, {}
+    for t in np.unique(tau):
+        base = optprice.dividend_schedule(spot, t, div_yield, div_times, div_amts, steps, lattice)
+        shocked = [
+            optprice.dividend_schedule(spot * s, t, div_yield, div_times, div_amts, steps, lattice) for s in scale
+        ]
+        paid[t] = any(not np.array_equal(schedule.factors, base.factors) for schedule in shocked)
+        schedules[t] = shocked if paid[t] else [base]
+
+    def price_vol_shock(vol_shock):
+        """The (contracts x spot shocks) prices under one vol shock."""
+        prices = np.empty((len(strike), len(scale)))
+        shocked = ivol + vol_shock
+        assert np.all(shocked > 0)
+        groups, group_of = np.unique(np.stack([tau, shocked], axis=1), axis=0, return_inverse=True)
+        for g, (group_tau, group_ivol) in enumerate(groups):
+            idx = np.flatnonzero(group_of.ravel() == g)
+            kwargs = dict(rate=rate, lattice=lattice, width=width)
+            if paid[group_tau]:
+                for j, (s, schedule) in enumerate(zip(scale, schedules[group_tau])):
+                    prices[idx, j] = optprice.discrete_divs_strikes(
+                        model, pc_flag[idx], spot * s, strike[idx], group_ivol, group_tau, steps=steps, schedule=schedule, **kwargs,
+                    )
+            else:
+                prices[idx] = scale * optprice.discrete_divs_strikes(
+                    model, pc_flag[idx, None], spot, strike[idx, None] / scale, group_ivol, group_tau,
+                    steps=steps, schedule=schedules[group_tau][0], **kwargs,
+                )
+        return prices
+
+    if num_threads <= 0:
+        num_threads = os.cpu_count() or 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(num_threads, max(len(vol_shocks), 1))) as pool:
+        results = list(pool.map(price_vol_shock, vol_shocks))
+    return np.stack(results, axis=-1) if results else np.empty((len(strike), len(scale), 0))
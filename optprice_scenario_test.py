@@ -0,0 +1,29 @@
+import itertools
+
+import numpy as np
+
+import optprice
+import optprice_scenario
+
+
+def test_scenario_grid():
+    pc_flag = np.array([-1.0, -1.0, 1.0, 1.0, -1.0])
+    strike = np.array([80.0, 100.0, 100.0, 120.0, 100.0])
+    ivol = np.array([0.3, 0.25, 0.25, 0.3, 0.25])
+    tau = np.array([0.5, 0.5, 0.5, 1.0, 0.25])
+    spot_shocks = np.array([-0.2, 0.0, 0.1])
+    vol_shocks = np.array([-0.1, 0.0, 0.05])
+    # A dividend just before now still falls into the first timestep of the trees.
+    for (div_times, div_amts), lattice in itertools.product([([], []), ([0.4], [2.0]), ([-1e-4], [2.0])], ['CRR', 'LR']):
+        # Every contract under every shock, as priced one at a time.
+        actual = optprice_scenario.scenario_grid(
+            'A', pc_flag, 100.0, strike, ivol, tau, 0.05, 0.01, div_times, div_amts,
+            spot_shocks, vol_shocks, steps=301, lattice=lattice, num_threads=2,
+        )
+        assert actual.shape == (5, 3, 3)
+        for c, (i, s), (j, v) in itertools.product(range(5), enumerate(spot_shocks), enumerate(vol_shocks)):
+            expected = optprice.discrete_divs(
+                'A', pc_flag[c], 100.0 * (1 + s), strike[c], ivol[c] + v, tau[c], 0.05, 0.01,
+                np.array(div_times), np.array(div_amts), 301, lattice,
+            )
+            assert abs(actual[c, i, j] - expected) < 1e-10
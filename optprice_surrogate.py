@@ -0,0 +1,274 @@
+import itertools
+import json
+import math
+import typing
+
+import numba
+import numpy as np
+import scipy.fft
+
+import optprice
+
+
+# The variables of a surrogate, in the order of the axes of its table.
+VARIABLES = ('log_moneyness', 'tau', 'ivol', 'rate', 'div_yield')
+
+# Default domain and number of Chebyshev nodes along each variable, for which the error
+# is about 2e-3 of the strike at worst (see build_surrogate).
+DOMAIN = ((-0.5, 0.5), (0.05, 2.0), (0.1, 0.8), (0.0, 0.1), (0.0, 0.1))
+DEGREES = (20, 12, 12, 7, 7)
+
+_MAGIC = b'OPTCHEB1'
+
+
+class Certificate(typing.NamedTuple):
+    """The error of a surrogate against the tree it was built from, over its domain."""
+    max_error: float  # Largest absolute error seen, as a fraction of the strike.
+    rms_error: float  # Root mean square error, as a fraction of the strike.
+    points: int       # Number of random points of the domain checked, puts and calls each.
+
+
+class ChebyshevSurrogate:
+    """
+    American option prices without discrete dividends, from a table of Chebyshev
+    coefficients over VARIABLES, built offline by build_surrogate and memory-mapped.
+
+    The table interpolates the early exercise premium, the American price less the
+    European, over the strike, which is the part without a closed form; the European
+    price is added back from black_scholes_batch, and the sum floored at the intrinsic
+    value. Only the coefficients above a tolerance are stored, with their indices, so
+    a price is a sum over some thousands of products of Chebyshev polynomials.
+
+    Options outside the domain, or with a discrete dividend before expiry, are priced
+    by optprice.discrete_divs, with the steps and lattice the table was built from.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a surrogate table")
+            header_len = int.from_bytes(f.read(4), 'little')
+            header = json.loads(f.read(header_len))
+        offset = _aligned(len(_MAGIC) + 4 + header_len)
+        terms = sum(header['terms'])
+        self.domain = tuple(tuple(bounds) for bounds in header['domain'])
+        self.degrees = tuple(header['degrees'])
+        self.steps = header['steps']
+        self.lattice = header['lattice']
+        self.certificate = Certificate(*header['certificate'])
+
+        # Puts and then calls, each as coefficients and then their indices.
+        self.coefs = np.memmap(path, dtype='<f8', mode='r', offset=offset, shape=(terms,))
+        self.indices = np.memmap(path, dtype=np.uint8, mode='r', offset=offset + 8 * terms, shape=(terms, len(VARIABLES)))
+        self._puts = slice(0, header['terms'][0])
+        self._calls = slice(header['terms'][0], terms)
+        self._left = np.ravel_multi_index(self.indices[:, :_SPLIT].T, self.degrees[:_SPLIT])
+        self._right = np.ravel_multi_index(self.indices[:, _SPLIT:].T, self.degrees[_SPLIT:])
+
+    def price(
+        self,
+        pc_flag,                      # +1 for call, -1 for put.
+        spot,                         # Spot price of the underlying stock.
+        strike,                       # Strike price of the option.
+        ivol,                         # Implied volatility (annualised).
+        tau,                          # Time to expiry (years).
+        rate=0,                       # Risk-free rate (annualised, continuously compounding).
+        div_yield=0,                  # Dividend yield (annualised, continuously compounding).
+        div_times: list[float] = [],  # Times to distribute dividends (years), shared by every option.
+        div_amts: list[float] = [],   # Amounts to distribute.
+    ) -> np.ndarray:
+        """American option prices for a batch of (broadcast) inputs."""
+        assert len(div_times) == len(div_amts)
+        args = np.broadcast_arrays(*[
+            np.asarray(arg, dtype=np.float64) for arg in (pc_flag, spot, strike, ivol, tau, rate, div_yield)
+        ])
+        pc_flag, spot, strike, ivol, tau, rate, div_yield = args
+        x = np.log(spot / strike)
+        scaled = [
+            2 * (var - lo) / (hi - lo) - 1 for var, (lo, hi) in zip((x, tau, ivol, rate, div_yield), self.domain)
+        ]
+        div_times = np.asarray(div_times, dtype=np.float64)
+        div_amts = np.asarray(div_amts, dtype=np.float64)
+        paid = (0 <= div_times) & (div_times < tau[..., None]) & (div_amts != 0)
+        inside = np.all([np.abs(t) <= 1 for t in scaled], axis=0) & ~np.any(paid, axis=-1)
+
+        price = np.empty(x.shape)
+        points = np.stack([t[inside] for t in scaled], axis=-1)
+        premium = np.empty(len(points))
+        calls = pc_flag[inside] > 0
+        degrees = np.array(self.degrees)
+        for flag, terms in ((calls, self._calls), (~calls, self._puts)):
+            coefs = np.asarray(self.coefs[terms])
+            premium[flag] = _chebyshev_sum(points[flag], coefs, self._left[terms], self._right[terms], degrees)
+        european = optprice.black_scholes_batch(*[arg[inside] for arg in args])
+        intrinsic = pc_flag[inside] * (spot[inside] - strike[inside])
+        price[inside] = np.maximum(european + strike[inside] * premium, intrinsic)
+
+        for idx in np.argwhere(~inside):
+            idx = tuple(idx)
+            price[idx] = optprice.discrete_divs(
+                'A', *[arg[idx] for arg in args], div_times, div_amts, self.steps, self.lattice,
+                optprice.TRUNCATION_WIDTH,
+            )
+        return price
+
+
+def build_surrogate(
+    path: str,                                  # File to write the table to.
+    domain: tuple = DOMAIN,                     # (lo, hi) of each of VARIABLES.
+    degrees: tuple[int, ...] = DEGREES,         # Number of Chebyshev nodes along each of VARIABLES.
+    steps: int = 301,                           # Number of steps in the trees.
+    lattice: str = 'LR',                        # Lattice family of the trees, one of optprice.LATTICES.
+    tol: float = 1e-5,                          # Smallest coefficient kept, as a fraction of the strike.
+    points: int = 1000,                         # Number of random points to certify the error at.
+    seed: int = 0,                              # Seed of the random points.
+) -> ChebyshevSurrogate:
+    """
+    Price the early exercise premium of puts and calls on a spot of 1 with the tree, at
+    the tensor product of the Chebyshev points (of the first kind) of each variable,
+    take the coefficients of the interpolating polynomial by a DCT along each axis, and
+    write those above tol to path. Every expiry, volatility, rate and yield needs a tree
+    per node in log-moneyness, so the default table takes about a minute.
+
+    Then price points at random in the domain with both the surrogate and the tree, and
+    record the largest and RMS errors in the file as its certificate. The certificate is
+    an empirical bound: the American price is only once differentiable across the exercise
+    boundary, which limits the convergence of the interpolation, and the errors are
+    largest for options in the money at low volatility.
+    """
+    assert len(domain) == len(degrees) == len(VARIABLES)
+    assert all(1 <= n <= 256 for n in degrees)
+    nodes = [
+        lo + (hi - lo) * (np.cos(np.pi * (np.arange(n) + 0.5) / n) + 1) / 2
+        for (lo, hi), n in zip(domain, degrees)
+    ]
+
+    # Premiums over the strike at the nodes, for puts and calls.
+    pc_flag = np.array([[-1.0], [1.0]])
+    strike = np.exp(-nodes[0])
+    premiums = np.empty((2,) + tuple(degrees))
+    for idx in itertools.product(*[range(n) for n in degrees[1:]]):
+        tau, ivol, rate, div_yield = [var[i] for var, i in zip(nodes[1:], idx)]
+        american = optprice.discrete_divs_strikes(
+            'A', pc_flag, 1.0, strike, ivol, tau, rate, div_yield,
+            steps=steps, lattice=lattice, width=optprice.TRUNCATION_WIDTH,
+        )
+        european = optprice.black_scholes_batch(pc_flag, 1.0, strike, ivol, tau, rate, div_yield)
+        premiums[(slice(None), slice(None)) + idx] = (american - european) / strike
+
+    # Chebyshev coefficients, by a DCT-II along each axis.
+    coefs = premiums
+    for axis, n in enumerate(degrees, start=1):
+        coefs = scipy.fft.dct(coefs, type=2, axis=axis) / n
+        coefs[(slice(None),) * axis + (0,)] /= 2
+
+    # The coefficients above tol and their indices, puts and then calls.
+    kept = [np.argwhere(np.abs(c) > tol) for c in coefs]
+    header = dict(
+        domain=[list(bounds) for bounds in domain], degrees=list(degrees), steps=steps, lattice=lattice,
+        terms=[len(k) for k in kept], certificate=[math.inf, math.inf, 0],
+    )
+    values = np.concatenate([c[tuple(k.T)] for c, k in zip(coefs, kept)]).astype('<f8')
+    indices = np.concatenate(kept).astype(np.uint8)
+    _write_surrogate(path, header, values, indices)
+
+    # Certify it against the tree at random points.
+    surrogate = ChebyshevSurrogate(path)
+    rng = np.random.default_rng(seed)
+    x, tau, ivol, rate, div_yield = [rng.uniform(lo, hi, points) for lo, hi in domain]
+    strike = np.exp(-x)
+    no_divs = np.array([])
+    errors = []
+    for flag in [-1.0, 1.0]:
+        tree = np.array([
+            optprice.discrete_divs('A', flag, 1.0, *args, no_divs, no_divs, steps, lattice, optprice.TRUNCATION_WIDTH)
+            for args in zip(strike, ivol, tau, rate, div_yield)
+        ])
+        errors.append((surrogate.price(flag, 1.0, strike, ivol, tau, rate, div_yield) - tree) / strike)
+    errors = np.concatenate(errors)
+    header['certificate'] = [float(np.max(np.abs(errors))), float(np.sqrt(np.mean(errors**2))), points]
+    _write_surrogate(path, header, values, indices)
+    return ChebyshevSurrogate(path)
+
+
+def _write_surrogate(path, header, values, indices):
+    """Write a table: the magic, the length of the JSON header, the header, then the arrays."""
+    header = json.dumps(header).encode()
+    with open(path, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(len(header).to_bytes(4, 'little'))
+        f.write(header)
+        f.write(b'\0' * (_aligned(f.tell()) - f.tell()))
+        f.write(values.tobytes())
+        f.write(indices.tobytes())
+
+
+def _aligned(offset):
+    """The offset rounded up to a whole number of doubles."""
+    return -(-offset // 8) * 8
+
+
+# The variables are split into the first _SPLIT and the rest, whose products of Chebyshev
+# polynomials are tabulated for each point, so that each term is only two lookups.
+_SPLIT = 2
+
+
+@numba.njit(fastmath=True)
+def _chebyshev_sum(points, coefs, left, right, degrees):
+    """
+    The sum of coefs times the products of Chebyshev polynomials, at each point in
+    [-1, 1]^d, where left and right index the coefficients into the tables of the
+    products over the variables before and after _SPLIT. (fastmath lets the sum be
+    reordered, and so vectorised.)
+    """
+    dims = points.shape[1]
+    out = np.empty(len(points))
+    polys = np.empty((dims, max(degrees)))
+    left_table = np.empty(np.prod(degrees[:_SPLIT]))
+    right_table = np.empty(np.prod(degrees[_SPLIT:]))
+    for p in range(len(points)):
+        for j in range(dims):
+            t = points[p, j]
+            polys[j, 0] = 1.0
+            if degrees[j] > 1:
+                polys[j, 1] = t
+            for k in range(2, degrees[j]):
+                polys[j, k] = 2 * t * polys[j, k-1] - polys[j, k-2]
+        _outer_products(polys, degrees, 0, _SPLIT, left_table)
+        _outer_products(polys, degrees, _SPLIT, dims, right_table)
+        total = 0.0
+        for i in range(len(coefs)):
+            total += coefs[i] * left_table[left[i]] * right_table[right[i]]
+        out[p] = total
+    return out
+
+
+@numba.njit
+def _outer_products(polys, degrees, first, stop, table):
+    """The products of polys over the variables first..stop, in row-major order, into table."""
+    size = 1
+    table[0] = 1.0
+    for j in range(first, stop):
+        # Expand in place from the end, so each product is read before it is overwritten.
+        for a in range(size - 1, -1, -1):
+            for k in range(degrees[j] - 1, -1, -1):
+                table[a * degrees[j] + k] = table[a] * polys[j, k]
+        size *= degrees[j]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Build a surrogate table and certify its error.")
+    build.add_argument('path', help="File to write the table to.")
+    build.add_argument('--degrees', type=int, nargs=len(VARIABLES), default=DEGREES, help="Nodes along each of " + ', '.join(VARIABLES) + ".")
+    build.add_argument('--steps', type=int, default=301, help="Steps in the trees.")
+    build.add_argument('--tol', type=float, default=1e-5, help="Smallest coefficient kept.")
+    build.add_argument('--points', type=int, default=1000, help="Random points to certify the error at.")
+    args = parser.parse_args()
+
+    surrogate = build_surrogate(args.path, degrees=tuple(args.degrees), steps=args.steps, tol=args.tol, points=args.points)
+    print(f"{len(surrogate.coefs)} coefficients over {', '.join(VARIABLES)} in {surrogate.domain}")
+    print(f"Certificate against the tree, as a fraction of the strike: {surrogate.certificate}")
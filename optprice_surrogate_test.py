@@ -0,0 +1,41 @@
+import itertools
+
+import numpy as np
+
+import optprice
+import optprice_surrogate
+
+
+def test_chebyshev_surrogate(tmp_path):
+    domain = ((-0.2, 0.2), (0.25, 1.0), (0.2, 0.4), (0.02, 0.06), (0.0, 0.04))
+    degrees = (8, 4, 4, 3, 3)
+    path = tmp_path / 'surrogate.bin'
+    surrogate = optprice_surrogate.build_surrogate(path, domain, degrees, steps=101, tol=0, points=20)
+    assert isinstance(surrogate.coefs, np.memmap)
+    assert len(surrogate.coefs) == 2 * np.prod(degrees)
+
+    # Keeping every coefficient, the surrogate interpolates the tree at the nodes.
+    nodes = [lo + (hi - lo) * (np.cos(np.pi * (np.arange(n) + 0.5) / n) + 1) / 2 for (lo, hi), n in zip(domain, degrees)]
+    no_divs = np.array([])
+    for pc_flag, x, tau in itertools.product([1.0, -1.0], nodes[0][::3], nodes[1][::2]):
+        args = (pc_flag, 100.0, 100.0 * np.exp(-x), nodes[2][1], tau, nodes[3][0], nodes[4][2])
+        expected = optprice.discrete_divs('A', *args, no_divs, no_divs, 101, 'LR', optprice.TRUNCATION_WIDTH)
+        assert abs(surrogate.price(*args) - expected) < 1e-10
+
+    # The certificate covers random points, and is reloaded from the file.
+    assert 0 < surrogate.certificate.rms_error <= surrogate.certificate.max_error < 1e-2
+    assert optprice_surrogate.ChebyshevSurrogate(path).certificate == surrogate.certificate
+
+    # Outside the domain, or with a dividend, the tree prices the option.
+    tree = lambda strike, div_times, div_amts: optprice.discrete_divs(
+        'A', -1.0, 100.0, strike, 0.3, 0.5, 0.04, 0.02, div_times, div_amts, 101, 'LR', optprice.TRUNCATION_WIDTH,
+    )
+    price = surrogate.price(-1.0, 100.0, np.array([100.0, 200.0]), 0.3, 0.5, 0.04, 0.02)
+    assert abs(price[0] - tree(100.0, no_divs, no_divs)) < surrogate.certificate.max_error * 100.0
+    assert price[1] == tree(200.0, no_divs, no_divs)
+    div_times, div_amts = np.array([0.25]), np.array([1.0])
+    assert surrogate.price(-1.0, 100.0, 100.0, 0.3, 0.5, 0.04, 0.02, div_times, div_amts) == tree(100.0, div_times, div_amts)
+
+    # Smaller coefficients can be dropped.
+    truncated = optprice_surrogate.build_surrogate(tmp_path / 'truncated.bin', domain, degrees, steps=101, tol=1e-4, points=20)
+    assert len(truncated.coefs) < len(surrogate.coefs)
@@ -0,0 +1,411 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+import scipy.integrate
+
+import optprice
+
+
+def test_black_scholes_batch():
+    # Every combination of a small grid of contracts, priced one at a time and in a batch.
+    grid = list(itertools.product(
+        [1, -1],                # pc_flag
+        [80, 100, 120],         # spot
+        [90, 100, 110],         # strike
+        [0.05, 0.3, 1.2],       # ivol
+        [0.01, 0.5, 3.0],       # tau
+        [0, 0.05],              # rate
+        [0, 0.03],              # div_yield
+    ))
+    columns = [np.array(column, dtype=np.float64) for column in zip(*grid)]
+
+    expected = np.array([optprice.black_scholes(*row) for row in grid])
+    actual = optprice.black_scholes_batch(*columns, chunk_size=100)
+    assert actual.shape == expected.shape
+    assert np.max(np.abs(actual - expected)) < 1e-12
+
+    # Scalars broadcast against arrays.
+    strikes = np.linspace(50, 150, 11)
+    actual = optprice.black_scholes_batch(-1, 100, strikes, 0.2, 0.5, 0.01, 0.02)
+    expected = [optprice.black_scholes(-1, 100, strike, 0.2, 0.5, 0.01, 0.02) for strike in strikes]
+    assert np.max(np.abs(actual - expected)) < 1e-12
+
+
+def test_implied_vol_batch():
+    grid = list(itertools.product(
+        [1, -1],                        # pc_flag
+        [100],                          # spot
+        [40, 70, 90, 100, 110, 150, 250],   # strike
+        [0.02, 0.1, 0.3, 0.8, 2.0],     # ivol
+        [0.01, 0.25, 1.0, 5.0],         # tau
+        [0, 0.05],                      # rate
+        [0, 0.03],                      # div_yield
+    ))
+    pc_flag, spot, strike, ivol, tau, rate, div_yield = [np.array(column) for column in zip(*grid)]
+    price = optprice.black_scholes_batch(pc_flag, spot, strike, ivol, tau, rate, div_yield)
+
+    # Only compare rows where the option value is not swamped by rounding: far out of
+    # the money with tiny volatility, the price carries no information about the vol.
+    vega = spot * np.exp(-div_yield * tau) * optprice.n_pdf_batch(
+        (np.log(spot / strike) + (rate - div_yield + ivol**2 / 2) * tau) / (ivol * tau**0.5)
+    ) * tau**0.5
+    meaningful = vega > 1e-6
+
+    actual, status = optprice.implied_vol_batch(price, pc_flag, spot, strike, tau, rate, div_yield)
+    assert np.all(status[meaningful] == optprice.IV_OK)
+    assert np.max(np.abs(actual - ivol)[meaningful]) < 1e-8
+
+    # Prices outside the no-arbitrage bounds come back as NaN with a status code.
+    ivol, status = optprice.implied_vol_batch(
+        [5.0, 150.0, 2.0, 1.0, 1.0],    # price
+        [-1, 1, 1, 1, 1],               # pc_flag
+        100,                            # spot
+        [110, 100, 100, 100, 100],      # strike
+        [1, 1, 1, 0, 1],                # tau
+        0.0,                            # rate
+    )
+    assert list(status) == [
+        optprice.IV_BELOW_INTRINSIC,
+        optprice.IV_ABOVE_MAX,
+        optprice.IV_OK,
+        optprice.IV_BAD_INPUT,
+        optprice.IV_OK,
+    ]
+    assert np.isnan(ivol[:2]).all() and np.isnan(ivol[3])
+    assert abs(optprice.black_scholes(1, 100, 100, ivol[2], 1) - 2.0) < 1e-12
+
+
+def test_american_approximations():
+    # Both approximations are within a dime of the tree, and BS2002 is a lower bound.
+    pc_flag, strike, tau, div_yield = np.meshgrid([1.0, -1.0], [90.0, 100.0, 110.0], [0.25, 1.0], [0.0, 0.04])
+    no_divs = np.array([])
+    tree = np.vectorize(
+        lambda pc, k, t, q: optprice.discrete_divs('A', pc, 100.0, k, 0.3, t, 0.06, q, no_divs, no_divs, 2001, 'LR')
+    )(pc_flag, strike, tau, div_yield)
+    for method in optprice.AMERICAN_APPROXIMATIONS:
+        price = optprice.american_batch(pc_flag, 100.0, strike, 0.3, tau, 0.06, div_yield, method=method)
+        assert price.shape == tree.shape
+        assert np.max(np.abs(price - tree)) < 0.1, method
+        if method == 'BS2002':
+            assert np.all(price < tree + 1e-6)
+
+        # Calls without a dividend yield are never exercised early.
+        no_yield = (pc_flag > 0) & (div_yield == 0)
+        european = optprice.black_scholes_batch(pc_flag, 100.0, strike, 0.3, tau, 0.06, div_yield)
+        assert np.array_equal(price[no_yield], european[no_yield])
+        assert np.all(price >= european)
+
+    # Scalars give scalars, and options with a discrete dividend before expiry are
+    # priced on the tree instead.
+    args = (-1.0, 100.0, 100.0, 0.3)
+    assert np.shape(optprice.american_batch(*args, 1.0, 0.06)) == ()
+    div_times, div_amts = np.array([0.5]), np.array([2.0])
+    price = optprice.american_batch(*args, np.array([0.25, 1.0]), 0.06, 0.0, div_times, div_amts, steps=500)
+    assert abs(price[0] - optprice.american_batch(*args, 0.25, 0.06)) < 1e-12
+    assert price[1] == optprice.discrete_divs('A', *args, 1.0, 0.06, 0.0, div_times, div_amts, 500)
+
+
+def test_haug_haug_lewis():
+    # With one dividend the integration is exact: compare to adaptive quadrature.
+    for pc_flag, strike, div_amt in itertools.product([1.0, -1.0], [70.0, 100.0, 130.0], [7.0, 50.0]):
+        def integrand(z):
+            after = 100.0 * math.exp((0.06 - 0.3**2 / 2) * 0.5 + 0.3 * 0.5**0.5 * z) - div_amt
+            return optprice.black_scholes(pc_flag, after, strike, 0.3, 0.5, 0.06) * optprice.n_pdf(z)
+        covered = (math.log(div_amt / 100.0) - (0.06 - 0.3**2 / 2) * 0.5) / (0.3 * 0.5**0.5)
+        expected = scipy.integrate.quad(integrand, covered, 12, epsabs=1e-12, epsrel=1e-12)[0]
+        if pc_flag < 0:
+            expected += strike * math.exp(-0.06 * 0.5) * optprice.n_cdf(covered)
+        expected *= math.exp(-0.06 * 0.5)
+        actual = optprice.haug_haug_lewis_batch(pc_flag, 100.0, strike, 0.3, 1.0, 0.06, 0.0, [0.5], [div_amt])
+        assert np.shape(actual) == ()
+        assert abs(actual - expected) < 1e-9
+
+        # The escrowed model with the volatility adjustment is close for a small dividend.
+        escrowed = optprice.escrowed_dividends_batch(pc_flag, 100.0, strike, 0.3, 1.0, 0.06, 0.0, [0.5], [div_amt])
+        assert abs(escrowed - actual) < (0.03 if div_amt < 10 else 0.5)
+
+    # Options expiring before the dividends are Black-Scholes.
+    tau = np.array([0.2, 1.0])
+    actual = optprice.haug_haug_lewis_batch(1.0, 100.0, 100.0, 0.3, tau, 0.05, 0.01, [0.3, 0.8], [2.0, 2.0])
+    assert actual[0] == optprice.black_scholes_batch(1.0, 100.0, 100.0, 0.3, 0.2, 0.05, 0.01)
+    assert actual[1] < optprice.black_scholes_batch(1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.01)
+
+
+def test_american_implied_vol_batch():
+    div_times = np.array([0.2, 0.7])
+    div_amts = np.array([1.0, 1.0])
+    pc_flag = np.array([1, 1, 1, -1, -1, -1])
+    strike = np.array([80, 100, 120, 80, 100, 120])
+    ivol = np.array([0.35, 0.3, 0.25, 0.35, 0.3, 0.25])
+    price = np.array([
+        optprice.discrete_divs('A', float(pc), 100.0, float(k), vol, 1.0, 0.05, 0.0, div_times, div_amts, 400)
+        for pc, k, vol in zip(pc_flag, strike, ivol)
+    ])
+
+    actual, status, iterations, tree_evals = optprice.american_implied_vol_batch(
+        price, pc_flag, 100, strike, 1.0, 0.05, 0.0, div_times, div_amts, steps=400, tol=1e-7,
+    )
+    assert np.all(status == optprice.IV_OK)
+    assert np.max(np.abs(actual - ivol)) < 1e-6
+    assert np.all(iterations > 0) and np.all(tree_evals >= iterations)
+
+    # A put is worth at least its intrinsic value, and at most the strike.
+    for price, status in [(19.0, optprice.IV_BELOW_INTRINSIC), (130.0, optprice.IV_ABOVE_MAX)]:
+        ivol, actual_status, _, _ = optprice.american_implied_vol(price, -1, 100, 120, 1.0, 0.05, steps=400)
+        assert np.isnan(ivol) and actual_status == status
+
+
+def test_tree_greeks():
+    # European Greeks converge to the Black-Scholes ones.
+    spot, strike, ivol, tau, rate, div_yield = 100, 95, 0.3, 1.0, 0.05, 0.01
+    d1 = (np.log(spot / strike) + (rate - div_yield + ivol**2 / 2) * tau) / (ivol * tau**0.5)
+    d2 = d1 - ivol * tau**0.5
+    fwd_disc, strike_disc = spot * np.exp(-div_yield * tau), strike * np.exp(-rate * tau)
+    expected = optprice.Greeks(
+        price=optprice.black_scholes(1, spot, strike, ivol, tau, rate, div_yield),
+        delta=np.exp(-div_yield * tau) * optprice.n_cdf(d1),
+        gamma=np.exp(-div_yield * tau) * optprice.n_pdf(d1) / (spot * ivol * tau**0.5),
+        theta=(
+            -fwd_disc * optprice.n_pdf(d1) * ivol / (2 * tau**0.5)
+            - rate * strike_disc * optprice.n_cdf(d2)
+            + div_yield * fwd_disc * optprice.n_cdf(d1)
+        ),
+        vega=fwd_disc * optprice.n_pdf(d1) * tau**0.5,
+        rho=tau * strike_disc * optprice.n_cdf(d2),
+    )
+    actual = optprice.binomial_tree_greeks('E', 1, spot, strike, ivol, tau, rate, div_yield, steps=2000, vega_rho=True)
+    for name, tol in [('price', 1e-2), ('delta', 1e-3), ('gamma', 1e-4), ('theta', 1e-2), ('vega', 0.2), ('rho', 5e-2)]:
+        assert abs(getattr(actual, name) - getattr(expected, name)) < tol, name
+
+    # American Greeks agree with bumping and repricing the tree. (The tree price is not
+    # smooth in the spot, so the bumps need to span a few nodes.)
+    args = ('A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.02, np.array([]), np.array([]), 500)
+    actual = optprice.discrete_divs_greeks(*args, vega_rho=True)
+    assert actual.price == optprice.discrete_divs(*args)
+
+    def bumped(index, bump):
+        bumped_args = list(args)
+        bumped_args[index] += bump
+        return optprice.discrete_divs(*bumped_args)
+
+    assert abs(actual.delta - (bumped(2, 1) - bumped(2, -1)) / 2) < 5e-3
+    assert abs(actual.gamma - (bumped(2, 1) - 2 * actual.price + bumped(2, -1))) < 1e-3
+    assert abs(actual.vega - (bumped(4, 1e-3) - bumped(4, -1e-3)) / 2e-3) < 0.2
+    assert abs(actual.rho - (bumped(6, 1e-3) - bumped(6, -1e-3)) / 2e-3) < 0.2
+
+
+def test_binomial_tree():
+    # The European tree converges to Black-Scholes, and the American option is worth more.
+    for pc_flag, strike in itertools.product([1, -1], [90, 100, 110]):
+        european = optprice.binomial_tree('E', pc_flag, 100, strike, 0.3, 1.0, 0.05, 0.02, steps=2000)
+        american = optprice.binomial_tree('A', pc_flag, 100, strike, 0.3, 1.0, 0.05, 0.02, steps=2000)
+        assert abs(european - optprice.black_scholes(pc_flag, 100, strike, 0.3, 1.0, 0.05, 0.02)) < 1e-2
+        assert american >= european
+
+
+def test_discrete_divs_strikes():
+    div_times, div_amts = np.array([0.1, 0.6]), np.array([1.5, 1.5])
+    for model, pc_flag, n in itertools.product('AE', [1.0, -1.0], [3, 40]):
+        strike = np.linspace(60, 140, n)
+        actual = optprice.discrete_divs_strikes(model, pc_flag, 100.0, strike, 0.3, 1.0, 0.05, 0.01, div_times, div_amts, 300)
+        assert actual.shape == strike.shape
+        expected = [
+            optprice.discrete_divs(model, pc_flag, 100.0, k, 0.3, 1.0, 0.05, 0.01, div_times, div_amts, 300)
+            for k in strike
+        ]
+        assert np.max(np.abs(actual - expected)) < 1e-12
+
+
+def test_discrete_divs_strikes_greeks():
+    div_times, div_amts = np.array([0.1, 0.6]), np.array([1.5, 1.5])
+    for model, n, width in itertools.product('AE', [3, 40], [math.inf, optprice.TRUNCATION_WIDTH]):
+        strike = np.linspace(60, 140, n)
+        pc_flag = np.where(strike > 100, 1.0, -1.0)
+        args = (0.3, 1.0, 0.05, 0.01, div_times, div_amts, 300, True)
+        actual = optprice.discrete_divs_strikes_greeks(model, pc_flag, 100.0, strike, *args, width=width)
+        assert all(field.shape == strike.shape for field in actual)
+        expected = np.array([
+            optprice.discrete_divs_greeks(model, pc, 100.0, k, *args, width=width) for pc, k in zip(pc_flag, strike)
+        ]).T
+        # Vega and rho divide the differences in the last bit by their bumps.
+        np.testing.assert_allclose(np.array(actual)[:4], expected[:4], rtol=0, atol=1e-11)
+        np.testing.assert_allclose(np.array(actual)[4:], expected[4:], rtol=0, atol=1e-7)
+
+
+def test_dividend_schedule():
+    div_times, div_amts = np.array([0.1, 0.6, 0.6]), np.array([1.5, 1.0, 0.5])
+    no_divs = np.array([])
+    args = (100.0, 95.0, 0.3, 1.0, 0.05, 0.01)
+    for lattice in ['CRR', 'LR']:
+        # Each engine prices just as it does from the dividends themselves.
+        schedule = optprice.dividend_schedule(100.0, 1.0, 0.01, div_times, div_amts, 300, lattice)
+        expected = optprice.discrete_divs('A', -1.0, *args, div_times, div_amts, 300, lattice)
+        assert optprice.discrete_divs('A', -1.0, *args, no_divs, no_divs, 300, lattice, schedule=schedule) == expected
+        assert optprice.discrete_divs_boundary('A', -1.0, *args, steps=300, lattice=lattice, schedule=schedule).price == expected
+        assert optprice.discrete_divs_greeks('A', -1.0, *args, steps=300, lattice=lattice, schedule=schedule).price == expected
+        strikes = optprice.discrete_divs_strikes('A', -1.0, 100.0, [95.0] * 20, *args[2:], steps=300, lattice=lattice, schedule=schedule)
+        assert np.all(np.abs(strikes - expected) < 1e-12)
+
+        # The prefix products run from the root to the total dividend at expiry.
+        steps = len(schedule.factors)
+        assert steps == (301 if lattice == 'LR' else 300)
+        assert schedule.prefix[0] == 1.0 and len(schedule.prefix) == steps + 1
+        assert abs(schedule.prefix[-1] - np.prod(schedule.factors)) < 1e-12
+
+        # The schedule is for the steps it was set up with.
+        with pytest.raises(AssertionError):
+            optprice.discrete_divs_greeks('A', -1.0, *args, steps=400, lattice=lattice, schedule=schedule)
+
+    # The dividends may come in any order.
+    ordered = optprice.dividend_schedule(100.0, 1.0, 0.01, div_times, div_amts, 300)
+    shuffled = optprice.dividend_schedule(100.0, 1.0, 0.01, div_times[::-1], div_amts[::-1], 300)
+    assert np.max(np.abs(shuffled.factors - ordered.factors)) < 1e-15
+
+    # Dates are converted in whole days.
+    times = optprice.year_fractions(np.datetime64('2023-11-22'), ['2024-02-15', '2024-11-21'])
+    assert np.allclose(times, [85 / 365, 1.0])
+
+
+def test_bbsr():
+    # A hundred steps of BBSR are more accurate than a thousand of the plain tree.
+    for pc_flag, strike in itertools.product([1, -1], [80, 100, 120]):
+        args = ('A', pc_flag, 100, strike, 0.3, 1.0, 0.05, 0.02)
+        exact = optprice.binomial_tree(*args, steps=10000)
+        assert abs(optprice.binomial_tree_bbsr(*args, steps=100) - exact) < 3e-3
+
+    european = optprice.binomial_tree_bbsr('E', 1, 100, 95, 0.3, 1.0, 0.05, 0.02, steps=100)
+    assert abs(european - optprice.black_scholes(1, 100, 95, 0.3, 1.0, 0.05, 0.02)) < 1e-3
+
+    # Discrete dividends make the convergence less regular, but it is still far ahead.
+    div_times, div_amts = np.array([0.2, 0.6]), np.array([1.5, 1.5])
+    exact = optprice.discrete_divs('A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.0, div_times, div_amts, 10000)
+    actual = optprice.discrete_divs_bbsr('A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.0, div_times, div_amts, 100)
+    assert abs(actual - exact) < 5e-3
+
+
+def test_lattices():
+    # Every lattice converges to Black-Scholes, and Leisen-Reimer does so in ~100 steps.
+    for pc_flag, strike in itertools.product([1, -1], [80, 100, 120]):
+        args = ('E', pc_flag, 100, strike, 0.3, 1.0, 0.05, 0.02)
+        exact = optprice.black_scholes(*args[1:])
+        for lattice in optprice.LATTICES:
+            assert abs(optprice.binomial_tree(*args, steps=1000, lattice=lattice) - exact) < 1e-2, lattice
+        assert abs(optprice.binomial_tree(*args, steps=101, lattice='LR') - exact) < 1e-4
+
+    # American options and the other engines accept the lattice too.
+    div_times, div_amts = np.array([0.2, 0.6]), np.array([1.5, 1.5])
+    args = ('A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.0, div_times, div_amts)
+    exact = optprice.discrete_divs(*args, 5001, 'LR')
+    for lattice in optprice.LATTICES:
+        assert abs(optprice.discrete_divs(*args, 1000, lattice) - exact) < 1e-2, lattice
+        strikes = optprice.discrete_divs_strikes(*args[:3], np.array([90.0, 100.0]), *args[4:], steps=200, lattice=lattice)
+        assert strikes[1] == optprice.discrete_divs(*args, 200, lattice)
+        greeks = optprice.discrete_divs_greeks(*args, steps=200, lattice=lattice)
+        assert greeks.price == strikes[1]
+
+    # LR rounds the steps up to an odd number.
+    assert optprice.discrete_divs(*args, 100, 'LR') == optprice.discrete_divs(*args, 101, 'LR')
+
+
+def test_truncation():
+    # At TRUNCATION_WIDTH, prices change by less than 1e-8 relative, for every engine.
+    width = optprice.TRUNCATION_WIDTH
+    no_divs, div_times, div_amts = np.array([]), np.array([0.2, 0.6]), np.array([1.5, 1.5])
+    for model, pc_flag, strike, ivol, divs in itertools.product('AE', [1, -1], [60, 100, 150], [0.1, 0.6], [False, True]):
+        args = (model, pc_flag, 100.0, strike, ivol, 2.0, 0.05, 0.0 if divs else 0.02)
+        args += (div_times, div_amts) if divs else (no_divs, no_divs)
+        for lattice in optprice.LATTICES:
+            full = optprice.discrete_divs(*args, 3001, lattice)
+            assert abs(optprice.discrete_divs(*args, 3001, lattice, width) - full) <= 1e-8 * full, lattice
+
+    # The other tree engines take the width too, and keep every node when it is wide.
+    args = ('A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.0, div_times, div_amts)
+    price = optprice.discrete_divs(*args, 2000, width=width)
+    assert price != optprice.discrete_divs(*args, 2000)
+    assert optprice.discrete_divs(*args, 2000, width=1e3) == optprice.discrete_divs(*args, 2000)
+    strikes = np.linspace(50, 150, 21)
+    batched = optprice.discrete_divs_strikes(*args[:3], strikes, *args[4:], steps=2000, width=width)
+    assert abs(batched[10] - price) < 1e-12
+    assert optprice.discrete_divs_greeks(*args, steps=2000, width=width).price == price
+    full = optprice.binomial_tree(*args[:8], steps=2000)
+    assert abs(optprice.binomial_tree(*args[:8], steps=2000, width=width) - full) <= 1e-8 * full
+
+
+def test_exercise_boundary():
+    # The boundary agrees with checking every node of the tree for exercise, including
+    # with the dividend yield below a negative rate, when the exercise region of a put
+    # is a band in the middle of the tree rather than a block at the bottom.
+    schedules = [(np.array([0.25, 0.75]), np.array([3.0, 3.0])), (np.array([]), np.array([]))]
+    for pc_flag, strike, lattice, (rate, div_yield), (div_times, div_amts) in itertools.product(
+        [1.0, -1.0], [90.0, 110.0], optprice.LATTICES, [(0.05, 0.0), (-0.02, -0.05)], schedules,
+    ):
+        args = ('A', pc_flag, 100.0, strike, 0.3, 1.0, rate, div_yield, div_times, div_amts, 201, lattice)
+        actual = optprice.discrete_divs_boundary(*args)
+        assert actual.price == optprice.discrete_divs(*args)
+        chain = optprice.discrete_divs_strikes(args[0], pc_flag, 100.0, [strike] * 3, *args[4:])
+        assert np.all(np.abs(chain - actual.price) < 1e-12)
+
+        divs = optprice._dividend_factors(100.0, 1.0, div_yield, div_times, div_amts, 201)
+        u, d, R, pu, pd = optprice._tree_params(lattice, 100.0, strike, 0.3, 1.0, rate, divs)
+        sprices, oprices = optprice._discrete_divs_leaves(pc_flag, 100.0, strike, u, d, divs)
+        expected = np.full(201, np.nan)
+        for t in range(200, -1, -1):
+            sprices = sprices[:-1] / d * divs[t]
+            continuation = (oprices[:-1] * pd + oprices[1:] * pu) / R
+            exercise = pc_flag * (sprices - strike)
+            exercised = (exercise > 0) & (exercise >= continuation)
+            if exercised.any():
+                expected[t] = sprices[exercised].max() if pc_flag < 0 else sprices[exercised].min()
+            oprices = np.maximum(continuation, exercise)
+        assert abs(oprices[0] - actual.price) < 1e-12
+        np.testing.assert_allclose(actual.spot, expected, rtol=1e-12)
+        assert actual.time[100] == 100 / 201
+
+    # Without dividends a call is never exercised, so the American and European prices
+    # are the same.
+    args = (1.0, 100.0, 90.0, 0.3, 1.0, 0.05, 0.0, np.array([]), np.array([]), 500)
+    assert optprice.discrete_divs('A', *args) == optprice.discrete_divs('E', *args)
+    assert np.isnan(optprice.discrete_divs_boundary('A', *args).spot).all()
+
+
+def test_pde():
+    # European prices and Greeks across the ladder agree with Black-Scholes.
+    args = (0.3, 1.0, 0.05, 0.02)
+    for pc_flag, strike in itertools.product([1, -1], [80, 100, 120]):
+        ladder = optprice.discrete_divs_pde_ladder('E', pc_flag, 100, strike, *args)
+        near = (80 < ladder.spot) & (ladder.spot < 125)
+        spot = ladder.spot[near]
+        expected = optprice.black_scholes_batch(pc_flag, spot, strike, *args)
+        assert np.max(np.abs(ladder.price[near] - expected)) < 1e-3
+        d1 = (np.log(spot / strike) + (0.05 - 0.02 + 0.3**2 / 2)) / 0.3
+        delta = np.exp(-0.02) * (optprice.n_cdf_batch(d1) - (pc_flag < 0))
+        gamma = np.exp(-0.02) * optprice.n_pdf_batch(d1) / (spot * 0.3)
+        assert np.max(np.abs(ladder.delta[near] - delta)) < 1e-4
+        assert np.max(np.abs(ladder.gamma[near] - gamma)) < 1e-5
+        assert ladder.price[len(ladder.price) // 2] == optprice.discrete_divs_pde('E', pc_flag, 100, strike, *args)
+
+    # American options with discrete dividends agree with the tree.
+    div_times, div_amts = np.array([0.2, 0.6]), np.array([1.5, 1.5])
+    for model, pc_flag, strike in itertools.product('AE', [1.0, -1.0], [90.0, 110.0]):
+        args = (model, pc_flag, 100.0, strike, 0.3, 1.0, 0.05, 0.01, div_times, div_amts)
+        assert abs(optprice.discrete_divs_pde(*args) - optprice.discrete_divs(*args, 5000)) < 3e-3
+
+
+def test_discrete_divs_adaptive():
+    # Short-dated contracts need fewer steps than long-dated ones for the same tolerance.
+    chosen = {}
+    for tau in [0.05, 2.0]:
+        for pc_flag, strike in itertools.product([1.0, -1.0], [90.0, 100.0, 110.0]):
+            args = ('A', pc_flag, 100.0, strike, 0.3, tau, 0.05, 0.02)
+            actual = optprice.discrete_divs_adaptive(*args, tol=1e-3)
+            assert actual.converged
+            assert abs(actual.price - optprice.binomial_tree(*args, steps=10001, lattice='LR')) < 1e-3
+            chosen[tau, pc_flag, strike] = actual.steps
+    assert max(chosen[0.05, pc, k] for pc, k in itertools.product([1.0, -1.0], [90.0, 100.0, 110.0])) < \
+        max(chosen[2.0, pc, k] for pc, k in itertools.product([1.0, -1.0], [90.0, 100.0, 110.0]))
+
+    # The budget caps the steps, and is reported as not converged.
+    actual = optprice.discrete_divs_adaptive('A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, tol=1e-9, max_steps=400)
+    assert not actual.converged and actual.steps == 400
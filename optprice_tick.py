@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+
+import optprice
+
+
+class TickPricer:
+    """
+    Quotes one contract as its spot ticks, from the spot ladder of one PDE solve.
+
+    optprice.discrete_divs_pde_ladder gives the price, delta and gamma at every spot of
+    a grid uniform in the log of the spot. While the spot stays within band (in log
+    terms) of the spot the ladder was solved at, a quote interpolates between the two
+    grid spots either side of it, which takes O(1) time rather than the O(steps^2) of a
+    tree. A spot outside the band, or a change to any other input, re-solves the ladder
+    at the next quote.
+
+    The price is a cubic Hermite interpolation in the log spot from the prices and
+    deltas at the grid spots, and the gamma is interpolated linearly. Without discrete
+    dividends the ladder is exact across the band. With them it is approximate, since
+    the dividends are converted into proportions of the spot at which it was solved (as
+    in discrete_divs), so that a dividend of D is priced at the solve spot S0 as about
+    D S / S0 at the spot S: keep the band narrow for large dividends.
+    """
+
+    def __init__(
+        self,
+        model: str,                   # 'A' for American, 'E' for European.
+        pc_flag: float,               # +1 for call, -1 for put.
+        strike: float,                # Strike price of the option.
+        ivol: float,                  # Implied volatility (annualised).
+        tau: float,                   # Time to expiry (years).
+        rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
+        div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
+        div_times: list[float] = [],  # Times to distribute dividends (years)
+        div_amts: list[float] = [],   # Amounts to distribute.
+        band: float = 0.05,           # Largest move in the log spot served from one solve.
+        space_steps: int = 800,       # Number of intervals in the log-spot grid.
+        time_steps: int = 400,        # Number of time steps of the PDE.
+    ):
+        assert model in 'AE'
+        assert band > 0
+        self.model = model
+        self.pc_flag = pc_flag
+        self.strike = strike
+        self.band = band
+        self.space_steps = space_steps
+        self.time_steps = time_steps
+        self.rebuilds = 0
+        self._ladder = None
+        self.set_terms(ivol=ivol, tau=tau, rate=rate, div_yield=div_yield, div_times=div_times, div_amts=div_amts)
+
+    def set_terms(self, **terms):
+        """
+        Change any of ivol, tau, rate, div_yield, div_times and div_amts, after which
+        the next quote re-solves the ladder.
+        """
+        assert set(terms) <= {'ivol', 'tau', 'rate', 'div_yield', 'div_times', 'div_amts'}
+        for name, value in terms.items():
+            if name in ('div_times', 'div_amts'):
+                value = np.array(value, dtype=np.float64)
+            setattr(self, name, value)
+        assert len(self.div_times) == len(self.div_amts)
+        self._ladder = None
+
+    def quote(self, spot: float) -> optprice.Greeks:
+        """The price, delta and gamma at the spot (theta and the rest are NaN)."""
+        if self._ladder is None or abs(math.log(spot / self._center)) > self.band:
+            self._solve(spot)
+
+        # The grid spots either side of the spot, and the position between them.
+        spots, prices, deltas, gammas = self._ladder
+        pos = (math.log(spot) - self._log_lo) / self._h
+        i = min(max(int(pos), 0), len(spots) - 2)
+        s = pos - i
+
+        # Hermite basis in s, with the slopes dV/dx = S dV/dS scaled to the cell.
+        s2, s3 = s * s, s * s * s
+        slope0 = deltas[i] * spots[i] * self._h
+        slope1 = deltas[i+1] * spots[i+1] * self._h
+        price = (
+            (2 * s3 - 3 * s2 + 1) * prices[i] + (s3 - 2 * s2 + s) * slope0
+            + (-2 * s3 + 3 * s2) * prices[i+1] + (s3 - s2) * slope1
+        )
+        dv_dx = (
+            (6 * s2 - 6 * s) * (prices[i] - prices[i+1]) / self._h
+            + ((3 * s2 - 4 * s + 1) * slope0 + (3 * s2 - 2 * s) * slope1) / self._h
+        )
+        gamma = (1 - s) * gammas[i] + s * gammas[i+1]
+        return optprice.Greeks(float(price), float(dv_dx / spot), float(gamma), math.nan)
+
+    def _solve(self, spot):
+        """Solve for the ladder around the spot, keeping the grid spots within the band."""
+        ladder = optprice.discrete_divs_pde_ladder(
+            self.model, self.pc_flag, spot, self.strike, self.ivol, self.tau, self.rate, self.div_yield,
+            self.div_times, self.div_amts, self.space_steps, self.time_steps,
+        )
+        x = np.log(ladder.spot)
+        self._h = (x[-1] - x[0]) / (len(x) - 1)
+        keep = np.abs(x - math.log(spot)) <= self.band + 2 * self._h
+        self._ladder = tuple(np.ascontiguousarray(arr[keep]) for arr in ladder)
+        self._log_lo = x[keep][0]
+        self._center = spot
+        self.rebuilds += 1
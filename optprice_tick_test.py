@@ -0,0 +1,36 @@
+import numpy as np
+
+import optprice
+import optprice_tick
+
+
+def test_tick_pricer():
+    args = (100.0, 0.3, 1.0, 0.05, 0.02)
+    pricer = optprice_tick.TickPricer('A', -1.0, *args, band=0.05)
+    for spot in [100.0, 100.7, 97.3, 104.5]:
+        # Within the band the quotes match a fresh solve at the spot.
+        actual = pricer.quote(spot)
+        ladder = optprice.discrete_divs_pde_ladder('A', -1.0, spot, *args, space_steps=800, time_steps=400)
+        mid = len(ladder.spot) // 2
+        assert abs(actual.price - ladder.price[mid]) < 1e-5
+        assert abs(actual.delta - ladder.delta[mid]) < 1e-5
+        assert abs(actual.gamma - ladder.gamma[mid]) < 1e-6
+    assert pricer.rebuilds == 1
+
+    # Leaving the band, or changing another input, solves again.
+    pricer.quote(110.0)
+    assert pricer.rebuilds == 2
+    pricer.quote(108.0)
+    assert pricer.rebuilds == 2
+    pricer.set_terms(ivol=0.25)
+    actual = pricer.quote(108.0)
+    assert pricer.rebuilds == 3
+    assert abs(actual.price - optprice.discrete_divs_pde('A', -1.0, 108.0, 100.0, 0.25, 1.0, 0.05, 0.02, space_steps=800, time_steps=400)) < 1e-10
+
+    # With discrete dividends the quotes are close to the tree near the solve spot.
+    div_times, div_amts = np.array([0.3, 0.8]), np.array([1.0, 1.0])
+    pricer = optprice_tick.TickPricer('A', -1.0, *args, div_times, div_amts, band=0.02)
+    for spot in [100.0, 101.0, 98.5]:
+        expected = optprice.discrete_divs('A', -1.0, spot, *args, div_times, div_amts, 2000)
+        assert abs(pricer.quote(spot).price - expected) < 0.02
+    assert pricer.rebuilds == 1
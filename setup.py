@@ -1,9 +1,30 @@
-from distutils.core import setup, Extension
-from Cython.Build import cythonize
+import sys
+
+from setuptools import setup, Extension
 import numpy
 
-extensions = [Extension("*", ["*.pyx"], include_dirs=[numpy.get_include()])]
+# Build from the .pyx sources when Cython is available, otherwise from the generated
+# .c files which are checked in, so that building only needs a C compiler.
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    cythonize = None
+
+# price_chain runs in parallel with OpenMP. Apple's clang does not ship OpenMP, so there
+# it builds without, and prange falls back to a serial loop.
+openmp_args = [] if sys.platform == "darwin" else ["-fopenmp"]
+
+sources = ["v1_option_pricing_cy.pyx" if cythonize else "v1_option_pricing_cy.c"]
+extensions = [
+    Extension(
+        "v1_option_pricing_cy",
+        sources,
+        include_dirs=[numpy.get_include()],
+        extra_compile_args=openmp_args,
+        extra_link_args=openmp_args,
+    )
+]
 
 setup(
-    ext_modules = cythonize(extensions)
-)
\ No newline at end of file
+    ext_modules = cythonize(extensions) if cythonize else extensions
+)
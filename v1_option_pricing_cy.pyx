@@ -1,33 +1,255 @@
+# cython: language_level=3
+import os
+
 import numpy as np
-cimport numpy as np
 cimport cython
+from cython.parallel cimport prange, threadid
+
+from libc.math cimport NAN, copysign, erfc, exp, log, pow, sqrt, fmax
+
+
+# Lattice families: Cox-Ross-Rubinstein, Jarrow-Rudd, Tian and Leisen-Reimer
+LATTICES = ('CRR', 'JR', 'Tian', 'LR')
+cdef enum:
+    CRR = 0
+    JR = 1
+    TIAN = 2
+    LR = 3
+
+
+# Look up a lattice family by name, returning its index in LATTICES
+cdef int lattice_code(str lattice) except -1:
+    if lattice not in LATTICES:
+        raise ValueError(f"lattice must be one of {LATTICES}")
+    return LATTICES.index(lattice)
+
+
+# Number of steps to use for a lattice: Leisen-Reimer needs an odd number, so round up
+cdef inline int lattice_steps(int lattice, int steps) noexcept nogil:
+    if lattice == LR and steps % 2 == 0:
+        return steps + 1
+    return steps
 
-cdef extern from "math.h":
-    double exp(double x)
-    double pow(double base, double exponent)
-    double sqrt(double x)
-    double fmax(double x, double y)
+
+# Peizer-Pratt (method 2) inversion: the probability p for which a binomial distribution
+# of steps trials approximates N(z)
+cdef inline double peizer_pratt(double z, int steps) noexcept nogil:
+    cdef double x = z / (steps + 1./3 + 0.1/(steps + 1))
+    return 0.5 + copysign(0.5, z) * sqrt(1 - exp(-x * x * (steps + 1./6)))
+
+
+# Up and down factors of a binomial lattice
+cdef (double, double) lattice_factors(
+    int lattice,  # Lattice family, an index into LATTICES
+    double S,  # Initial stock price
+    double X,  # Strike price
+    double growth,  # Expected growth rate of the stock (risk-free rate less dividend yield)
+    double sigma,  # Volatility
+    double t,  # Time to expiration
+    int steps,  # Number of steps in the binomial tree
+) noexcept nogil:
+    """
+    CRR has d = 1/u. JR centres the moves on the drift, and Tian also matches the third
+    moment of a step. LR matches the Black-Scholes distribution at expiry with the strike
+    at the middle node, and is the only one which depends on the stock price and strike.
+    """
+    cdef double dt = t / steps  # Length of a time step
+    cdef double R = exp(growth * dt)  # Expected growth over one step
+    cdef double u
+    cdef double v
+    cdef double d1
+    cdef double p
+    if lattice == JR:
+        return R * exp(-sigma * sigma * dt / 2 + sigma * sqrt(dt)), R * exp(-sigma * sigma * dt / 2 - sigma * sqrt(dt))
+    elif lattice == TIAN:
+        v = exp(sigma * sigma * dt)
+        return R * v / 2 * (v + 1 + sqrt(v * v + 2 * v - 3)), R * v / 2 * (v + 1 - sqrt(v * v + 2 * v - 3))
+    elif lattice == LR:
+        d1 = (log(S / X) + (growth + sigma * sigma / 2) * t) / (sigma * sqrt(t))
+        p = peizer_pratt(d1 - sigma * sqrt(t), steps)
+        u = R * peizer_pratt(d1, steps) / p
+        return u, (R - p * u) / (1 - p)
+    else:
+        u = exp(sigma * sqrt(dt))
+        return u, 1.0/u
+
+
+# Distribution function of the standard normal
+cdef inline double norm_cdf(double x) noexcept nogil:
+    return 0.5 * erfc(-x / sqrt(2.))
+
+
+# Black-Scholes value of a European option, used for the last step of the bbsr lattices
+cdef double black_scholes(
+    double flag,  # Flag to indicate whether it's a call or put option
+    double S,  # Stock price
+    double X,  # Strike price
+    double r,  # Risk-free rate
+    double sigma,  # Volatility
+    double t,  # Time to expiration
+    double div_yield,  # Dividend yield
+) noexcept nogil:
+    cdef double fwd = S * exp((r - div_yield) * t)  # Forward stock price
+    cdef double x = log(fwd / X)  # Negative log-moneyness
+    cdef double v = sigma * sqrt(t)  # Time-scaled volatility
+    return exp(-r * t) * flag * (fwd * norm_cdf(flag * (x/v + v/2)) - X * norm_cdf(flag * (x/v - v/2)))
+
+
+# Disable bounds checking for performance
+@cython.boundscheck(False)
+@cython.wraparound(False)
+# Backward induction on a single binomial lattice, shared by every pricing function
+cdef double lattice_price(
+    bint model,  # 1 American, 0 European
+    double flag,  # Flag to indicate whether it's a call or put option
+    double S,  # Initial stock price
+    double X,  # Strike price
+    double r,  # Risk-free rate
+    double sigma,  # Volatility
+    double t,  # Time to expiration
+    int steps,  # Number of steps in the binomial tree
+    double div_yield,  # Dividend yield
+    int lattice,  # Lattice family, an index into LATTICES
+    const double[::1] pv_divs,  # Present value at each step of the dividends still to be paid
+    double[::1] prices,  # Buffer of steps + 1 stock prices
+    double[::1] option_values,  # Buffer of steps + 1 option values
+    bint bbs = 0,  # Take Black-Scholes values over the last step, instead of the payoffs
+    double* boundary = NULL,  # Output (if given), the exercise boundary at each of the first steps steps
+) noexcept nogil:
+    """
+    The lattice is built on the escrowed stock price, ie the stock price less the present
+    value of the dividends still to be paid, and pv_divs[step] is added back on to get the
+    spot used for exercise at that step. Without dividends pv_divs is all zeros, and this
+    is the plain binomial model. The buffers are overwritten.
+
+    With bbs set this is the binomial Black-Scholes model: the lattice starts from the
+    Black-Scholes values at the last-but-one step, which smooths out the kink in the
+    payoff so that the price converges regularly in the number of steps.
+
+    For an American option the exercise region at each step is a block of nodes at the
+    bottom of the lattice for a put, and at the top for a call, so a put is only checked
+    for exercise up to the first node where it is not exercised, and a call up to the
+    first node where it is, with the nodes above taking the exercise value. A call is
+    never exercised while no dividends are left to pay (if r >= 0), so is not checked
+    then. If boundary is given, boundary[step] gets the spot of the exercised node
+    nearest the continuation region (or NaN if none are) at each step before the last.
+    """
+    # Define local variables
+    cdef int step
+    cdef int i
+    cdef int edge
+    cdef bint exercising
+    cdef double exercise
+    cdef int last = steps - 1 if bbs else steps  # Step the lattice starts from
+    cdef double R = exp((r - div_yield) * (t/steps))  # Growth factor per step, adjusted for dividend yield
+    cdef double Rinv = exp(-r * (t/steps))  # Discount factor per step
+    cdef double u  # Upward movement factor
+    cdef double d  # Downward movement factor
+    u, d = lattice_factors(lattice, S - pv_divs[0], X, r - div_yield, sigma, t, steps)
+    cdef double uu = u / d  # Ratio of neighbouring stock prices at a step
+    cdef double uinv = 1.0/u  # Stock price of the node below and behind
+    cdef double p_up = (R - d) / (u - d)  # Probability of upward movement
+    cdef double p_down = 1-p_up  # Probability of downward movement
+    prices[0] = (S - pv_divs[0]) * pow(d, last)  # Calculate initial escrowed stock price
+    for i in range(1, last + 1):
+        prices[i] = uu * prices[i-1]  # Calculate escrowed stock price for each step
+    for i in range(last+1):
+        if bbs:
+            # Value over the last step, which pays no discrete dividends
+            option_values[i] = black_scholes(flag, prices[i], X, r, sigma, t/steps, div_yield)
+            if model:
+                option_values[i] = fmax(option_values[i], flag*(prices[i] + pv_divs[last] - X))
+        else:
+            option_values[i] = fmax(0., flag * (prices[i] + pv_divs[steps] - X))  # Calculate option value for each step
+    for step in range(last-1, -1, -1):
+        edge = -1  # Exercised node nearest the continuation region, if any
+        if not model or (flag > 0 and r >= 0 and div_yield <= 0 and pv_divs[step] == 0):
+            for i in range(step+1):
+                # Update option value based on binomial model
+                option_values[i] = (p_up * option_values[i+1] + p_down * option_values[i])*Rinv
+                prices[i] = uinv * prices[i+1]  # Update escrowed stock price
+        elif flag < 0:
+            # Exercise the put from the bottom up, until the first node it is not exercised
+            exercising = 1
+            for i in range(step+1):
+                option_values[i] = (p_up * option_values[i+1] + p_down * option_values[i])*Rinv
+                prices[i] = uinv * prices[i+1]
+                if exercising:
+                    exercise = flag*(prices[i] + pv_divs[step] - X)
+                    exercising = exercise > 0 and exercise >= option_values[i]
+                    if exercising:
+                        option_values[i] = exercise
+                        edge = i
+        else:
+            # Continue the call from the bottom up, until the first node it is exercised
+            exercising = 0
+            for i in range(step+1):
+                prices[i] = uinv * prices[i+1]
+                exercise = flag*(prices[i] + pv_divs[step] - X)
+                if not exercising:
+                    option_values[i] = (p_up * option_values[i+1] + p_down * option_values[i])*Rinv
+                    exercising = exercise > 0 and exercise >= option_values[i]
+                    if exercising:
+                        edge = i
+                if exercising:
+                    option_values[i] = exercise
+        if boundary != NULL:
+            boundary[step] = prices[edge] + pv_divs[step] if edge >= 0 else NAN
+    return option_values[0]  # Return the option price
 
 
 # Disable bounds checking for performance
 @cython.boundscheck(False)
+@cython.wraparound(False)
+# Present value at each step of the dividends still to be paid before expiry
+cdef void pv_dividends(
+    double r,  # Risk-free rate
+    double t,  # Time to expiration
+    int steps,  # Number of steps in the binomial tree
+    const double[:] div_times,  # Array of dividend times
+    const double[:] div_amts,  # Array of dividend amounts
+    double[::1] pv_divs,  # Output, steps + 1 present values
+) noexcept nogil:
+    cdef int step
+    cdef int j
+    cdef double step_time
+    for step in range(steps + 1):
+        step_time = step * (t / steps)
+        pv_divs[step] = 0.
+        for j in range(div_times.shape[0]):
+            # A dividend paid exactly at a step has already gone ex-dividend there
+            if step_time < div_times[j] <= t:
+                pv_divs[step] += div_amts[j] * exp(-r * (div_times[j] - step_time))
+
+
+# The data of an optional boundary output array, checking it has room for every step
+cdef double* boundary_pointer(double[::1] boundary, int steps) except? NULL:
+    if boundary is None:
+        return NULL
+    if boundary.shape[0] < steps:
+        raise ValueError("boundary must have room for every step of the lattice")
+    return &boundary[0]
+
+
 # Function to calculate option price using binomial model
 def option_binomial(
     bint model,  # 1 American, 0 European
-    float flag,  # Flag to indicate whether it's a call or put option
-    float S,  # Initial stock price
-    float X,  # Strike price
-    float r,  # Risk-free rate
-    float sigma,  # Volatility
-    float t,  # Time to expiration
+    double flag,  # Flag to indicate whether it's a call or put option
+    double S,  # Initial stock price
+    double X,  # Strike price
+    double r,  # Risk-free rate
+    double sigma,  # Volatility
+    double t,  # Time to expiration
     int steps,  # Number of steps in the binomial tree
-    float div_yield  # Dividend yield
+    double div_yield,  # Dividend yield
+    str lattice = 'CRR',  # Lattice family, one of LATTICES
+    double[::1] boundary = None,  # Output (optional), the exercise boundary at each step
 ):
     """
     This function calculates the option price using a binomial model.
 
     Parameters:
-    american
+    model (bint): Model is American or European
     flag (float): Flag to indicate whether it's a call or put option
     S (float): Initial stock price
     X (float): Strike price
@@ -36,63 +258,48 @@ def option_binomial(
     t (float): Time to expiration
     steps (int): Number of steps in the binomial tree
     div_yield (float): Dividend yield
+    lattice (str): Lattice family, one of LATTICES (Leisen-Reimer rounds steps up to odd)
+    boundary (np.ndarray): If given, filled with the spot at the edge of the exercise
+        region at each step (NaN where nothing is exercised), see lattice_price
 
     Returns:
     float: The calculated option price
     """
-    # Define local variables
-    cdef int cstep
-    cdef int x
-    cdef int step
-    cdef int i
-    cdef float R = exp((r - div_yield) * (t/steps))  # Discount factor per step, adjusted for dividend yield
-    cdef float R_no_div_yield = exp(r*(t/steps))
-    cdef float Rinv = 1.0/R_no_div_yield  # Inverse of discount factor
-    cdef float u = exp(sigma * sqrt(t / steps))  # Upward movement factor
-    cdef float uu = u * u  # Square of upward movement factor
-    cdef float d = 1.0/u  # Downward movement factor
-    cdef float p_up = (R - d) / (u - d)  # Probability of upward movement
-    cdef float p_down = 1-p_up  # Probability of downward movement
-    cdef np.ndarray[np.double_t, ndim=1] prices  # Array to store stock prices
-    cdef np.ndarray[np.double_t, ndim=1] option_values  # Array to store option values
-    prices = np.zeros(steps + 1, dtype=np.double)  # Initialize prices array
-    option_values = np.zeros(steps + 1, dtype=np.double)  # Initialize option values array
-    prices[0] = S * pow(d, steps)  # Calculate initial stock price
-    for i in range(1, steps + 1):
-        prices[i] = uu * prices[i-1]  # Calculate stock price for each step
-    for i in range(steps+1):
-        option_values[i] = max(0., flag * (prices[i]-X))  # Calculate option value for each step
-    for step in range(steps-1, -1, -1):
-        cstep = step
-        for i in range(cstep+1):
-            # Update option value based on binomial model
-            option_values[i] = (p_up * option_values[i+1] + p_down * option_values[i])*Rinv
-            prices[i] = d * prices[i+1]  # Update stock price
-            # Update option value based on exercise decision
-            if model:
-                option_values[i] = max(option_values[i], flag*(prices[i]-X))
-    return option_values[0]  # Return the option price
+    cdef int code = lattice_code(lattice)
+    steps = lattice_steps(code, steps)
+    cdef double[::1] pv_divs = np.zeros(steps + 1, dtype=np.double)  # No dividends
+    cdef double[::1] prices = np.empty(steps + 1, dtype=np.double)  # Buffer for stock prices
+    cdef double[::1] option_values = np.empty(steps + 1, dtype=np.double)  # Buffer for option values
+    cdef double* boundary_out = boundary_pointer(boundary, steps)
+    cdef double price
+    with nogil:
+        price = lattice_price(model, flag, S, X, r, sigma, t, steps, div_yield, code, pv_divs, prices, option_values, 0, boundary_out)
+    return price
 
 
-# Disable bounds checking for performance
-@cython.boundscheck(False)
 # Function to calculate option price with discrete dividends using binomial model
 def discrete_divs_cy(
-    bint model,  # 1 American, 2 European
-    float flag,  # Flag to indicate whether it's a call or put option
-    float S,  # Initial stock price
-    float X,  # Strike price
-    float r,  # Risk-free rate
-    float sigma,  # Volatility
-    float t,  # Time to expiration
+    bint model,  # 1 American, 0 European
+    double flag,  # Flag to indicate whether it's a call or put option
+    double S,  # Initial stock price
+    double X,  # Strike price
+    double r,  # Risk-free rate
+    double sigma,  # Volatility
+    double t,  # Time to expiration
     int steps,  # Number of steps in the binomial tree
-    np.ndarray[np.double_t, ndim=1] div_times,  # Array of dividend times
-    np.ndarray[np.double_t, ndim=1] div_amts,  # Array of dividend amounts
-    float div_yield  # Dividend yield
+    const double[:] div_times,  # Array of dividend times
+    const double[:] div_amts,  # Array of dividend amounts
+    double div_yield,  # Dividend yield
+    str lattice = 'CRR',  # Lattice family, one of LATTICES
+    double[::1] boundary = None,  # Output (optional), the exercise boundary at each step
 ):
     """
     This function calculates the option price with discrete dividends using a binomial model.
 
+    Every dividend is priced on the one recombining lattice, using the escrowed dividend
+    model (see lattice_price), so this takes O(steps^2) time and O(steps) memory however
+    many dividends there are.
+
     Parameters:
 
     model (bint): Model is American or European
@@ -106,73 +313,218 @@ def discrete_divs_cy(
     div_times (np.ndarray): Array of dividend times
     div_amts (np.ndarray): Array of dividend amounts
     div_yield (float): Dividend yield
+    lattice (str): Lattice family, one of LATTICES (Leisen-Reimer rounds steps up to odd)
+    boundary (np.ndarray): If given, filled with the spot at the edge of the exercise
+        region at each step (NaN where nothing is exercised), see lattice_price
 
     Returns:
     float: The calculated option price
     """
-    # Define local variables
-    cdef int n_dividends = div_times.shape[0]
-    if n_dividends == 0:
-        # If no dividends, use simple binomial model
-        return option_binomial(model, flag, S, X, r, sigma, t, steps, div_yield)
-    cdef int steps_before = <int> (steps*(div_times[0]/t))
-    #print("steps_before:", steps_before)
-    if steps_before < 0:
-        steps_before = 0
-    if steps_before > steps:
-        steps_before = steps-1
-    cdef double value_alive
-    cdef int cstep
-    cdef int x
-    cdef int step
-    cdef int i
-    cdef float R = exp((r - div_yield) * (t/steps))  # Discount factor per step, adjusted for dividend yield
-    cdef float R_no_div_yield = exp(r*(t/steps))
-    cdef float Rinv = 1.0/R_no_div_yield  # Inverse of discount factor
-    cdef float u = exp(sigma * sqrt(t/steps))  # Upward movement factor
-    cdef float uu = u * u  # Square of upward movement factor
-    cdef float d = 1.0/u  # Downward movement factor
-    cdef float p_up = (R-d)/(u-d)  # Probability of upward movement
-    cdef float p_down = 1-p_up  # Probability of downward movement
-    cdef double dividend_amount = div_amts[0]
-    cdef np.ndarray[np.double_t, ndim=1] tmp_dividend_times
-    cdef np.ndarray[np.double_t, ndim=1] tmp_dividend_amts
-    cdef np.ndarray[np.double_t, ndim=1] prices  # Array to store stock prices
-    cdef np.ndarray[np.double_t, ndim=1] option_values  # Array to store option values
-    if n_dividends > 1:
-        tmp_dividend_times = np.zeros(n_dividends-1, dtype=np.double)
-        tmp_dividend_amts = np.zeros(n_dividends-1, dtype=np.double)
-        for i in range(0, n_dividends-1, 1):
-            tmp_dividend_times[i] = div_times[i-1]
-            tmp_dividend_amts[i] = div_amts[i-1]
-        prices = np.zeros(steps_before+1, dtype=np.double)
-        option_values = np.zeros(steps_before+1, dtype=np.double)
-        prices[0]=S*pow(d, steps_before)
-        for i in range(1, steps_before+1):
-            prices[i] = uu * prices[i-1]
-        for i in range(steps_before+1):
-            value_alive = discrete_divs_cy(model, flag, prices[i]-dividend_amount, X, r, sigma, t-div_times[0], steps-steps_before, tmp_dividend_times, tmp_dividend_amts, div_yield)
-            option_values[i] = max(value_alive, flag * (prices[i]-X))
-        for step in range(steps_before-1, -1, -1):
-            cstep = step
-            for i in range(cstep+1):
-                option_values[i] = (p_up * option_values[i+1] + p_down * option_values[i])*Rinv
-                prices[i] = d * prices[i+1]
-                if model:
-                    option_values[i] = max(option_values[i], flag*(prices[i]-X))
-    else:
-        prices = np.zeros(steps_before+1, dtype=np.double)
-        option_values = np.zeros(steps_before+1, dtype=np.double)
-        prices[0]=S*pow(d, steps_before)
-        for i in range(1, steps_before+1):
-            prices[i] = uu * prices[i-1]
-        for i in range(steps_before+1):
-            value_alive = option_binomial(model, flag, prices[i]-dividend_amount, X, r, sigma, t-div_times[0], steps-steps_before, div_yield)
-            option_values[i] = max(value_alive, flag * (prices[i]-X))
-        for step in range(steps_before-1, -1, -1):
-            cstep = step
-            for i in range(cstep+1):
-                option_values[i] = (p_up * option_values[i+1] + p_down * option_values[i])*Rinv
-                prices[i] = d * prices[i+1]
-                option_values[i] = max(option_values[i], flag*(prices[i]-X))
-    return option_values[0]  # Return the option price
+    if div_times.shape[0] != div_amts.shape[0]:
+        raise ValueError("div_times and div_amts must have the same length")
+    cdef int code = lattice_code(lattice)
+    steps = lattice_steps(code, steps)
+    cdef double[::1] pv_divs = np.empty(steps + 1, dtype=np.double)  # Present values of dividends
+    cdef double[::1] prices = np.empty(steps + 1, dtype=np.double)  # Buffer for stock prices
+    cdef double[::1] option_values = np.empty(steps + 1, dtype=np.double)  # Buffer for option values
+    cdef double* boundary_out = boundary_pointer(boundary, steps)
+    cdef double price
+    with nogil:
+        pv_dividends(r, t, steps, div_times, div_amts, pv_divs)
+        price = lattice_price(model, flag, S, X, r, sigma, t, steps, div_yield, code, pv_divs, prices, option_values, 0, boundary_out)
+    return price
+
+
+# Richardson extrapolation of the binomial Black-Scholes price, from two lattices
+cdef double bbsr_price(
+    bint model,  # 1 American, 0 European
+    double flag,  # Flag to indicate whether it's a call or put option
+    double S,  # Initial stock price
+    double X,  # Strike price
+    double r,  # Risk-free rate
+    double sigma,  # Volatility
+    double t,  # Time to expiration
+    int steps,  # Number of steps in the finer binomial tree
+    double div_yield,  # Dividend yield
+    int lattice,  # Lattice family, an index into LATTICES
+    const double[:] div_times,  # Array of dividend times
+    const double[:] div_amts,  # Array of dividend amounts
+    double[::1] pv_divs,  # Buffer of lattice_steps(lattice, steps) + 1 present values
+    double[::1] prices,  # Buffer of lattice_steps(lattice, steps) + 1 stock prices
+    double[::1] option_values,  # Buffer of lattice_steps(lattice, steps) + 1 option values
+) noexcept nogil:
+    """
+    The binomial Black-Scholes price with n steps is about p + c/n, so pricing with steps
+    and steps // 2 steps lets us solve for p (Broadie and Detemple 1996).
+    """
+    cdef int half = lattice_steps(lattice, steps // 2)
+    cdef double fine
+    cdef double coarse
+    steps = lattice_steps(lattice, steps)
+    pv_dividends(r, t, steps, div_times, div_amts, pv_divs)
+    fine = lattice_price(model, flag, S, X, r, sigma, t, steps, div_yield, lattice, pv_divs, prices, option_values, 1)
+    pv_dividends(r, t, half, div_times, div_amts, pv_divs)
+    coarse = lattice_price(model, flag, S, X, r, sigma, t, half, div_yield, lattice, pv_divs, prices, option_values, 1)
+    return (steps * fine - half * coarse) / (steps - half)
+
+
+# Function to calculate option price using binomial Black-Scholes with Richardson extrapolation
+def option_bbsr(
+    bint model,  # 1 American, 0 European
+    double flag,  # Flag to indicate whether it's a call or put option
+    double S,  # Initial stock price
+    double X,  # Strike price
+    double r,  # Risk-free rate
+    double sigma,  # Volatility
+    double t,  # Time to expiration
+    int steps,  # Number of steps in the finer binomial tree
+    double div_yield,  # Dividend yield
+    str lattice = 'CRR',  # Lattice family, one of LATTICES
+):
+    """
+    This function calculates the option price as option_binomial does, converging much
+    faster in the number of steps: 100 steps here are about as accurate as 1000 there.
+
+    Parameters:
+    model (bint): Model is American or European
+    flag (float): Flag to indicate whether it's a call or put option
+    S (float): Initial stock price
+    X (float): Strike price
+    r (float): Risk-free rate
+    sigma (float): Volatility
+    t (float): Time to expiration
+    steps (int): Number of steps in the finer binomial tree, at least 2
+    div_yield (float): Dividend yield
+    lattice (str): Lattice family, one of LATTICES (Leisen-Reimer rounds steps up to odd)
+
+    Returns:
+    float: The calculated option price
+    """
+    return discrete_divs_bbsr_cy(model, flag, S, X, r, sigma, t, steps, np.empty(0), np.empty(0), div_yield, lattice)
+
+
+# Function to calculate option price with discrete dividends using binomial Black-Scholes with Richardson extrapolation
+def discrete_divs_bbsr_cy(
+    bint model,  # 1 American, 0 European
+    double flag,  # Flag to indicate whether it's a call or put option
+    double S,  # Initial stock price
+    double X,  # Strike price
+    double r,  # Risk-free rate
+    double sigma,  # Volatility
+    double t,  # Time to expiration
+    int steps,  # Number of steps in the finer binomial tree
+    const double[:] div_times,  # Array of dividend times
+    const double[:] div_amts,  # Array of dividend amounts
+    double div_yield,  # Dividend yield
+    str lattice = 'CRR',  # Lattice family, one of LATTICES
+):
+    """
+    This function calculates the option price as discrete_divs_cy does, converging much
+    faster in the number of steps: 100 steps here are about as accurate as 1000 there.
+
+    The last step of each lattice is valued with Black-Scholes rather than the payoff
+    (the binomial Black-Scholes model), and the prices from lattices of steps and
+    steps // 2 steps are combined by Richardson extrapolation (see bbsr_price).
+
+    Parameters:
+
+    model (bint): Model is American or European
+    flag (float): Flag to indicate whether it's a call or put option
+    S (float): Initial stock price
+    X (float): Strike price
+    r (float): Risk-free rate
+    sigma (float): Volatility
+    t (float): Time to expiration
+    steps (int): Number of steps in the finer binomial tree, at least 2
+    div_times (np.ndarray): Array of dividend times
+    div_amts (np.ndarray): Array of dividend amounts
+    div_yield (float): Dividend yield
+    lattice (str): Lattice family, one of LATTICES (Leisen-Reimer rounds steps up to odd)
+
+    Returns:
+    float: The calculated option price
+    """
+    if div_times.shape[0] != div_amts.shape[0]:
+        raise ValueError("div_times and div_amts must have the same length")
+    if steps < 2:
+        raise ValueError("steps must be at least 2")
+    cdef int code = lattice_code(lattice)
+    cdef int size = lattice_steps(code, steps) + 1  # Size of the buffers, for the finer tree
+    cdef double[::1] pv_divs = np.empty(size, dtype=np.double)  # Present values of dividends
+    cdef double[::1] prices = np.empty(size, dtype=np.double)  # Buffer for stock prices
+    cdef double[::1] option_values = np.empty(size, dtype=np.double)  # Buffer for option values
+    cdef double price
+    with nogil:
+        price = bbsr_price(model, flag, S, X, r, sigma, t, steps, div_yield, code, div_times, div_amts, pv_divs, prices, option_values)
+    return price
+
+
+# Disable bounds checking for performance
+@cython.boundscheck(False)
+@cython.wraparound(False)
+# Function to price a whole chain of independent options in parallel
+def price_chain(
+    const Py_ssize_t[:] model,  # 1 American, 0 European, per option
+    const double[:] flag,  # Flag to indicate whether it's a call or put option
+    const double[:] S,  # Initial stock price
+    const double[:] X,  # Strike price
+    const double[:] r,  # Risk-free rate
+    const double[:] sigma,  # Volatility
+    const double[:] t,  # Time to expiration
+    const Py_ssize_t[:] steps,  # Number of steps in the binomial tree
+    const double[:] div_yield,  # Dividend yield
+    const Py_ssize_t[:] div_offsets,  # Dividends of option i are div_offsets[i]:div_offsets[i+1]
+    const double[:] div_times,  # Array of dividend times, for all options
+    const double[:] div_amts,  # Array of dividend amounts, for all options
+    double[:] out,  # Output, the calculated option prices
+    int num_threads = 0,  # Number of threads to use (0 for one per core)
+    str lattice = 'CRR',  # Lattice family, one of LATTICES, for the whole chain
+):
+    """
+    This function prices a chain of independent options, each exactly as discrete_divs_cy
+    would, splitting the options between threads with OpenMP.
+
+    The inputs are given as a struct of arrays, one entry per option (with the integer
+    arrays model, steps and div_offsets of the default integer dtype). The dividends are
+    ragged, packed one option after another into div_times and div_amts, with
+    div_offsets (of length one more than the number of options) marking where each
+    option's dividends start and end. Each thread gets its own buffers, sized for the
+    largest number of steps in the chain, which it reuses for every option it prices.
+    """
+    cdef Py_ssize_t n = out.shape[0]
+    for arr in (model, flag, S, X, r, sigma, t, steps, div_yield):
+        if arr.shape[0] != n:
+            raise ValueError("all per-option arrays must have the same length as out")
+    if div_offsets.shape[0] != n + 1:
+        raise ValueError("div_offsets must have one more entry than there are options")
+    if div_times.shape[0] != div_amts.shape[0]:
+        raise ValueError("div_times and div_amts must have the same length")
+    if n == 0:
+        return
+    if np.min(steps) < 1:
+        raise ValueError("steps must be at least 1")
+    if div_offsets[0] != 0 or np.any(np.diff(div_offsets) < 0) or div_offsets[n] > div_times.shape[0]:
+        raise ValueError("div_offsets must be increasing, from 0 to at most len(div_times)")
+
+    if num_threads <= 0:
+        num_threads = os.cpu_count() or 1
+    cdef int code = lattice_code(lattice)
+    cdef int max_steps = lattice_steps(code, np.max(steps))
+    cdef double[:, :, ::1] buffers = np.empty((num_threads, 3, max_steps + 1), dtype=np.double)
+    cdef Py_ssize_t i
+    cdef int tid
+    cdef int option_steps
+
+    for i in prange(n, nogil=True, schedule='dynamic', num_threads=num_threads):
+        tid = threadid()
+        option_steps = lattice_steps(code, steps[i])
+        pv_dividends(
+            r[i], t[i], option_steps,
+            div_times[div_offsets[i]:div_offsets[i+1]],
+            div_amts[div_offsets[i]:div_offsets[i+1]],
+            buffers[tid, 0],
+        )
+        out[i] = lattice_price(
+            model[i], flag[i], S[i], X[i], r[i], sigma[i], t[i], option_steps, div_yield[i], code,
+            buffers[tid, 0], buffers[tid, 1], buffers[tid, 2],
+        )
@@ -0,0 +1,78 @@
+import numpy as np
+
+import optprice
+import v1_option_pricing_cy
+
+
+def random_chain(n, seed=0):
+    """A chain of n random contracts, as the struct of arrays taken by price_chain."""
+    rng = np.random.default_rng(seed)
+    t = rng.uniform(0.1, 3, n)
+    n_divs = rng.integers(0, 4, n)
+    div_offsets = np.concatenate([[0], np.cumsum(n_divs)])
+    div_times = np.concatenate([np.sort(rng.uniform(0, t[i], n_divs[i])) for i in range(n)])
+    return dict(
+        model=rng.integers(0, 2, n),
+        flag=rng.choice([-1.0, 1.0], n),
+        S=rng.uniform(80, 120, n),
+        X=rng.uniform(80, 120, n),
+        r=np.full(n, 0.05),
+        sigma=rng.uniform(0.1, 0.5, n),
+        t=t,
+        steps=rng.integers(50, 300, n),
+        div_yield=np.full(n, 0.01),
+        div_offsets=div_offsets,
+        div_times=div_times,
+        div_amts=rng.uniform(0.5, 2, div_offsets[-1]),
+    )
+
+
+def test_price_chain():
+    chain = random_chain(500)
+    out = np.empty(500)
+    for lattice in v1_option_pricing_cy.LATTICES:
+        v1_option_pricing_cy.price_chain(**chain, out=out, lattice=lattice)
+
+        for i in range(500):
+            divs = slice(chain['div_offsets'][i], chain['div_offsets'][i+1])
+            expected = v1_option_pricing_cy.discrete_divs_cy(
+                chain['model'][i], chain['flag'][i], chain['S'][i], chain['X'][i], chain['r'][i],
+                chain['sigma'][i], chain['t'][i], chain['steps'][i],
+                chain['div_times'][divs], chain['div_amts'][divs], chain['div_yield'][i], lattice,
+            )
+            assert out[i] == expected
+
+
+def test_exercise_boundary():
+    # Without discrete dividends the lattices match optprice's (apart from CRR, which
+    # optprice centres differently), and so do their exercise boundaries.
+    for lattice, strike in zip(['JR', 'Tian', 'LR'], [90.0, 100.0, 120.0]):
+        boundary = np.empty(501)
+        price = v1_option_pricing_cy.option_binomial(1, -1.0, 100.0, strike, 0.05, 0.3, 1.0, 501, 0.02, lattice, boundary)
+        expected = optprice.discrete_divs_boundary('A', -1.0, 100.0, strike, 0.3, 1.0, 0.05, 0.02, [], [], 501, lattice)
+        assert abs(price - expected.price) < 1e-10
+        np.testing.assert_allclose(boundary, expected.spot, rtol=1e-10)
+
+    # A call is only exercised before a dividend, and without dividends is European.
+    args = (1.0, 100.0, 90.0, 0.05, 0.3, 1.0, 500, np.array([0.5]), np.array([5.0]), 0.0)
+    boundary = np.empty(500)
+    american = v1_option_pricing_cy.discrete_divs_cy(1, *args, 'CRR', boundary)
+    assert american > v1_option_pricing_cy.discrete_divs_cy(0, *args)
+    assert np.isnan(boundary[250:]).all() and not np.isnan(boundary[:250]).all()
+    no_divs = args[:7] + (np.array([]), np.array([]), 0.0)
+    assert v1_option_pricing_cy.discrete_divs_cy(1, *no_divs) == v1_option_pricing_cy.discrete_divs_cy(0, *no_divs)
+
+
+def test_escrowed_dividends():
+    # Without the volatility adjustment the closed form is the limit of the escrowed tree,
+    # for a chain of contracts some of which expire before some of the dividends.
+    div_times, div_amts = np.array([0.3, 0.8, 1.3]), np.array([2.0, 2.0, 2.0])
+    pc_flag, strike, tau = [arr.ravel() for arr in np.meshgrid([1.0, -1.0], [80.0, 100.0, 120.0], [0.5, 1.0, 2.0])]
+    actual = optprice.escrowed_dividends_batch(pc_flag, 100.0, strike, 0.3, tau, 0.05, 0.01, div_times, div_amts, vol_adjust=False)
+    for i in range(len(actual)):
+        tree = v1_option_pricing_cy.discrete_divs_cy(0, pc_flag[i], 100.0, strike[i], 0.05, 0.3, tau[i], 4000, div_times, div_amts, 0.01)
+        assert abs(actual[i] - tree) < 2e-3
+
+    # The volatility adjustment raises the prices of calls and puts alike.
+    adjusted = optprice.escrowed_dividends_batch(pc_flag, 100.0, strike, 0.3, tau, 0.05, 0.01, div_times, div_amts)
+    assert np.all(adjusted > actual)
@@ -2,6 +2,8 @@ import timeit
 from datetime import datetime
 from v1_option_pricing import decimal_round, discrete_divs
 
+import optprice
+
 TOLERANCE = 0.05  # TOLERANCE for the difference between the actual and expected option prices
 
 
@@ -218,4 +220,26 @@ def test_discrete_divs():
     # print("Expected:", expected, "Actual:", actual)
     # assert abs((actual - expected) / expected) < TOLERANCE
 
-print(timeit.timeit("test_discrete_divs()", "from __main__ import test_discrete_divs", number=1))
\ No newline at end of file
+def test_discrete_divs_european():
+    # A European option on the escrowed lattice converges to Black-Scholes on the spot
+    # less the present value of the dividends, and is worth no more than the American.
+    valuation_date, expiration_date = datetime(2023, 11, 22), datetime(2024, 12, 15)
+    divs = [(datetime(2024, 2, 15), 0.8), (datetime(2024, 8, 15), 0.8)]
+    tau = (expiration_date - valuation_date).days / 365.0
+    div_times = [(date - valuation_date).days / 365.0 for date, _ in divs]
+    for flag, k in [(1, 23), (-1, 25), (-1, 27)]:
+        european = discrete_divs(flag, 25, k, 0.05, 0.3, valuation_date, expiration_date, 2000, divs, 0.01, 'CRR', 'E')
+        american = discrete_divs(flag, 25, k, 0.05, 0.3, valuation_date, expiration_date, 2000, divs, 0.01, 'CRR', 'A')
+        expected = optprice.escrowed_dividends_batch(
+            flag, 25.0, k, 0.3, tau, 0.05, 0.01, div_times, [amt for _, amt in divs], vol_adjust=False,
+        )
+        assert abs(european - expected) < 1e-3
+        assert european <= american
+
+    # Without dividends the European price is still priced on the lattice.
+    european = discrete_divs(-1, 25, 25, 0.05, 0.3, valuation_date, expiration_date, 301, [], 0.0, 'CRR', 'E')
+    assert abs(european - optprice.black_scholes(-1, 25.0, 25.0, 0.3, tau, 0.05, 0.0)) < 1e-2
+
+
+if __name__ == "__main__":
+    print(timeit.timeit("test_discrete_divs()", "from __main__ import test_discrete_divs", number=1))
\ No newline at end of file
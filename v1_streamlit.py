@@ -2,7 +2,7 @@ import streamlit as st
 import numpy as np
 from datetime import datetime
 
-from optprice import discrete_divs_cy
+from optprice import discrete_divs_cy, year_fractions
 
 
 def year_fraction(start_date, end_date):
@@ -44,7 +44,7 @@ end_date = eval(expiration_date)
 t = round((end_date - start_date).days / 365, 4)
 
 dividend_dates = eval(dividend_dates)
-div_times = np.array([round((date - start_date).days / 365.25, 4) for date in dividend_dates])
+div_times = np.round(year_fractions(start_date, dividend_dates, 365.25), 4)
 div_amt = np.array(eval(dividend_amounts))
 
 print("Model:", model, "Flag:", flag, "Init:", s, "Strike:", k, "Risk Free:", r, "Vol:", sigma, "t:", t, "Steps:", steps, "Divs:", div_times, "Amts:", div_amt, "Div Yield:", dividend_yield)
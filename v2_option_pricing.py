@@ -3,62 +3,75 @@
 #
 import numpy as np
 from typing import List
-from datetime import datetime
 
-def binomial_tree_crr_discrete(s0: float, k: float, r: float, t: float, sigma: float, divs: List[float], divt: List[float], n: int) -> float:
+
+def binomial_tree_crr_discrete(
+    model: str,                   # 'A' for American, 'E' for European.
+    pc_flag: float,               # +1 for call, -1 for put.
+    spot: float,                  # Spot price of the underlying stock.
+    strike: float,                # Strike price of the option.
+    ivol: float,                  # Implied volatility (annualised).
+    tau: float,                   # Time to expiry (years).
+    rate: float = 0,              # Risk-free rate (annualised, continuously compounding).
+    div_yield: float = 0,         # Dividend yield (annualised, continuously compounding).
+    div_times: List[float] = [],  # Times to distribute dividends (years).
+    div_amts: List[float] = [],   # Amounts to distribute.
+    steps: int = 1000,            # Number of time steps.
+    vol_adjust: bool = True,      # Whether to adjust the volatility for the dividends.
+) -> float:
     """
-    Binomial Tree Model of CRR with discrete dividends.
+    Binomial Tree Model of CRR with discrete dividends, by the escrowed dividend model:
+    the lattice is built on the spot less the present value of the dividends to come,
+    which is added back at each node to get the spot.
 
-    Parameters:
-    s0 (float): Initial stock price
-    k (float): Strike price
-    r (float): Risk-free rate
-    t (float): Time to maturity
-    sigma (float): Volatility of the underlying asset
-    divs (List[float]): Dividends
-    divt (List[float]): Dividend times
-    n (int): Number of time steps
+    With vol_adjust the volatility of the lattice is adjusted so that the spot keeps
+    about the volatility ivol, by weighting the variance over each interval between
+    dividends by (spot / (spot - PV of the dividends to come))^2 (Beneder and Vorst 2001).
 
-    Returns:
-    float: Option price
+    Only two buffers of steps + 1 nodes are kept, the escrowed spots and the option
+    values, which are stepped back from expiry a whole level at a time.
     """
-    dt = t / n
-    s0d = s0
-    if divs:
-        s0d -= np.sum(np.array(divs) * np.exp(-r * np.array(divt)))
-    ddiv = []
-    if divt:
-        ddiv = np.ceil(np.array(divt) * n / t) + 1
-    divn = len(divt) - 1 if divt else 0
-    sigman = sigma
-    if divs and divt:
-        sigman = 0
-        for i in range(1, divn + 1):
-            before = divt[i-2] if i > 1 else 0
-            sigman += (s0 * sigma / (s0 - np.sum(np.array(divs) * np.exp(-r * np.array(divt)) * (i <= ddiv))))**2 * (divt[i-1] - before)
-        sigman = np.sqrt((sigman + sigma**2 * (t - divt[divn])) / t)
-    u = np.exp(sigman * np.sqrt(dt))
+    assert model in 'AE'
+    assert len(div_times) == len(div_amts)
+    assert steps >= 1
+
+    div_times = np.asarray(div_times, dtype=np.float64)
+    div_amts = np.asarray(div_amts, dtype=np.float64)
+    paid = (0 <= div_times) & (div_times < tau)
+    div_times, div_amts = div_times[paid], div_amts[paid]
+
+    # Present value, at the time of each step, of the dividends paid after it.
+    dt = tau / steps
+    times = dt * np.arange(steps + 1)
+    to_come = times[:, None] < div_times
+    pv_divs = np.sum(np.where(to_come, div_amts * np.exp(-rate * (div_times - times[:, None])), 0.0), axis=1)
+
+    sigma = ivol
+    if vol_adjust and len(div_times):
+        order = np.argsort(div_times)
+        ends = div_times[order]
+        pvs = div_amts[order] * np.exp(-rate * ends)
+        remaining = np.cumsum(pvs[::-1])[::-1]
+        variance = np.sum((spot / (spot - remaining))**2 * np.diff(ends, prepend=0.0)) + tau - ends[-1]
+        sigma = ivol * np.sqrt(variance / tau)
+
+    u = np.exp(sigma * np.sqrt(dt))
     d = 1 / u
-    p = (np.exp(r * dt) - d) / (u - d)
-    discount = np.exp(-r * dt)
-    s_vals = []
-    for i in range(1, n + 2):
-        svals = np.zeros(i)
-        for j in range(1, i + 1):
-            svals[j - 1] = s0d * u**(i - 1) * (d/u)**(j - 1)
-            if divs and divt:
-                svals[j - 1] += np.sum(np.array(divs) * np.exp(-r * dt * (ddiv - i)) * (i < ddiv))
-        s_vals.append(svals)
-    p_vals = [np.maximum(k - s_vals[n], 0)]
-    for i in range(n, 0, -1):
-        pvals = np.zeros(i)
-        for j in range(1, i + 1):
-            early = discount * (p * p_vals[0][j - 1] + (1 - p) * p_vals[0][j])
-            internal = np.maximum(k - s_vals[i - 1][j - 1], 0)
-            pvals[j - 1] = np.maximum(early, internal)
-        p_vals.insert(0, pvals)
-    return p_vals[0][0]
+    p = (np.exp((rate - div_yield) * dt) - d) / (u - d)
+    discount = np.exp(-rate * dt)
+
+    # Escrowed spots and option values at expiry, from the highest node down.
+    escrowed = (spot - pv_divs[0]) * u**np.arange(steps, -steps - 1, -2, dtype=np.float64)
+    values = np.maximum(pc_flag * (escrowed - strike), 0)
+    for i in range(steps - 1, -1, -1):
+        escrowed[:i+1] *= d
+        values[:i+1] = discount * (p * values[:i+1] + (1 - p) * values[1:i+2])
+        if model == 'A':
+            np.maximum(values[:i+1], pc_flag * (escrowed[:i+1] + pv_divs[i] - strike), out=values[:i+1])
+    return float(values[0])
 
 
-price = binomial_tree_crr_discrete(spot=50,strike=50,risk_free=0.05,time_to_exp=5/12,0.4,[2],[2/12],1000)
-print(price)
+if __name__ == '__main__':
+    price = binomial_tree_crr_discrete('A', -1, spot=50, strike=50, ivol=0.4, tau=5/12, rate=0.05,
+                                       div_times=[2/12], div_amts=[2], steps=1000)
+    print(price)
@@ -0,0 +1,30 @@
+import itertools
+
+import numpy as np
+
+import optprice
+import v1_option_pricing_cy
+from v2_option_pricing import binomial_tree_crr_discrete
+
+
+def test_binomial_tree_crr_discrete():
+    div_times, div_amts = np.array([0.3, 0.8]), np.array([2.0, 2.0])
+    for model, pc_flag, strike in itertools.product('AE', [1.0, -1.0], [90.0, 110.0]):
+        # Without the volatility adjustment this is the escrowed tree of discrete_divs_cy.
+        args = (pc_flag, 100.0, strike, 0.3, 1.0, 0.05, 0.01, div_times, div_amts, 500)
+        actual = binomial_tree_crr_discrete(model, *args, vol_adjust=False)
+        expected = v1_option_pricing_cy.discrete_divs_cy(
+            model == 'A', pc_flag, 100.0, strike, 0.05, 0.3, 1.0, 500, div_times, div_amts, 0.01,
+        )
+        assert abs(actual - expected) < 1e-10
+
+        # With it, European prices converge to the adjusted escrowed closed form.
+        if model == 'E':
+            actual = binomial_tree_crr_discrete(model, *args[:-1], 4000)
+            expected = optprice.escrowed_dividends_batch(*args[:-1])
+            assert abs(actual - expected) < 1e-3
+
+    # Without dividends it converges to the same price as the other trees.
+    args = ('A', -1.0, 100.0, 100.0, 0.3, 1.0, 0.05, 0.02)
+    expected = optprice.binomial_tree(*args, steps=10001, lattice='LR')
+    assert abs(binomial_tree_crr_discrete(*args, steps=10000) - expected) < 2e-4